@@ -3,14 +3,22 @@ DOC Anomaly Detection System - Agentic AI Agents Package
 """
 
 from .base_agent import BaseAgent
+from .document_text import DocumentText
+from .field_match import FieldMatch
 from .document_ingestion_agent import DocumentIngestionAgent
 from .extraction_agent import ExtractionAgent
 from .anomaly_detection_agent import AnomalyDetectionAgent
+from .hybrid_extraction import HybridExtractionRouter
+from .chunked_extraction import ChunkedExtractor
 
 __all__ = [
     'BaseAgent',
+    'DocumentText',
+    'FieldMatch',
     'DocumentIngestionAgent', 
     'ExtractionAgent',
-    'AnomalyDetectionAgent'
+    'AnomalyDetectionAgent',
+    'HybridExtractionRouter',
+    'ChunkedExtractor'
 ]
 
@@ -3,10 +3,41 @@ Anomaly Detection Agent
 Detects anomalies across multiple parameters as specified in requirements
 """
 
-from typing import Dict, Any, List, Tuple, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple, Optional, Iterator
+from collections.abc import Mapping
+from datetime import date, timedelta
+from decimal import Decimal
 import re
 from .base_agent import BaseAgent
+from .field_match import FieldMatch
+from .normalization import as_date, parse_amount, parse_months, typed_value
+
+class _ColumnarFields(Mapping):
+    """
+    Read-only view of one row of a columnar extraction batch
+    
+    Fields come back as FieldMatch (value, confidence) pairs carrying the
+    batch's normalized value, so typed checks match the per-document path.
+    """
+    
+    __slots__ = ("_columns", "_row")
+    
+    def __init__(self, columns: Dict[str, Dict[str, Any]], row: int):
+        self._columns = columns
+        self._row = row
+    
+    def __getitem__(self, field_name: str) -> FieldMatch:
+        column = self._columns[field_name]
+        field = FieldMatch(column["values"][self._row], float(column["confidences"][self._row]))
+        if "normalized" in column:
+            field.normalized = column["normalized"][self._row]
+        return field
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+    
+    def __len__(self) -> int:
+        return len(self._columns)
 
 class AnomalyDetectionAgent(BaseAgent):
     """Detects anomalies in document data"""
@@ -85,6 +116,61 @@ class AnomalyDetectionAgent(BaseAgent):
             self.log_action("ANOMALY_DETECTION", doc_id, "ERROR", str(e))
             return {"error": f"Anomaly detection failed: {str(e)}"}
     
+    def screen_batch(self, batch: Dict[str, Any], store: bool = True) -> Dict[str, Any]:
+        """
+        Run field-level anomaly checks over a columnar extraction batch
+        
+        Reads values and their normalized typed values straight from
+        ExtractionAgent.process_batch columns.
+        Cross-document and duplicate checks query the database per document
+        and remain in process().
+        
+        Args:
+            batch: Columnar result from ExtractionAgent.process_batch
+            store: Persist detected anomalies
+            
+        Returns:
+            Dict with document_ids and aligned per-document anomaly lists
+        """
+        doc_ids = batch.get("document_ids", [])
+        doc_types = batch.get("document_types", [])
+        columns = batch.get("fields", {})
+        
+        anomalies_by_document = []
+        for row, (doc_id, doc_type) in enumerate(zip(doc_ids, doc_types)):
+            fields = _ColumnarFields(columns, row)
+            
+            if doc_type == "INVOICE":
+                anomalies = self._detect_invoice_anomalies(doc_id, fields)
+            elif doc_type == "CONTRACT":
+                anomalies = self._detect_contract_anomalies(doc_id, fields)
+            elif doc_type == "PURCHASE_ORDER":
+                anomalies = self._detect_po_anomalies(doc_id, fields)
+            else:
+                anomalies = []
+            
+            if store:
+                for anomaly in anomalies:
+                    self.store_anomaly(
+                        doc_id,
+                        anomaly['type'],
+                        anomaly['severity'],
+                        anomaly['description'],
+                        anomaly['confidence']
+                    )
+            anomalies_by_document.append(anomalies)
+        
+        total = sum(len(anomalies) for anomalies in anomalies_by_document)
+        self.log_action("BATCH_ANOMALY_SCREEN", None, "SUCCESS",
+                      f"Detected {total} anomalies across {len(doc_ids)} documents")
+        
+        return {
+            "document_ids": doc_ids,
+            "anomalies": anomalies_by_document,
+            "anomaly_counts": [len(anomalies) for anomalies in anomalies_by_document],
+            "detection_status": "SUCCESS"
+        }
+    
     def _detect_invoice_anomalies(self, doc_id: str, fields: Dict[str, Tuple[str, float]]) -> List[Dict[str, Any]]:
         """Detect anomalies specific to invoices"""
         anomalies = []
@@ -97,13 +183,19 @@ class AnomalyDetectionAgent(BaseAgent):
         
         # 1. Date mismatch detection
         if invoice_date and due_date:
-            date_anomaly = self._check_date_anomaly(invoice_date, due_date, "invoice to due date")
+            date_anomaly = self._check_date_anomaly(
+                self._get_typed_value(fields, 'invoice_date'),
+                self._get_typed_value(fields, 'due_date'),
+                "invoice to due date"
+            )
             if date_anomaly:
                 anomalies.append(date_anomaly)
         
         # 2. Amount validation
         if amount:
-            amount_anomaly = self._check_amount_anomaly(amount, "invoice amount")
+            amount_anomaly = self._check_amount_anomaly(
+                amount, "invoice amount", self._get_typed_value(fields, 'total_amount')
+            )
             if amount_anomaly:
                 anomalies.append(amount_anomaly)
         
@@ -135,20 +227,26 @@ class AnomalyDetectionAgent(BaseAgent):
         # 1. Lease schedule discrepancies
         if effective_date and expiration_date and lease_term:
             schedule_anomaly = self._check_lease_schedule_anomaly(
-                effective_date, expiration_date, lease_term
+                self._get_typed_value(fields, 'effective_date'),
+                self._get_typed_value(fields, 'expiration_date'),
+                self._get_typed_value(fields, 'lease_term')
             )
             if schedule_anomaly:
                 anomalies.append(schedule_anomaly)
         
         # 2. Lease amount validation
         if lease_amount:
-            amount_anomaly = self._check_lease_amount_anomaly(lease_amount)
+            amount_anomaly = self._check_lease_amount_anomaly(
+                lease_amount, self._get_typed_value(fields, 'lease_amount')
+            )
             if amount_anomaly:
                 anomalies.append(amount_anomaly)
         
         # 3. Contract term validation
         if lease_term:
-            term_anomaly = self._check_lease_term_anomaly(lease_term)
+            term_anomaly = self._check_lease_term_anomaly(
+                lease_term, self._get_typed_value(fields, 'lease_term')
+            )
             if term_anomaly:
                 anomalies.append(term_anomaly)
         
@@ -171,13 +269,15 @@ class AnomalyDetectionAgent(BaseAgent):
         
         # 2. PO date validation
         if po_date:
-            date_anomaly = self._check_po_date_anomaly(po_date)
+            date_anomaly = self._check_po_date_anomaly(po_date, self._get_typed_value(fields, 'po_date'))
             if date_anomaly:
                 anomalies.append(date_anomaly)
         
         # 3. PO amount validation
         if amount:
-            amount_anomaly = self._check_amount_anomaly(amount, "PO amount")
+            amount_anomaly = self._check_amount_anomaly(
+                amount, "PO amount", self._get_typed_value(fields, 'total_amount')
+            )
             if amount_anomaly:
                 anomalies.append(amount_anomaly)
         
@@ -252,29 +352,13 @@ class AnomalyDetectionAgent(BaseAgent):
         
         return None
     
-    def _check_amount_anomaly(self, amount: str, context: str) -> Optional[Dict[str, Any]]:
-        """Check for amount anomalies"""
-        try:
-            numeric_amount = float(amount.replace(',', '').replace('$', ''))
-            
-            # Check for unrealistic amounts
-            if numeric_amount <= 0:
-                return {
-                    'type': 'INVALID_AMOUNT',
-                    'severity': 'HIGH',
-                    'description': f"{context} is {amount}, which is invalid (zero or negative)",
-                    'confidence': 1.0
-                }
-            
-            # Check for extremely large amounts (potential data entry error)
-            if numeric_amount > 10000000:  # 10 million
-                return {
-                    'type': 'UNUSUAL_AMOUNT',
-                    'severity': 'MEDIUM',
-                    'description': f"{context} is {amount}, which is unusually large",
-                    'confidence': 0.7
-                }
-        except ValueError:
+    def _check_amount_anomaly(self, amount: str, context: str,
+                              numeric_amount: Optional[Decimal] = None) -> Optional[Dict[str, Any]]:
+        """Check for amount anomalies, using the normalized amount when given"""
+        if numeric_amount is None:
+            numeric_amount = parse_amount(amount)
+        
+        if numeric_amount is None:
             return {
                 'type': 'INVALID_AMOUNT_FORMAT',
                 'severity': 'HIGH',
@@ -282,6 +366,24 @@ class AnomalyDetectionAgent(BaseAgent):
                 'confidence': 1.0
             }
         
+        # Check for unrealistic amounts
+        if numeric_amount <= 0:
+            return {
+                'type': 'INVALID_AMOUNT',
+                'severity': 'HIGH',
+                'description': f"{context} is {amount}, which is invalid (zero or negative)",
+                'confidence': 1.0
+            }
+        
+        # Check for extremely large amounts (potential data entry error)
+        if numeric_amount > 10000000:  # 10 million
+            return {
+                'type': 'UNUSUAL_AMOUNT',
+                'severity': 'MEDIUM',
+                'description': f"{context} is {amount}, which is unusually large",
+                'confidence': 0.7
+            }
+        
         return None
     
     def _check_po_format(self, po_number: str) -> Optional[Dict[str, Any]]:
@@ -297,14 +399,14 @@ class AnomalyDetectionAgent(BaseAgent):
         
         return None
     
-    def _check_lease_schedule_anomaly(self, start_date: str, end_date: str, term: str) -> Optional[Dict[str, Any]]:
-        """Check lease schedule consistency"""
+    def _check_lease_schedule_anomaly(self, start_date, end_date, term) -> Optional[Dict[str, Any]]:
+        """Check lease schedule consistency (typed dates and months, or raw strings)"""
         try:
             start = self._parse_date(start_date)
             end = self._parse_date(end_date)
-            term_months = int(re.findall(r'\d+', term)[0])
+            term_months = term if isinstance(term, int) else parse_months(term)
             
-            if start and end:
+            if start and end and term_months is not None:
                 calculated_months = (end.year - start.year) * 12 + (end.month - start.month)
                 
                 if abs(calculated_months - term_months) > 2:  # Allow 2 month variance
@@ -340,11 +442,11 @@ class AnomalyDetectionAgent(BaseAgent):
         related_amount = self._get_field_value(related_doc['fields'], 'total_amount')
         
         if current_amount and related_amount:
-            try:
-                curr_val = float(current_amount.replace(',', '').replace('$', ''))
-                rel_val = float(related_amount.replace(',', '').replace('$', ''))
-                
-                variance = abs(curr_val - rel_val) / rel_val * 100
+            curr_val = self._get_typed_value(fields, 'total_amount')
+            rel_val = self._get_typed_value(related_doc['fields'], 'total_amount')
+            
+            if curr_val is not None and rel_val:
+                variance = float(abs(curr_val - rel_val) / rel_val * 100)
                 
                 if variance > self.thresholds['amount_variance_percent']:
                     return {
@@ -353,8 +455,6 @@ class AnomalyDetectionAgent(BaseAgent):
                         'description': f"Amount variance: {variance:.1f}% between documents ({current_amount} vs {related_amount})",
                         'confidence': min(1.0, variance / 20)  # Normalize to 0-1
                     }
-            except ValueError:
-                pass
         
         return None
     
@@ -364,7 +464,9 @@ class AnomalyDetectionAgent(BaseAgent):
         related_date = self._get_field_value(related_doc['fields'], 'invoice_date') or self._get_field_value(related_doc['fields'], 'effective_date')
         
         if current_date and related_date:
-            return self._check_date_anomaly(current_date, related_date, "cross-document date")
+            current_typed = self._get_typed_value(fields, 'invoice_date') or self._get_typed_value(fields, 'effective_date')
+            related_typed = self._get_typed_value(related_doc['fields'], 'invoice_date') or self._get_typed_value(related_doc['fields'], 'effective_date')
+            return self._check_date_anomaly(current_typed, related_typed, "cross-document date")
         
         return None
     
@@ -375,37 +477,15 @@ class AnomalyDetectionAgent(BaseAgent):
             return value if confidence > 0.5 else None
         return None
     
-    def _parse_date(self, date_str: str) -> Optional[datetime]:
-        """Parse date string to datetime object"""
-        try:
-            # Try different date formats
-            formats = [
-                '%m/%d/%Y', '%m-%d-%Y', '%Y-%m-%d',
-                '%d/%m/%Y', '%d-%m-%Y',
-                '%B %d, %Y', '%b %d, %Y',
-                '%d %B %Y', '%d %b %Y'
-            ]
-            
-            for fmt in formats:
-                try:
-                    return datetime.strptime(date_str, fmt)
-                except ValueError:
-                    continue
-            
-            # Try to extract date from string with regex
-            date_match = re.search(r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})', date_str)
-            if date_match:
-                date_part = date_match.group(1)
-                for fmt in ['%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y', '%d-%m-%Y']:
-                    try:
-                        return datetime.strptime(date_part, fmt)
-                    except ValueError:
-                        continue
-        
-        except Exception:
-            pass
-        
-        return None
+    def _get_typed_value(self, fields: Dict[str, Tuple[str, float]], field_name: str) -> Any:
+        """Normalized value (Decimal, date, months) of a field that passes the confidence gate"""
+        if self._get_field_value(fields, field_name) is None:
+            return None
+        return typed_value(fields[field_name], field_name)
+    
+    def _parse_date(self, date_str) -> Optional[date]:
+        """Typed date, or the shared memoized parse of a date string"""
+        return as_date(date_str)
     
     def _get_related_documents(self, doc_id: str, fields: Dict[str, Tuple[str, float]]) -> List[Dict[str, Any]]:
         """Get related documents based on common fields like PO number"""
@@ -447,17 +527,17 @@ class AnomalyDetectionAgent(BaseAgent):
             }
         return None
     
-    def _check_lease_amount_anomaly(self, lease_amount: str) -> Optional[Dict[str, Any]]:
+    def _check_lease_amount_anomaly(self, lease_amount: str,
+                                    numeric_amount: Optional[Decimal] = None) -> Optional[Dict[str, Any]]:
         """Check lease amount for anomalies"""
-        return self._check_amount_anomaly(lease_amount, "lease amount")
+        return self._check_amount_anomaly(lease_amount, "lease amount", numeric_amount)
     
-    def _check_lease_term_anomaly(self, lease_term: str) -> Optional[Dict[str, Any]]:
-        """Check lease term for anomalies"""
+    def _check_lease_term_anomaly(self, lease_term: str, months: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Check lease term for anomalies, using the normalized months when given"""
         try:
-            term_match = re.search(r'(\d+)', lease_term)
-            if term_match:
-                months = int(term_match.group(1))
-                
+            if months is None:
+                months = parse_months(lease_term)
+            if months is not None:
                 # Check for unrealistic lease terms
                 if months < 1 or months > 600:  # 1 month to 50 years
                     return {
@@ -471,13 +551,13 @@ class AnomalyDetectionAgent(BaseAgent):
         
         return None
     
-    def _check_po_date_anomaly(self, po_date: str) -> Optional[Dict[str, Any]]:
-        """Check PO date for anomalies"""
+    def _check_po_date_anomaly(self, po_date: str, po_day: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """Check PO date for anomalies, using the normalized date when given"""
         try:
-            date_obj = self._parse_date(po_date)
+            date_obj = po_day or self._parse_date(po_date)
             if date_obj:
                 # Check if PO date is in the future
-                if date_obj > datetime.now():
+                if date_obj > date.today():
                     return {
                         'type': 'FUTURE_PO_DATE',
                         'severity': 'MEDIUM',
@@ -486,7 +566,7 @@ class AnomalyDetectionAgent(BaseAgent):
                     }
                 
                 # Check if PO date is too old (more than 2 years)
-                if date_obj < datetime.now() - timedelta(days=730):
+                if date_obj < date.today() - timedelta(days=730):
                     return {
                         'type': 'OLD_PO_DATE',
                         'severity': 'LOW',
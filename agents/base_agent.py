@@ -122,6 +122,24 @@ class BaseAgent(ABC):
         conn.commit()
         conn.close()
     
+    def store_extracted_batch(self, rows: List[tuple]):
+        """Store many (document_id, field_name, field_value, confidence_score) rows in one transaction"""
+        if not rows:
+            return
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO extracted_data
+            (document_id, agent_name, field_name, field_value, confidence_score)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(doc_id, self.agent_name, name, value, confidence)
+              for doc_id, name, value, confidence in rows])
+        
+        conn.commit()
+        conn.close()
+    
     def store_anomaly(self, document_id: str, anomaly_type: str, 
                      severity: str, description: str, confidence_score: float):
         """Store anomaly detection results"""
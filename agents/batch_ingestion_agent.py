@@ -14,6 +14,11 @@ from botocore.exceptions import ClientError
 
 from agents.enhanced_base_agent import EnhancedBaseAgent
 from agents.orchestrator_manager import OrchestratorManager
+from agents.hybrid_extraction import EXTRACTION_PROMPT
+from agents.preflight import preflight_bytes, EDGE_BYTES
+from aws.s3_handler import read_object_edges
+from config.llm_batch import LLMBatchJob, OpenAIBatchExecutor
+from config.llm_usage import llm_call_context
 
 class BatchIngestionAgent(EnhancedBaseAgent):
     """
@@ -122,6 +127,7 @@ class BatchIngestionAgent(EnhancedBaseAgent):
             
             self.log_action("BATCH_PROCESSING", None, "SUCCESS",
                           f"Processed {results['processed']}/{results['total_documents']} documents")
+            self.orchestrator.publish_llm_usage_metrics()
             
             return results
             
@@ -135,6 +141,71 @@ class BatchIngestionAgent(EnhancedBaseAgent):
                 "total": 0
             }
     
+    def backfill_s3_folder(self, bucket_name: str, folder_path: str, executor: Any = None,
+                           work_dir: str = "batch_jobs", recursive: bool = True) -> Dict[str, Any]:
+        """
+        Process an S3 folder with its LLM calls run as one offline bulk job
+        
+        Documents go through the regular workflow with low-confidence
+        fields deferred instead of sent to GPT-4o one call at a time. The
+        deferred prompts are written to JSONL request files, submitted
+        through the executor and the answers joined back to their documents
+        by custom ID ("<document_id>:extraction"). Documents that gain
+        fields have anomaly detection re-run and their stored result
+        refreshed.
+        
+        Args:
+            bucket_name: S3 bucket name
+            folder_path: S3 folder path (prefix)
+            executor: Batch executor; defaults to the OpenAI Batch API.
+                Use LocalBatchExecutor to replay against a mock offline
+            work_dir: Directory for request and response files
+            recursive: Process subfolders recursively
+            
+        Returns:
+            process_s3_folder results, with "llm_fields" (and
+            "result_refreshed" when any merged) per document and an
+            "llm_batch" job report
+        """
+        router = self.orchestrator.extraction_router
+        if router is None:
+            self.logger.info("GPT-4o not configured; backfilling without LLM extraction")
+            return self.process_s3_folder(bucket_name, folder_path, recursive)
+        
+        router.defer = True
+        try:
+            results = self.process_s3_folder(bucket_name, folder_path, recursive)
+        finally:
+            router.defer = False
+        
+        if results.get("status") != "COMPLETED":
+            return results
+        
+        config = self.orchestrator.openai_config
+        job = LLMBatchJob(config, os.path.join(work_dir, results["batch_id"]))
+        deferred_items = [item for item in results["results"] if item.get("deferred_llm")]
+        for item in deferred_items:
+            deferred = item["deferred_llm"]
+            with llm_call_context(router.extraction_agent.agent_name, item["document_id"]):
+                job.add_extraction(f"{item['document_id']}:extraction", deferred["context"],
+                                   EXTRACTION_PROMPT, deferred["fields"])
+        
+        results["llm_batch"] = job.submit(executor or OpenAIBatchExecutor(config.client))
+        
+        for item in deferred_items:
+            deferred = item.pop("deferred_llm")
+            answer = job.extraction(f"{item['document_id']}:extraction")
+            merged = router.apply_deferred(item["document_id"], deferred, answer)
+            item["llm_fields"] = list(merged)
+            if merged:
+                # The stored result was built from the regex values; re-run anomaly detection on the merged ones
+                item["result_refreshed"] = self.orchestrator.refresh_stored_result(item["document_id"], merged)
+        
+        self.log_action("BATCH_LLM_JOB", None, "SUCCESS",
+                      f"{results['llm_batch']['requests']} deferred LLM requests, "
+                      f"{results['llm_batch']['answered']} answered, {results['llm_batch']['cache_hits']} from cache")
+        return results
+    
     def _list_s3_objects(self, bucket_name: str, prefix: str, recursive: bool = True) -> List[str]:
         """List all S3 objects with given prefix"""
         try:
@@ -179,6 +250,18 @@ class BatchIngestionAgent(EnhancedBaseAgent):
             Processing result
         """
         try:
+            # Reject renamed or corrupt objects from their edges before downloading
+            preflight = self._preflight_s3_document(bucket_name, s3_key)
+            if preflight and not preflight["ok"]:
+                self.log_action("S3_PREFLIGHT", None, "REJECTED",
+                              f"{s3_key}: {preflight['reason_code']}")
+                return {
+                    "s3_key": s3_key,
+                    "status": "REJECTED",
+                    "reason_code": preflight["reason_code"],
+                    "error": f"Pre-flight check failed: {preflight['reason_code']} {preflight['detail']}".strip()
+                }
+            
             # Download document to temp file
             temp_dir = "temp_downloads"
             os.makedirs(temp_dir, exist_ok=True)
@@ -216,13 +299,18 @@ class BatchIngestionAgent(EnhancedBaseAgent):
                 pass
             
             if result.get("workflow_status") == "COMPLETED":
-                return {
+                summary = {
                     "s3_key": s3_key,
                     "status": "SUCCESS",
                     "document_id": result.get("document_info", {}).get("document_id"),
                     "anomalies_count": result.get("anomalies", {}).get("count", 0),
                     "processing_time": result.get("processing_time", 0)
                 }
+                # LLM request left for the bulk job in backfill mode
+                deferred = (result.get("extraction_routing") or {}).get("deferred")
+                if deferred:
+                    summary["deferred_llm"] = deferred
+                return summary
             else:
                 return {
                     "s3_key": s3_key,
@@ -238,6 +326,29 @@ class BatchIngestionAgent(EnhancedBaseAgent):
                 "error": str(e)
             }
     
+    def _preflight_s3_document(self, bucket_name: str, s3_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Run pre-flight checks on an S3 object using ranged reads of its edges
+        
+        Reads from the same bucket the download step uses. Returns None when
+        the edges cannot be read, so the document falls through to download.
+        """
+        extension = os.path.splitext(s3_key)[1].lower()
+        
+        if self.s3_handler:
+            edges = self.s3_handler.get_object_edges(s3_key, EDGE_BYTES)
+        else:
+            try:
+                edges = read_object_edges(boto3.client('s3'), bucket_name, s3_key, EDGE_BYTES)
+            except Exception as e:
+                self.logger.warning(f"Pre-flight read failed for {s3_key}: {e}")
+                edges = None
+        
+        if not edges:
+            return None
+        
+        return preflight_bytes(edges["head"], edges["tail"], edges["size"], extension)
+    
     def watch_s3_folder(self, bucket_name: str, folder_path: str, 
                        interval_seconds: int = 60) -> None:
         """
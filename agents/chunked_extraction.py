@@ -0,0 +1,364 @@
+"""
+Chunked Extraction
+Splits long documents into page and section chunks within a token budget,
+extracts fields from the chunks that mention them concurrently and merges
+the answers by confidence
+"""
+
+import contextvars
+import re
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .document_text import DocumentText
+from .line_index import KeywordLineIndex
+
+try:
+    from config.openai_config import CHARS_PER_TOKEN, estimate_tokens
+except ImportError:
+    CHARS_PER_TOKEN = 4
+
+    def estimate_tokens(text: str) -> int:
+        return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+DEFAULT_CHUNK_TOKENS = 1500
+
+# "ARTICLE 4", "Section 2.1", "3. Payment Terms", "TERMINATION" ...
+_SECTION_HEADING = re.compile(
+    r'^[ \t]*(?:(?i:article|section|schedule|exhibit|appendix)\b'
+    r'|\d+(?:\.\d+)*[.)]?[ \t]+[A-Z]'
+    r'|[A-Z][A-Z0-9 ,&/\-]{3,}:?[ \t]*$)'
+)
+
+
+class DocumentChunk:
+    """
+    A run of whole lines of a document
+
+    Lines first_line..last_line (inclusive), i.e. characters start..end of
+    the document text, spanning pages first_page..last_page.
+    """
+
+    __slots__ = ("index", "first_line", "last_line", "start", "end", "first_page", "last_page", "tokens")
+
+    def __init__(self, index: int, doc: DocumentText, first_line: int, last_line: int):
+        self.index = index
+        self.first_line = first_line
+        self.last_line = last_line
+        self.start = doc.line_offsets[first_line]
+        self.end = doc.line_offsets[last_line] + len(doc.lines[last_line])
+        self.first_page = doc.page_of(self.start)
+        self.last_page = doc.page_of(max(self.start, self.end - 1))
+        self.tokens = estimate_tokens(doc.text[self.start:self.end])
+
+    def text(self, doc: DocumentText) -> str:
+        return doc.text[self.start:self.end]
+
+    def __repr__(self) -> str:
+        return (f"DocumentChunk({self.index}, lines {self.first_line}-{self.last_line}, "
+                f"pages {self.first_page}-{self.last_page}, {self.tokens} tokens)")
+
+
+def _sections(doc: DocumentText) -> List[Tuple[int, int]]:
+    """(first, last) line of each section: breaks at pages, headings and paragraphs"""
+    page_first_lines = {doc.line_of(start) for start in doc.page_starts}
+    lines = doc.lines
+    sections = []
+    first = 0
+    for number in range(1, len(lines)):
+        line = lines[number]
+        if (number in page_first_lines or _SECTION_HEADING.match(line)
+                or (line.strip() and not lines[number - 1].strip())):
+            sections.append((first, number - 1))
+            first = number
+    sections.append((first, len(lines) - 1))
+    return sections
+
+
+def chunk_document(document: Union[DocumentText, str, None],
+                   max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[DocumentChunk]:
+    """
+    Split a document into chunks of whole sections within max_tokens
+
+    Consecutive sections are packed into one chunk while they fit; a
+    section larger than the budget is split between lines. A single line
+    larger than the budget becomes a chunk of its own.
+    """
+    doc = DocumentText.coerce(document)
+    budget = max_tokens * CHARS_PER_TOKEN
+    lines = doc.lines
+
+    chunks: List[DocumentChunk] = []
+    first = None
+    size = 0
+    for section_first, section_last in _sections(doc):
+        section_size = sum(len(lines[number]) + 1 for number in range(section_first, section_last + 1))
+        if first is not None and size + section_size > budget:
+            chunks.append(DocumentChunk(len(chunks), doc, first, section_first - 1))
+            first = None
+        if first is None:
+            first, size = section_first, 0
+
+        if section_size <= budget:
+            size += section_size
+            continue
+
+        # Oversized section: fill chunks line by line
+        for number in range(section_first, section_last + 1):
+            line_size = len(lines[number]) + 1
+            if number > first and size + line_size > budget:
+                chunks.append(DocumentChunk(len(chunks), doc, first, number - 1))
+                first, size = number, 0
+            size += line_size
+
+    if first is not None:
+        chunks.append(DocumentChunk(len(chunks), doc, first, len(lines) - 1))
+    return chunks
+
+
+def _no_matches(text: str) -> List[re.Match]:
+    return []
+
+
+def candidate_fields(doc: DocumentText, chunks: List[DocumentChunk],
+                     field_cues: Dict[str, List[str]]) -> Dict[int, List[str]]:
+    """Fields with at least one cue line in each chunk, keyed by chunk index"""
+    first_lines = [chunk.first_line for chunk in chunks]
+    index = KeywordLineIndex(doc, _no_matches, _no_matches)
+    by_chunk: Dict[int, List[str]] = {}
+    for field_name, cues in field_cues.items():
+        hit = {bisect_right(first_lines, line) - 1 for cue in cues for line in index.lines_with(cue)}
+        for chunk_index in sorted(hit):
+            by_chunk.setdefault(chunk_index, []).append(field_name)
+    return by_chunk
+
+
+def relevant_context(document: Union[DocumentText, str, None], cues: List[str],
+                     max_tokens: int) -> str:
+    """
+    The chunks that best cover the cues, within max_tokens
+
+    Chunks mentioning the most distinct cues are taken first and joined in
+    document order, separated by '...'. Falls back to the leading text when
+    no cue occurs.
+    """
+    doc = DocumentText.coerce(document)
+    chunks = chunk_document(doc, max(1, min(DEFAULT_CHUNK_TOKENS, max_tokens // 2)))
+    first_lines = [chunk.first_line for chunk in chunks]
+    index = KeywordLineIndex(doc, _no_matches, _no_matches)
+
+    cues_by_chunk: Dict[int, set] = {}
+    for cue in cues:
+        for line in index.lines_with(cue):
+            cues_by_chunk.setdefault(bisect_right(first_lines, line) - 1, set()).add(cue)
+    if not cues_by_chunk:
+        return doc.text[:max_tokens * CHARS_PER_TOKEN]
+
+    chosen = []
+    total = 0
+    for chunk_index in sorted(cues_by_chunk, key=lambda i: (-len(cues_by_chunk[i]), i)):
+        chunk = chunks[chunk_index]
+        if total + chunk.tokens > max_tokens and chosen:
+            continue
+        chosen.append(chunk)
+        total += chunk.tokens
+    chosen.sort(key=lambda chunk: chunk.index)
+    return "\n...\n".join(chunk.text(doc) for chunk in chosen)[:max_tokens * CHARS_PER_TOKEN]
+
+
+def merge_candidates(answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Most confident candidate per field across chunk answers
+
+    Answers are in document order and ties keep the earlier candidate, so
+    a single answer comes back unchanged.
+    """
+    merged: Dict[str, Any] = {}
+    best: Dict[str, float] = {}
+    for answer in answers:
+        for field_name, candidate in answer.items():
+            confidence = -1.0
+            if isinstance(candidate, dict) and candidate.get("value") not in (None, ""):
+                try:
+                    confidence = float(candidate.get("confidence") or 0.0)
+                except (TypeError, ValueError):
+                    confidence = 0.0
+            if field_name not in merged or confidence > best[field_name]:
+                merged[field_name] = candidate
+                best[field_name] = confidence
+    return merged
+
+
+class ChunkedExtractor:
+    """
+    Map-reduce LLM extraction for long documents
+
+    Documents that fit in one chunk are sent whole in a single call. Longer
+    ones are chunked by page and section; each chunk is sent with only the
+    fields whose cues (label keywords) occur in it, chunks mentioning none
+    of the fields are skipped, and the calls run concurrently. Fields no
+    chunk mentions are sent together with the document context ranked for
+    them, so none is dropped. Answers are merged by confidence.
+    """
+
+    def __init__(self, llm: Any, max_chunk_tokens: int = DEFAULT_CHUNK_TOKENS, max_workers: int = 4):
+        """
+        Args:
+            llm: OpenAIConfig (or anything with extract_with_gpt4o)
+            max_chunk_tokens: Token budget of one chunk's text
+            max_workers: Chunks extracted at the same time
+        """
+        self.llm = llm
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            "documents": 0,
+            "chunks": 0,
+            "chunks_sent": 0,
+            "chunks_skipped": 0,
+            "llm_failures": 0,
+            "fields_uncovered": 0,
+            "full_document_tokens": 0,
+            "prompt_tokens": 0,
+            "llm_seconds": 0.0,
+            "sequential_llm_seconds": 0.0
+        }
+
+    def extract(self, document: Union[DocumentText, str, None], extraction_prompt: str,
+                expected_fields: List[str],
+                field_cues: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+        """
+        Extract fields from a document, chunk by chunk
+
+        Args:
+            document: Document text
+            extraction_prompt: Prompt for extraction
+            expected_fields: Field names to extract
+            field_cues: Label keywords locating each field; defaults to the
+                field name with spaces ("due_date" -> "due date")
+
+        Returns:
+            {"fields": merged extract_with_gpt4o answer, "report": chunk,
+            token and latency figures for this document}. tokens_saved
+            counts against every token actually sent, including the
+            context of fields no chunk mentioned.
+        """
+        doc = DocumentText.coerce(document)
+        chunks = chunk_document(doc, self.max_chunk_tokens)
+        uncovered: List[str] = []
+
+        if len(chunks) == 1:
+            requests = [(doc.text, "", list(expected_fields))]
+        else:
+            cues = {
+                field_name: (field_cues or {}).get(field_name) or [field_name.replace('_', ' ')]
+                for field_name in expected_fields
+            }
+            by_chunk = candidate_fields(doc, chunks, cues)
+            requests = [
+                (chunk.text(doc),
+                 f"The text is part {chunk.index + 1} of {len(chunks)} of the document "
+                 f"(pages {chunk.first_page}-{chunk.last_page}); set fields it does not contain to null.",
+                 by_chunk[chunk.index])
+                for chunk in chunks if chunk.index in by_chunk
+            ]
+            covered = {field_name for field_names in by_chunk.values() for field_name in field_names}
+            uncovered = [field_name for field_name in expected_fields if field_name not in covered]
+            if uncovered:
+                requests.append((
+                    self._uncovered_context(doc, uncovered, cues),
+                    "The text is excerpts of the document; set fields it does not contain to null.",
+                    uncovered
+                ))
+
+        start = time.perf_counter()
+        if len(requests) > 1 and self.max_workers > 1:
+            # Each worker runs in a copy of the caller's context, keeping its LLM call attribution
+            contexts = [contextvars.copy_context() for _ in requests]
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(requests))) as executor:
+                results = list(executor.map(
+                    lambda context, request: context.run(
+                        self._extract_chunk, extraction_prompt, *request
+                    ),
+                    contexts, requests
+                ))
+        else:
+            results = [self._extract_chunk(extraction_prompt, *request) for request in requests]
+        wall = time.perf_counter() - start
+
+        report = {
+            "chunks": len(chunks),
+            "chunks_sent": len(requests) - (1 if uncovered else 0),
+            "chunks_skipped": len(chunks) - len(requests) + (1 if uncovered else 0),
+            "llm_failures": sum(1 for answer, _ in results if not answer),
+            "fields_uncovered": len(uncovered),
+            "full_document_tokens": estimate_tokens(doc.text),
+            "prompt_tokens": sum(estimate_tokens(text) for text, _, _ in requests),
+            "llm_seconds": wall,
+            "sequential_llm_seconds": sum(seconds for _, seconds in results)
+        }
+        report["tokens_saved"] = report["full_document_tokens"] - report["prompt_tokens"]
+        report["latency_saved_seconds"] = report["sequential_llm_seconds"] - wall
+        self._record(report)
+
+        return {"fields": merge_candidates([answer for answer, _ in results]), "report": report}
+
+    def _uncovered_context(self, doc: DocumentText, field_names: List[str],
+                           cues: Dict[str, List[str]]) -> str:
+        """
+        Context for fields no chunk mentions, within the chunk budget
+
+        Ranked by the LLM's PromptContextBuilder when it has one (which also
+        matches parts of field names, "monthly_rent" -> "Rent:"), otherwise
+        by the fields' cues, falling back to the leading text.
+        """
+        builder = getattr(self.llm, "context_builder", None)
+        if builder is not None:
+            return builder.build(doc, field_names, self.max_chunk_tokens)
+        return relevant_context(doc, [cue for field_name in field_names for cue in cues[field_name]],
+                                self.max_chunk_tokens)
+
+    def _extract_chunk(self, extraction_prompt: str, text: str, note: str,
+                       field_names: List[str]) -> Tuple[Dict[str, Any], float]:
+        """One extraction call for a chunk's text; ({}, seconds) on failure"""
+        prompt = extraction_prompt + (f"\n\n{note}" if note else "")
+
+        start = time.perf_counter()
+        try:
+            answer = self.llm.extract_with_gpt4o(text, prompt, field_names)
+        except Exception:
+            answer = {}
+        return (answer if isinstance(answer, dict) else {}), time.perf_counter() - start
+
+    def _record(self, report: Dict[str, Any]):
+        with self._lock:
+            self._stats["documents"] += 1
+            for key in ("chunks", "chunks_sent", "chunks_skipped", "llm_failures", "fields_uncovered",
+                        "full_document_tokens",
+                        "prompt_tokens", "llm_seconds", "sequential_llm_seconds"):
+                self._stats[key] += report[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Chunk counts with token and latency savings across documents"""
+        with self._lock:
+            report = dict(self._stats)
+
+        full = report["full_document_tokens"]
+        report["tokens_saved"] = full - report["prompt_tokens"]
+        report["token_savings_rate"] = report["tokens_saved"] / full if full else 0.0
+        report["latency_saved_seconds"] = report["sequential_llm_seconds"] - report["llm_seconds"]
+        return report
+
+    def reset_stats(self):
+        """Zero all counters"""
+        with self._lock:
+            self._stats = self._empty_stats()
@@ -1,13 +1,21 @@
 """
 Contract-Invoice Comparison Agent
 Specialized agent for detecting anomalies between lease contracts and invoices
-Uses GPT-4o for context-aware comparison
+Uses GPT-4o for context-aware comparison, off the critical path
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+import json
+import os
 import re
+import threading
 from agents.enhanced_base_agent import EnhancedBaseAgent
+from agents.document_text import DocumentText
+from agents.field_match import FieldMatch
+from agents.normalization import typed_value
+from agents.chunked_extraction import estimate_tokens, relevant_context
 
 class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
     """
@@ -18,21 +26,44 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
     - Surplus payments (overpayments)
     - Missed payments (underpayments)
     - Schedule misalignment
+    
+    compare() runs only the deterministic rules. When they find anomalies
+    and GPT-4o is available, semantic analysis is queued on a background
+    executor, and its parsed anomalies reach the caller through the
+    on_semantic_analysis callback.
     """
     
+    # Keywords of the sections worth sending for semantic analysis
+    TERM_CUES = ["rent", "payment", "amount", "fee", "term", "effective", "expir",
+                 "terminat", "renew", "due", "late", "escalat", "total"]
+    
+    # Anomaly fields accepted from GPT-4o, and the severities it may assign
+    SEMANTIC_FIELDS = ("type", "subtype", "severity", "description", "confidence")
+    SEVERITIES = ("LOW", "MEDIUM", "HIGH")
+    
     def __init__(self):
         super().__init__("ContractInvoiceComparisonAgent")
+        
+        # Semantic analyses in flight, by invoice ID; workers start on first use
+        self.semantic_workers = int(os.getenv("SEMANTIC_ANALYSIS_WORKERS", "2"))
+        self._semantic_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_analyses: Dict[str, Future] = {}
+        self._semantic_lock = threading.Lock()
     
-    def compare(self, contract_data: Dict[str, Any], invoice_data: Dict[str, Any]) -> Dict[str, Any]:
+    def compare(self, contract_data: Dict[str, Any], invoice_data: Dict[str, Any],
+                on_semantic_analysis: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
         Compare contract and invoice to detect anomalies
         
         Args:
             contract_data: Contract document data with extracted fields
             invoice_data: Invoice document data with extracted fields
+            on_semantic_analysis: Called from a background thread with the
+                semantic analysis update (status, anomalies) once GPT-4o answers
             
         Returns:
-            Dict containing comparison results and detected anomalies
+            Dict containing comparison results and detected anomalies;
+            "semantic_analysis" is {"status": "PENDING"} while GPT-4o runs
         """
         try:
             contract_id = contract_data.get("contract_id") or contract_data.get("document_id")
@@ -71,12 +102,6 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
             misalignment_anomalies = self._detect_schedule_misalignment(contract_fields, invoice_fields, contract_id, invoice_id)
             anomalies.extend(misalignment_anomalies)
             
-            # Use GPT-4o for semantic analysis if available
-            if self.openai_config and anomalies:
-                semantic_analysis = self._analyze_with_gpt4o(contract_data, invoice_data, anomalies)
-                if semantic_analysis:
-                    anomalies.extend(semantic_analysis)
-            
             # Store comparison in DynamoDB
             if self.dynamodb_handler and contract_id and invoice_id:
                 self.store_contract_invoice_mapping(contract_id, invoice_id, {
@@ -89,9 +114,16 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
                 "invoice_id": invoice_id,
                 "anomalies_detected": len(anomalies),
                 "anomalies": anomalies,
-                "comparison_status": "SUCCESS"
+                "comparison_status": "SUCCESS",
+                "semantic_analysis": None
             }
             
+            # GPT-4o semantic analysis runs after the rule-based result is returned
+            if anomalies and self.openai_config and self.openai_config.is_available():
+                self._schedule_semantic_analysis(contract_data, invoice_data, list(anomalies),
+                                                 on_semantic_analysis)
+                result["semantic_analysis"] = {"status": "PENDING"}
+            
             self.log_action("CONTRACT_INVOICE_COMPARISON", invoice_id, "SUCCESS",
                           f"Detected {len(anomalies)} anomalies")
             
@@ -113,8 +145,8 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
         
         # Check if invoice date is outside contract effective period
         if contract_effective and invoice_date:
-            contract_start = self._parse_date(contract_effective)
-            invoice_dt = self._parse_date(invoice_date)
+            contract_start = self._get_typed_value(contract_fields, "effective_date")
+            invoice_dt = self._get_typed_value(invoice_fields, "invoice_date")
             
             if contract_start and invoice_dt:
                 if invoice_dt < contract_start:
@@ -129,8 +161,8 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
                     })
         
         if contract_expiration and invoice_date:
-            contract_end = self._parse_date(contract_expiration)
-            invoice_dt = self._parse_date(invoice_date)
+            contract_end = self._get_typed_value(contract_fields, "expiration_date")
+            invoice_dt = self._get_typed_value(invoice_fields, "invoice_date")
             
             if contract_end and invoice_dt:
                 if invoice_dt > contract_end:
@@ -155,8 +187,8 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
         invoice_amount = self._get_field_value(invoice_fields, "total_amount")
         
         if lease_amount and invoice_amount:
-            lease_val = self._parse_amount(lease_amount)
-            invoice_val = self._parse_amount(invoice_amount)
+            lease_val = self._get_typed_amount(contract_fields, "lease_amount")
+            invoice_val = self._get_typed_amount(invoice_fields, "total_amount")
             
             if lease_val and invoice_val:
                 variance_percent = abs((invoice_val - lease_val) / lease_val * 100)
@@ -190,8 +222,8 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
         lease_term = self._get_field_value(contract_fields, "lease_term")
         
         if contract_effective and invoice_date and lease_term:
-            contract_start = self._parse_date(contract_effective)
-            invoice_dt = self._parse_date(invoice_date)
+            contract_start = self._get_typed_value(contract_fields, "effective_date")
+            invoice_dt = self._get_typed_value(invoice_fields, "invoice_date")
             
             if contract_start and invoice_dt:
                 days_diff = (invoice_dt - contract_start).days
@@ -222,8 +254,8 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
         invoice_amount = self._get_field_value(invoice_fields, "total_amount")
         
         if lease_amount and invoice_amount:
-            lease_val = self._parse_amount(lease_amount)
-            invoice_val = self._parse_amount(invoice_amount)
+            lease_val = self._get_typed_amount(contract_fields, "lease_amount")
+            invoice_val = self._get_typed_amount(invoice_fields, "total_amount")
             
             if lease_val and invoice_val and invoice_val > lease_val:
                 surplus = invoice_val - lease_val
@@ -252,8 +284,8 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
         invoice_amount = self._get_field_value(invoice_fields, "total_amount")
         
         if lease_amount and invoice_amount:
-            lease_val = self._parse_amount(lease_amount)
-            invoice_val = self._parse_amount(invoice_amount)
+            lease_val = self._get_typed_amount(contract_fields, "lease_amount")
+            invoice_val = self._get_typed_amount(invoice_fields, "total_amount")
             
             if lease_val and invoice_val and invoice_val < lease_val:
                 shortfall = lease_val - invoice_val
@@ -284,8 +316,8 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
         invoice_date = self._get_field_value(invoice_fields, "invoice_date")
         
         if contract_effective and invoice_date:
-            contract_start = self._parse_date(contract_effective)
-            invoice_dt = self._parse_date(invoice_date)
+            contract_start = self._get_typed_value(contract_fields, "effective_date")
+            invoice_dt = self._get_typed_value(invoice_fields, "invoice_date")
             
             if contract_start and invoice_dt:
                 # Expected payment dates (monthly on same day)
@@ -305,18 +337,79 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
         
         return anomalies
     
+    def _schedule_semantic_analysis(self, contract_data: Dict, invoice_data: Dict,
+                                    detected_anomalies: List[Dict],
+                                    callback: Optional[Callable[[Dict[str, Any]], None]]):
+        """Queue GPT-4o analysis of a comparison on the background executor"""
+        invoice_id = invoice_data.get("document_id")
+        with self._semantic_lock:
+            if self._semantic_executor is None:
+                self._semantic_executor = ThreadPoolExecutor(max_workers=self.semantic_workers,
+                                                             thread_name_prefix="semantic-analysis")
+            future = self._semantic_executor.submit(self._run_semantic_analysis, contract_data,
+                                                    invoice_data, detected_anomalies, callback)
+            self._pending_analyses[invoice_id] = future
+        future.add_done_callback(lambda done: self._forget_analysis(invoice_id, done))
+    
+    def _forget_analysis(self, invoice_id: str, future: Future):
+        with self._semantic_lock:
+            if self._pending_analyses.get(invoice_id) is future:
+                del self._pending_analyses[invoice_id]
+    
+    def _run_semantic_analysis(self, contract_data: Dict, invoice_data: Dict,
+                               detected_anomalies: List[Dict],
+                               callback: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """Background task: analyze, then hand the parsed anomalies to the callback"""
+        contract_id = contract_data.get("contract_id") or contract_data.get("document_id")
+        invoice_id = invoice_data.get("document_id")
+        anomalies = self._analyze_with_gpt4o(contract_data, invoice_data, detected_anomalies)
+        update = {
+            "contract_id": contract_id,
+            "invoice_id": invoice_id,
+            "status": "FAILED" if anomalies is None else "COMPLETED",
+            "anomalies": anomalies or [],
+            "completed_at": datetime.utcnow().isoformat()
+        }
+        
+        self.log_action("SEMANTIC_ANALYSIS", invoice_id, update["status"],
+                      f"{len(update['anomalies'])} additional anomalies")
+        if self.dynamodb_handler and contract_id and invoice_id and update["anomalies"]:
+            self.store_contract_invoice_mapping(contract_id, invoice_id, {
+                "anomalies_count": len(detected_anomalies) + len(update["anomalies"]),
+                "semantic_anomalies_count": len(update["anomalies"]),
+                "compared_at": update["completed_at"]
+            })
+        
+        if callback:
+            try:
+                callback(update)
+            except Exception as e:
+                self.logger.error(f"Error delivering semantic analysis for {invoice_id}: {e}")
+        return update
+    
+    def wait_for_semantic_analysis(self, timeout: Optional[float] = None) -> int:
+        """Block until queued semantic analyses finish; returns how many are still running"""
+        with self._semantic_lock:
+            pending = list(self._pending_analyses.values())
+        _, not_done = wait(pending, timeout=timeout)
+        return len(not_done)
+    
     def _analyze_with_gpt4o(self, contract_data: Dict, invoice_data: Dict, 
-                            detected_anomalies: List[Dict]) -> List[Dict[str, Any]]:
-        """Use GPT-4o for semantic analysis of contract-invoice relationship"""
+                            detected_anomalies: List[Dict]) -> Optional[List[Dict[str, Any]]]:
+        """Use GPT-4o for semantic analysis of contract-invoice relationship; None if it failed"""
         if not self.openai_config:
             return []
         
         try:
-            contract_text = contract_data.get("text_content", "")
-            invoice_text = invoice_data.get("text_content", "")
+            contract_text = DocumentText.coerce(
+                contract_data.get("document_text") or contract_data.get("text_content", "")
+            )
+            invoice_text = DocumentText.coerce(
+                invoice_data.get("document_text") or invoice_data.get("text_content", "")
+            )
             
             analysis_prompt = f"""Analyze the relationship between this lease contract and invoice.
-            Already detected anomalies: {len(detected_anomalies)}
+            Already detected anomalies: {', '.join(a['type'] for a in detected_anomalies)}
             
             Look for:
             1. Payment schedule mismatches
@@ -325,26 +418,92 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
             4. Terms and conditions discrepancies
             5. Additional anomalies not yet detected
             
-            Return any additional anomalies found as a JSON list."""
+            Return any additional anomalies found as a JSON list of objects with
+            "type", "severity" (LOW, MEDIUM or HIGH), "description" and "confidence"
+            (0.0 to 1.0). Return [] if there are none."""
             
             result = self.analyze_with_gpt4o(
-                f"Contract: {contract_text[:2000]}\n\nInvoice: {invoice_text[:2000]}",
-                analysis_prompt
+                f"Contract: {self._field_context(contract_data, contract_text)}\n\n"
+                f"Invoice: {self._field_context(invoice_data, invoice_text)}",
+                analysis_prompt,
+                document_id=invoice_data.get("document_id")
             )
             
-            # Parse GPT-4o response for additional anomalies
-            # This is simplified - actual implementation would parse JSON response
-            return []
+            if not result:
+                return None
+            return self._parse_semantic_anomalies(result.get("analysis", ""))
             
         except Exception as e:
             self.logger.error(f"Error in GPT-4o analysis: {e}")
+            return None
+    
+    def _parse_semantic_anomalies(self, analysis: str) -> List[Dict[str, Any]]:
+        """Anomalies from GPT-4o's JSON answer, normalized to the rule-based shape"""
+        content = analysis or ""
+        if "```" in content:
+            content = content.split("```")[1]
+            content = content[4:] if content.startswith("json") else content
+        try:
+            parsed = json.loads(content.strip() or "[]")
+        except ValueError:
+            self.logger.warning("GPT-4o semantic analysis was not JSON; no anomalies added")
             return []
+        if isinstance(parsed, dict):
+            parsed = parsed.get("anomalies", [])
+        if not isinstance(parsed, list):
+            return []
+        
+        anomalies = []
+        for item in parsed:
+            if not isinstance(item, dict) or not item.get("description"):
+                continue
+            anomaly = {name: item[name] for name in self.SEMANTIC_FIELDS if name in item}
+            anomaly["type"] = str(anomaly.get("type") or "SEMANTIC_ANOMALY").upper()
+            severity = str(anomaly.get("severity", "")).upper()
+            anomaly["severity"] = severity if severity in self.SEVERITIES else "MEDIUM"
+            try:
+                anomaly["confidence"] = min(1.0, max(0.0, float(anomaly.get("confidence", 0.6))))
+            except (TypeError, ValueError):
+                anomaly["confidence"] = 0.6
+            anomaly["source"] = "GPT4O_SEMANTIC"
+            anomalies.append(anomaly)
+        return anomalies
+    
+    def _field_context(self, document_data: Dict, doc: DocumentText, max_tokens: int = 500) -> str:
+        """
+        Snippets around each located field, falling back to the term-bearing lines
+        
+        Sends the lines that produced the extracted values, or else the
+        lines ranked most relevant to contract terms and the extracted
+        fields by the shared context builder (whose line index is cached
+        per document, so a contract compared with many invoices is indexed
+        once), instead of the first characters of the document.
+        """
+        snippets = []
+        tokens = 0
+        for field_name, field in document_data.get("extracted_fields", {}).items():
+            if isinstance(field, FieldMatch) and field.span:
+                snippet = " ".join(field.snippet(doc, context=120).split())
+                snippet = f"[{field_name}, page {field.page}] ...{snippet}..."
+                # Whole snippets only, within the token budget
+                if tokens + estimate_tokens(snippet) > max_tokens:
+                    break
+                snippets.append(snippet)
+                tokens += estimate_tokens(snippet)
+        
+        if not snippets:
+            builder = self.openai_config.context_builder if self.openai_config else None
+            if builder is None:
+                return relevant_context(doc, self.TERM_CUES, max_tokens)
+            keywords = self.TERM_CUES + list(document_data.get("extracted_fields", {}))
+            return builder.build(doc, keywords, max_tokens)
+        return "\n".join(snippets)
     
     def _get_field_value(self, fields: Dict[str, Any], field_name: str) -> Optional[str]:
         """Extract field value"""
         if field_name in fields:
             field_data = fields[field_name]
-            if isinstance(field_data, tuple):
+            if isinstance(field_data, (tuple, FieldMatch)):
                 return field_data[0]
             elif isinstance(field_data, dict):
                 return field_data.get("value")
@@ -352,37 +511,16 @@ class ContractInvoiceComparisonAgent(EnhancedBaseAgent):
                 return field_data
         return None
     
-    def _parse_date(self, date_str: str) -> Optional[datetime]:
-        """Parse date string to datetime object"""
-        if not date_str:
+    def _get_typed_value(self, fields: Dict[str, Any], field_name: str) -> Any:
+        """Normalized value (date, Decimal, months) from extraction or the shared parsers"""
+        if field_name not in fields:
             return None
-        
-        # Common date formats
-        formats = [
-            "%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y",
-            "%Y/%m/%d", "%m-%d-%Y", "%d-%m-%Y"
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str.strip(), fmt)
-            except ValueError:
-                continue
-        
-        return None
+        return typed_value(fields[field_name], field_name)
     
-    def _parse_amount(self, amount_str: str) -> Optional[float]:
-        """Parse amount string to float"""
-        if not amount_str:
-            return None
-        
-        # Remove currency symbols and commas
-        cleaned = amount_str.replace("$", "").replace(",", "").strip()
-        
-        try:
-            return float(cleaned)
-        except ValueError:
-            return None
+    def _get_typed_amount(self, fields: Dict[str, Any], field_name: str) -> Optional[float]:
+        """Normalized amount as a float, matching the numbers reported in anomalies"""
+        amount = self._get_typed_value(fields, field_name)
+        return float(amount) if amount is not None else None
     
     def process(self, document_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process method required by base class - not used for comparison agent"""
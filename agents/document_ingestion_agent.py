@@ -4,9 +4,11 @@ Handles document upload, routing, and initial processing
 """
 
 import os
+import re
 import hashlib
+import zipfile
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 import PyPDF2
 import docx
 from PIL import Image
@@ -20,6 +22,30 @@ except ImportError:
     pytesseract = None
 
 from .base_agent import BaseAgent
+from .document_text import DocumentText
+from .docx_stream import extract_docx_text
+from .layout_template import layout_fingerprint
+from .preflight import preflight_file, MAX_FILE_SIZE, UNREADABLE
+
+# Keywords per document type, in tie-break priority order
+DOCUMENT_TYPE_KEYWORDS = {
+    "INVOICE": ['invoice', 'bill', 'payment due', 'amount due', 'total amount'],
+    "CONTRACT": ['contract', 'agreement', 'lease', 'terms and conditions', 'party'],
+    "PURCHASE_ORDER": ['purchase order', 'po number', 'po#', 'order number'],
+    "RECEIPT": ['receipt', 'payment received', 'thank you for payment'],
+}
+
+_KEYWORD_TO_TYPE = {
+    keyword: doc_type
+    for doc_type, keywords in DOCUMENT_TYPE_KEYWORDS.items()
+    for keyword in keywords
+}
+
+# One alternation over every keyword, longest first so multi-word phrases win
+_KEYWORD_PATTERN = re.compile(
+    "|".join(re.escape(k) for k in sorted(_KEYWORD_TO_TYPE, key=len, reverse=True)),
+    re.IGNORECASE
+)
 
 class DocumentIngestionAgent(BaseAgent):
     """Handles document ingestion and initial processing"""
@@ -27,6 +53,12 @@ class DocumentIngestionAgent(BaseAgent):
     def __init__(self):
         super().__init__("DocumentIngestionAgent")
         self.supported_formats = ['.pdf', '.docx', '.doc', '.jpg', '.jpeg', '.png', '.tiff']
+        
+        # Classification stops scanning after this many characters (and at each
+        # further multiple) once the leading type is decisive
+        self.classification_prefix_chars = 4000
+        self.classification_min_hits = 3
+        self.classification_decisive_ratio = 3.0
     
     def process(self, document_path: str) -> Dict[str, Any]:
         """
@@ -42,26 +74,36 @@ class DocumentIngestionAgent(BaseAgent):
             self.logger.info(f"Processing document: {document_path}")
             
             # Validate file
-            if not self._validate_document(document_path):
-                return {"error": "Invalid document format or corrupted file"}
+            validation = self._validate_document(document_path)
+            if not validation["ok"]:
+                self.log_action("DOCUMENT_PREFLIGHT", None, "REJECTED",
+                              f"{validation['reason_code']}: {validation['detail']}")
+                return {
+                    "error": f"Invalid document format or corrupted file ({validation['reason_code']})",
+                    "reason_code": validation["reason_code"]
+                }
             
             # Generate document ID
             doc_id = self._generate_document_id(document_path)
             
             # Extract text content
-            text_content = self._extract_text(document_path)
+            document_text = self._extract_text(document_path)
+            text_content = document_text.text
             
             # Extract metadata
             metadata = self._extract_metadata(document_path)
             
             # Determine document type
-            doc_type = self._classify_document(text_content, metadata)
+            doc_type, type_scores = self._classify_document(text_content, metadata)
             
             result = {
                 "document_id": doc_id,
                 "document_type": doc_type,
+                "classification_scores": type_scores,
                 "file_path": document_path,
                 "text_content": text_content,
+                "document_text": document_text,
+                "layout_fingerprint": layout_fingerprint(document_text),
                 "metadata": metadata,
                 "processing_status": "SUCCESS"
             }
@@ -76,25 +118,20 @@ class DocumentIngestionAgent(BaseAgent):
             self.log_action("DOCUMENT_INGESTION", "UNKNOWN", "ERROR", str(e))
             return {"error": f"Processing failed: {str(e)}"}
     
-    def _validate_document(self, document_path: str) -> bool:
-        """Validate document format and integrity"""
+    def _validate_document(self, document_path: str) -> Dict[str, Any]:
+        """
+        Validate document format and integrity
+        
+        Checks extension, size, magic bytes and container structure using
+        only the first and last few KB of the file.
+        
+        Returns:
+            Pre-flight result dict with ok and reason_code
+        """
         try:
-            if not os.path.exists(document_path):
-                return False
-            
-            file_extension = Path(document_path).suffix.lower()
-            if file_extension not in self.supported_formats:
-                return False
-            
-            # Check file size (max 50MB)
-            file_size = os.path.getsize(document_path)
-            if file_size > 50 * 1024 * 1024:
-                return False
-            
-            return True
-            
-        except Exception:
-            return False
+            return preflight_file(document_path, MAX_FILE_SIZE)
+        except Exception as e:
+            return {"ok": False, "reason_code": UNREADABLE, "detected_format": None, "detail": str(e)}
     
     def _generate_document_id(self, document_path: str) -> str:
         """Generate unique document ID based on file content hash"""
@@ -106,7 +143,7 @@ class DocumentIngestionAgent(BaseAgent):
         except Exception:
             return f"DOC_{hash(document_path) % 1000000:06d}"
     
-    def _extract_text(self, document_path: str) -> str:
+    def _extract_text(self, document_path: str) -> DocumentText:
         """Extract text content from document"""
         file_extension = Path(document_path).suffix.lower()
         
@@ -114,29 +151,35 @@ class DocumentIngestionAgent(BaseAgent):
             if file_extension == '.pdf':
                 return self._extract_pdf_text(document_path)
             elif file_extension in ['.docx', '.doc']:
-                return self._extract_docx_text(document_path)
+                return DocumentText(self._extract_docx_text(document_path))
             elif file_extension in ['.jpg', '.jpeg', '.png', '.tiff']:
-                return self._extract_image_text(document_path)
+                return DocumentText(self._extract_image_text(document_path))
             else:
-                return ""
+                return DocumentText("")
         except Exception as e:
             self.logger.error(f"Error extracting text from {document_path}: {str(e)}")
-            return ""
+            return DocumentText("")
     
-    def _extract_pdf_text(self, document_path: str) -> str:
-        """Extract text from PDF document"""
-        text = ""
+    def _extract_pdf_text(self, document_path: str) -> DocumentText:
+        """Extract text from PDF document, keeping page boundaries"""
+        pages = []
         try:
             with open(document_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+                    pages.append((page.extract_text() or "").strip())
         except Exception as e:
             self.logger.error(f"Error extracting PDF text: {str(e)}")
-        return text.strip()
+        return DocumentText.from_pages(pages)
     
     def _extract_docx_text(self, document_path: str) -> str:
-        """Extract text from DOCX document"""
+        """Extract text from DOCX document, including tables, headers and footers"""
+        if zipfile.is_zipfile(document_path):
+            try:
+                return extract_docx_text(document_path)
+            except Exception as e:
+                self.logger.warning(f"Streaming DOCX extraction failed, using python-docx: {str(e)}")
+        
         try:
             doc = docx.Document(document_path)
             text = ""
@@ -176,30 +219,39 @@ class DocumentIngestionAgent(BaseAgent):
             self.logger.error(f"Error extracting metadata: {str(e)}")
             return {}
     
-    def _classify_document(self, text_content: str, metadata: Dict[str, Any]) -> str:
-        """Classify document type based on content and filename"""
-        text_lower = text_content.lower()
-        filename_lower = metadata.get("file_name", "").lower()
+    def _classify_document(self, text_content: str, metadata: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        """
+        Classify document type based on content and filename
         
-        # Invoice indicators
-        invoice_keywords = ['invoice', 'bill', 'payment due', 'amount due', 'total amount']
-        if any(keyword in text_lower or keyword in filename_lower for keyword in invoice_keywords):
-            return "INVOICE"
+        Scores every type in a single pass of one precompiled keyword
+        alternation. The highest score wins; ties fall back to the
+        INVOICE > CONTRACT > PURCHASE_ORDER > RECEIPT priority order.
         
-        # Contract indicators
-        contract_keywords = ['contract', 'agreement', 'lease', 'terms and conditions', 'party']
-        if any(keyword in text_lower or keyword in filename_lower for keyword in contract_keywords):
-            return "CONTRACT"
+        Returns:
+            Tuple of (document type, keyword hit count per type)
+        """
+        scores = {doc_type: 0 for doc_type in DOCUMENT_TYPE_KEYWORDS}
         
-        # Purchase Order indicators
-        po_keywords = ['purchase order', 'po number', 'po#', 'order number']
-        if any(keyword in text_lower or keyword in filename_lower for keyword in po_keywords):
-            return "PURCHASE_ORDER"
+        for match in _KEYWORD_PATTERN.finditer(metadata.get("file_name", "")):
+            scores[_KEYWORD_TO_TYPE[match.group(0).lower()]] += 1
         
-        # Receipt indicators
-        receipt_keywords = ['receipt', 'payment received', 'thank you for payment']
-        if any(keyword in text_lower or keyword in filename_lower for keyword in receipt_keywords):
-            return "RECEIPT"
+        checkpoint = self.classification_prefix_chars
+        for match in _KEYWORD_PATTERN.finditer(text_content):
+            if match.start() >= checkpoint:
+                if self._is_decisive(scores):
+                    break
+                checkpoint += self.classification_prefix_chars
+            scores[_KEYWORD_TO_TYPE[match.group(0).lower()]] += 1
         
-        return "UNKNOWN"
-
+        best_type = max(scores, key=scores.get)
+        if scores[best_type] == 0:
+            return "UNKNOWN", scores
+        
+        return best_type, scores
+    
+    def _is_decisive(self, scores: Dict[str, int]) -> bool:
+        """Check whether the leading type is far enough ahead to stop scanning"""
+        ranked = sorted(scores.values(), reverse=True)
+        top, runner_up = ranked[0], ranked[1]
+        return (top >= self.classification_min_hits and
+                top >= runner_up * self.classification_decisive_ratio)
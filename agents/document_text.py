@@ -0,0 +1,106 @@
+"""
+Document Text
+Page-aware text container built once at ingestion and shared across agents
+"""
+
+from bisect import bisect_right
+from typing import List, Optional, Union
+
+
+class DocumentText:
+    """
+    Holds document text with lazily computed views
+
+    The lowercase view, line split and line offsets are computed on first
+    access and reused by every agent, so no stage has to re-normalize or
+    re-split the full text.
+    """
+
+    __slots__ = ("text", "page_starts", "_lower", "_lines", "_lower_lines", "_line_offsets")
+
+    def __init__(self, text: str, page_starts: Optional[List[int]] = None):
+        self.text = text or ""
+        self.page_starts = page_starts or [0]
+        self._lower = None
+        self._lines = None
+        self._lower_lines = None
+        self._line_offsets = None
+
+    @classmethod
+    def from_pages(cls, pages: List[str]) -> "DocumentText":
+        """Join page texts with newlines, recording where each page starts"""
+        page_starts = []
+        offset = 0
+        for page in pages:
+            page_starts.append(offset)
+            offset += len(page) + 1
+        return cls("\n".join(pages), page_starts)
+
+    @classmethod
+    def coerce(cls, value: Union["DocumentText", str, None]) -> "DocumentText":
+        """Return value as a DocumentText, wrapping plain strings"""
+        if isinstance(value, DocumentText):
+            return value
+        return cls(value or "")
+
+    @property
+    def lower(self) -> str:
+        """Lowercase view of the full text"""
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def lines(self) -> List[str]:
+        """Text split on newlines"""
+        if self._lines is None:
+            self._lines = self.text.split('\n')
+        return self._lines
+
+    @property
+    def lower_lines(self) -> List[str]:
+        """Lowercase view split on newlines, aligned with lines"""
+        if self._lower_lines is None:
+            self._lower_lines = self.lower.split('\n')
+        return self._lower_lines
+
+    @property
+    def line_offsets(self) -> List[int]:
+        """Character offset at which each line starts"""
+        if self._line_offsets is None:
+            offsets = []
+            offset = 0
+            for line in self.lines:
+                offsets.append(offset)
+                offset += len(line) + 1
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages (1 for sources without page structure)"""
+        return len(self.page_starts)
+
+    def line_of(self, offset: int) -> int:
+        """Index of the line containing a character offset"""
+        return max(0, bisect_right(self.line_offsets, offset) - 1)
+
+    def page_of(self, offset: int) -> int:
+        """1-based page number containing a character offset"""
+        return max(1, bisect_right(self.page_starts, offset))
+
+    def page_text(self, page_number: int) -> str:
+        """Text of a single 1-based page"""
+        start = self.page_starts[page_number - 1]
+        if page_number < len(self.page_starts):
+            return self.text[start:self.page_starts[page_number] - 1]
+        return self.text[start:]
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"DocumentText(chars={len(self.text)}, pages={self.page_count})"
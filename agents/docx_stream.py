@@ -0,0 +1,125 @@
+"""
+Streaming DOCX Text Extraction
+Reads word/document.xml and header/footer parts incrementally, emitting
+paragraphs and table rows in document order without building a full DOM
+"""
+
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Tuple
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_P = W_NS + "p"
+_T = W_NS + "t"
+_TAB = W_NS + "tab"
+_BR = W_NS + "br"
+_CR = W_NS + "cr"
+_TC = W_NS + "tc"
+_TR = W_NS + "tr"
+_TBL = W_NS + "tbl"
+
+_HEADER_PART = re.compile(r"^word/header\d*\.xml$")
+_FOOTER_PART = re.compile(r"^word/footer\d*\.xml$")
+
+# Separator placed between table cells when a row is emitted as one line
+CELL_SEPARATOR = " | "
+
+
+def iter_docx_blocks(document_path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (kind, text) blocks from a DOCX file in reading order
+
+    kind is one of "header", "paragraph", "table_row" or "footer".
+    Header parts come first, then the body, then footer parts.
+
+    Args:
+        document_path: Path to the .docx file
+
+    Yields:
+        Tuples of block kind and its text
+    """
+    with zipfile.ZipFile(document_path) as archive:
+        names = archive.namelist()
+        headers = sorted(n for n in names if _HEADER_PART.match(n))
+        footers = sorted(n for n in names if _FOOTER_PART.match(n))
+
+        for part in headers:
+            for _, text in _iter_part(archive, part):
+                yield "header", text
+
+        if "word/document.xml" in names:
+            yield from _iter_part(archive, "word/document.xml")
+
+        for part in footers:
+            for _, text in _iter_part(archive, part):
+                yield "footer", text
+
+
+def extract_docx_text(document_path: str) -> str:
+    """Extract all text from a DOCX file, one block per line"""
+    return "\n".join(text for _, text in iter_docx_blocks(document_path)).strip()
+
+
+def _iter_part(archive: zipfile.ZipFile, part_name: str) -> Iterator[Tuple[str, str]]:
+    """Stream one XML part, clearing elements as soon as they are consumed"""
+    table_depth = 0
+    row_cells: List[List[str]] = []
+    cell_paragraphs: List[List[str]] = []
+    open_elements: List[ET.Element] = []
+
+    with archive.open(part_name) as stream:
+        for event, element in ET.iterparse(stream, events=("start", "end")):
+            tag = element.tag
+
+            if event == "start":
+                open_elements.append(element)
+                if tag == _TBL:
+                    table_depth += 1
+                elif tag == _TR:
+                    row_cells.append([])
+                elif tag == _TC:
+                    cell_paragraphs.append([])
+                continue
+
+            if tag == _P:
+                text = _paragraph_text(element)
+                if table_depth and cell_paragraphs:
+                    if text:
+                        cell_paragraphs[-1].append(text)
+                elif text:
+                    yield "paragraph", text
+                element.clear()
+            elif tag == _TC:
+                paragraphs = cell_paragraphs.pop() if cell_paragraphs else []
+                if row_cells:
+                    row_cells[-1].append(" ".join(paragraphs))
+                element.clear()
+            elif tag == _TR:
+                cells = row_cells.pop() if row_cells else []
+                if any(cells):
+                    yield "table_row", CELL_SEPARATOR.join(cells)
+                element.clear()
+            elif tag == _TBL:
+                table_depth -= 1
+                element.clear()
+
+            open_elements.pop()
+
+            # Detach finished blocks and rows so the tree never grows
+            if open_elements and (tag == _TR or (tag in (_P, _TBL) and not table_depth)):
+                open_elements[-1].remove(element)
+
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    """Concatenate the runs of a paragraph element"""
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == _T:
+            parts.append(node.text or "")
+        elif node.tag == _TAB:
+            parts.append("\t")
+        elif node.tag in (_BR, _CR):
+            parts.append("\n")
+    return "".join(parts).strip()
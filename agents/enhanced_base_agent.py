@@ -16,6 +16,8 @@ from aws.s3_handler import S3Handler
 from aws.dynamodb_handler import DynamoDBHandler
 from aws.cloudwatch_handler import CloudWatchHandler
 from config.openai_config import OpenAIConfig
+from config.llm_usage import llm_call_context
+from agents.chunked_extraction import ChunkedExtractor
 
 class EnhancedBaseAgent(ABC):
     """Enhanced base class for all agents with GPT-4o and AWS integration"""
@@ -44,6 +46,9 @@ class EnhancedBaseAgent(ABC):
             self.logger.warning(f"OpenAI not available: {e}")
             self.openai_config = None
         
+        # Map-reduce extraction over page/section chunks of long documents
+        self.chunked_extractor = ChunkedExtractor(self.openai_config) if self.openai_config else None
+        
         # Context storage for contract-invoice relationships
         self.context_store = {}
     
@@ -120,32 +125,55 @@ class EnhancedBaseAgent(ABC):
             return False
     
     def extract_with_gpt4o(self, text: str, extraction_prompt: str, 
-                           expected_fields: list) -> Dict[str, Any]:
-        """Extract structured data using GPT-4o"""
+                           expected_fields: list,
+                           field_cues: Optional[Dict[str, List[str]]] = None,
+                           document_id: str = None) -> Dict[str, Any]:
+        """
+        Extract structured data using GPT-4o
+        
+        Long documents are split into page/section chunks; only chunks that
+        mention a field (by its cues) are sent, concurrently, fields no chunk
+        mentions go with ranked context, and the answers are merged by confidence. Calls are recorded in the usage ledger
+        under this agent and document_id.
+        """
         if not self.openai_config:
             self.logger.warning("OpenAI not configured, falling back to regex")
             return {}
+        if not self.openai_config.is_available():
+            self.logger.warning("GPT-4o circuit breaker open, falling back to regex")
+            return {}
         
         try:
-            extracted = self.openai_config.extract_with_gpt4o(
-                text, extraction_prompt, expected_fields
-            )
-            self.log_action("GPT4O_EXTRACTION", None, "SUCCESS", 
-                          f"Extracted {len(extracted)} fields")
+            with llm_call_context(self.agent_name, document_id):
+                result = self.chunked_extractor.extract(text, extraction_prompt, expected_fields, field_cues)
+            extracted = result["fields"]
+            report = result["report"]
+            self.log_action("GPT4O_EXTRACTION", document_id, "SUCCESS", 
+                          f"Extracted {len(extracted)} fields from {report['chunks_sent']}/{report['chunks']} "
+                          f"chunks ({report['fields_uncovered']} fields sent with ranked context), "
+                          f"{report['tokens_saved']} tokens saved")
             return extracted
         except Exception as e:
             self.logger.error(f"Error with GPT-4o extraction: {e}")
             return {}
     
-    def analyze_with_gpt4o(self, text: str, analysis_prompt: str) -> Dict[str, Any]:
-        """Analyze document using GPT-4o"""
+    def analyze_with_gpt4o(self, text: str, analysis_prompt: str,
+                           document_id: str = None) -> Dict[str, Any]:
+        """Analyze document using GPT-4o, recording the call under this agent and document_id"""
         if not self.openai_config:
             self.logger.warning("OpenAI not configured")
             return {}
+        if not self.openai_config.is_available():
+            self.logger.warning("GPT-4o circuit breaker open, skipping analysis")
+            return {}
         
         try:
-            result = self.openai_config.analyze_with_gpt4o(text, analysis_prompt)
-            self.log_action("GPT4O_ANALYSIS", None, "SUCCESS")
+            with llm_call_context(self.agent_name, document_id):
+                result = self.openai_config.analyze_with_gpt4o(text, analysis_prompt)
+            usage = result.get("usage") or {}
+            self.log_action("GPT4O_ANALYSIS", document_id, "SUCCESS" if result else "FAILED",
+                          f"{usage.get('prompt_tokens') or 0} prompt + "
+                          f"{usage.get('completion_tokens') or 0} completion tokens")
             return result
         except Exception as e:
             self.logger.error(f"Error with GPT-4o analysis: {e}")
@@ -7,10 +7,61 @@ import re
 from typing import Dict, Any, List, Tuple, Optional
 from datetime import datetime
 from .base_agent import BaseAgent
+from .document_text import DocumentText
+from .field_match import FieldMatch
+from .normalization import FIELD_TYPES, normalize_value, parse_months
+from .pattern_registry import PatternRegistry
+from .line_index import KeywordLineIndex
+from .layout_template import (TEMPLATE_DOCUMENT_TYPES, TemplateStore, apply_template,
+                              build_template, layout_fingerprint)
+from .extraction_cache import ExtractionCache
+from .result_store import compute_pipeline_version
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+DATE_PATTERN = r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})'
+ISO_DATE_PATTERN = r'(\d{4}[\/\-]\d{1,2}[\/\-]\d{1,2})'
+AMOUNT_PATTERN = r'\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)'
+DOCUMENT_NUMBER_PATTERN = r'([A-Z]*\d{3,})'
+
+# Batch extraction plan per document type: (field, method, source), where
+# source is a pattern name for "pattern" and a field_keywords key otherwise
+BATCH_FIELD_SPECS = {
+    "INVOICE": [
+        ('invoice_number', 'pattern', 'invoice_number'),
+        ('po_number', 'pattern', 'po_number'),
+        ('invoice_date', 'date', 'invoice_date'),
+        ('due_date', 'date', 'due_date'),
+        ('total_amount', 'amount', 'invoice_total'),
+        ('vendor_name', 'pattern', 'vendor')
+    ],
+    "CONTRACT": [
+        ('contract_number', 'pattern', 'contract_number'),
+        ('effective_date', 'date', 'effective_date'),
+        ('expiration_date', 'date', 'expiration_date'),
+        ('lease_amount', 'pattern', 'lease_amount'),
+        ('lease_term', 'pattern', 'lease_term'),
+        ('parties', 'parties', 'parties')
+    ],
+    "PURCHASE_ORDER": [
+        ('po_number', 'pattern', 'po_number'),
+        ('po_date', 'date', 'po_date'),
+        ('total_amount', 'amount', 'po_total'),
+        ('vendor_name', 'pattern', 'vendor')
+    ]
+}
+GENERIC_BATCH_FIELDS = ['document_number', 'document_date', 'amount']
 
 class ExtractionAgent(BaseAgent):
     """Extracts structured data from document text"""
     
+    # Bump when extraction logic changes in a way that invalidates cached fields
+    EXTRACTION_REVISION = "3"
+    
     def __init__(self):
         super().__init__("ExtractionAgent")
         
@@ -40,10 +91,13 @@ class ExtractionAgent(BaseAgent):
                 r'amount\s*:?\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',
                 r'due\s*:?\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)'
             ],
+            # Name runs are capped: unbounded lazy runs ending in (?:\n|$) rescan
+            # the rest of the text from every keyword and go quadratic on long
+            # OCR output (see benchmark_regex_audit.py)
             'vendor': [
-                r'from\s*:?\s*([A-Za-z\s&.,]+?)(?:\n|$)',
-                r'vendor\s*:?\s*([A-Za-z\s&.,]+?)(?:\n|$)',
-                r'bill\s*to\s*:?\s*([A-Za-z\s&.,]+?)(?:\n|$)'
+                r'from\s*:?\s*([A-Za-z\s&.,]{1,200}?)(?:\n|$)',
+                r'vendor\s*:?\s*([A-Za-z\s&.,]{1,200}?)(?:\n|$)',
+                r'bill\s*to\s*:?\s*([A-Za-z\s&.,]{1,200}?)(?:\n|$)'
             ],
             'lease_amount': [
                 r'lease\s*payment\s*:?\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',
@@ -56,6 +110,77 @@ class ExtractionAgent(BaseAgent):
                 r'duration\s*:?\s*(\d+)\s*(?:months?|years?)'
             ]
         }
+        
+        # Keywords anchoring line-based date and amount fields, in priority order
+        self.field_keywords = {
+            'invoice_date': ['invoice date', 'bill date', 'date'],
+            'due_date': ['due date', 'payment due', 'due by'],
+            'invoice_total': ['total', 'amount due', 'invoice total'],
+            'effective_date': ['effective date', 'start date', 'commencement'],
+            'expiration_date': ['expiration date', 'end date', 'termination'],
+            'po_date': ['order date', 'po date', 'date'],
+            'po_total': ['total amount', 'order total', 'total']
+        }
+        
+        self.pattern_registry = self._build_pattern_registry()
+        
+        # Digest of everything that determines extracted fields
+        self.pattern_version = compute_pipeline_version(
+            self.EXTRACTION_REVISION,
+            [(name, self.pattern_registry.group(name).sources) for name in self.pattern_registry.names()],
+            self.field_keywords
+        )
+        
+        # Fields of previously seen text, dropped when the pattern version changes
+        self.use_cache = True
+        self.extraction_cache = ExtractionCache(self.db_path)
+        self.extraction_cache.purge_stale(self.pattern_version)
+        
+        # Remembered field positions of recurring layouts, retired when patterns change
+        self.use_templates = True
+        self.template_store = TemplateStore(self.db_path)
+    
+    def _build_pattern_registry(self) -> PatternRegistry:
+        """Compile every extraction pattern once, with its flags"""
+        registry = PatternRegistry()
+        
+        for field_name, patterns in self.patterns.items():
+            registry.register(field_name, patterns, re.IGNORECASE)
+        
+        registry.register('contract_number', [
+            r'contract\s*#?\s*:?\s*([A-Z0-9\-]+)',
+            r'agreement\s*#?\s*:?\s*([A-Z0-9\-]+)'
+        ], re.IGNORECASE)
+        registry.register('parties', [
+            r'between\s+([A-Za-z\s&.,]{1,200}?)\s+and\s+([A-Za-z\s&.,]{1,200}?)(?:\n|$)',
+            r'party\s+([A-Za-z\s&.,]{1,200}?)(?:\n|$)'
+        ], re.IGNORECASE | re.MULTILINE)
+        registry.register('document_number', DOCUMENT_NUMBER_PATTERN)
+        registry.register('date_value', DATE_PATTERN)
+        registry.register('iso_date_value', ISO_DATE_PATTERN)
+        registry.register('amount_value', AMOUNT_PATTERN)
+        
+        return registry
+    
+    def get_pattern_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-pattern hit counts and timings"""
+        return self.pattern_registry.get_stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Extraction cache hits, misses, evictions and hit rate"""
+        return self.extraction_cache.get_stats()
+    
+    def get_template_stats(self) -> Dict[str, Any]:
+        """Layout template hits, failures and learned layouts"""
+        return self.template_store.get_stats()
+    
+    def build_line_index(self, doc: DocumentText) -> KeywordLineIndex:
+        """Shared keyword and per-line match index for one document"""
+        return KeywordLineIndex(
+            doc,
+            lambda text: self.pattern_registry.matches('date_value', text),
+            lambda text: self.pattern_registry.matches('amount_value', text)
+        )
     
     def process(self, document_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -69,23 +194,29 @@ class ExtractionAgent(BaseAgent):
         """
         try:
             doc_id = document_data.get("document_id")
-            text_content = document_data.get("text_content", "")
+            document_text = DocumentText.coerce(
+                document_data.get("document_text") or document_data.get("text_content", "")
+            )
             doc_type = document_data.get("document_type", "UNKNOWN")
             
             self.logger.info(f"Extracting data from {doc_type} document: {doc_id}")
             
-            # Extract fields based on document type
-            extracted_fields = {}
+            # Text already extracted under the current patterns is served from the cache
+            fingerprint = document_data.get("layout_fingerprint")
+            extracted_fields = None
+            if self.use_cache:
+                extracted_fields = self.extraction_cache.get(document_text, doc_type, self.pattern_version)
             
-            if doc_type == "INVOICE":
-                extracted_fields = self._extract_invoice_fields(text_content)
-            elif doc_type == "CONTRACT":
-                extracted_fields = self._extract_contract_fields(text_content)
-            elif doc_type == "PURCHASE_ORDER":
-                extracted_fields = self._extract_po_fields(text_content)
+            if extracted_fields is not None:
+                extraction_path = "cache"
             else:
-                # Generic extraction for unknown types
-                extracted_fields = self._extract_generic_fields(text_content)
+                extracted_fields, extraction_path, fingerprint = self._extract_fields(
+                    document_text, doc_type, fingerprint
+                )
+                if self.use_cache:
+                    self.extraction_cache.put(document_text, doc_type, self.pattern_version, extracted_fields)
+            
+            self._normalize_fields(extracted_fields, document_text)
             
             # Store extracted data
             for field_name, (value, confidence) in extracted_fields.items():
@@ -96,6 +227,9 @@ class ExtractionAgent(BaseAgent):
                 "document_id": doc_id,
                 "document_type": doc_type,
                 "extracted_fields": extracted_fields,
+                "document_text": document_text,
+                "layout_fingerprint": fingerprint,
+                "extraction_path": extraction_path,
                 "extraction_status": "SUCCESS"
             }
             
@@ -110,206 +244,531 @@ class ExtractionAgent(BaseAgent):
             self.log_action("DATA_EXTRACTION", doc_id, "ERROR", str(e))
             return {"error": f"Extraction failed: {str(e)}"}
     
-    def _extract_invoice_fields(self, text: str) -> Dict[str, Tuple[str, float]]:
+    def process_batch(self, documents: List[Dict[str, Any]], store: bool = True) -> Dict[str, Any]:
+        """
+        Extract fields from many documents at once
+        
+        Each field's compiled patterns run across the whole column of texts
+        with pandas string methods instead of once per document.
+        
+        Args:
+            documents: Document data dicts from the ingestion agent
+            store: Persist non-empty values to the extracted_data table
+        
+        Returns:
+            Columnar result: document_ids, document_types, and per field
+            aligned "values" and "confidences" arrays ("" and 0.0 where the
+            field was not found or does not apply to the document type),
+            plus a "normalized" array of typed values (None where empty)
+            for date, amount and months fields
+        """
+        try:
+            doc_ids = [document.get("document_id") for document in documents]
+            doc_types = [document.get("document_type", "UNKNOWN") for document in documents]
+            texts = [
+                DocumentText.coerce(
+                    document.get("document_text") or document.get("text_content", "")
+                ).text
+                for document in documents
+            ]
+        
+            self.logger.info(f"Batch extracting {len(documents)} documents")
+        
+            if PANDAS_AVAILABLE:
+                fields = self._extract_batch_vectorized(texts, doc_types)
+            else:
+                fields = self._extract_batch_per_document(texts, doc_types)
+            self._normalize_batch(fields, texts)
+        
+            if store:
+                self.store_extracted_batch([
+                    (doc_ids[row], field_name, value, column["confidences"][row])
+                    for field_name, column in fields.items()
+                    for row, value in enumerate(column["values"])
+                    if value
+                ])
+        
+            self.log_action("BATCH_EXTRACTION", None, "SUCCESS",
+                          f"Extracted {len(fields)} fields from {len(documents)} documents")
+        
+            return {
+                "document_ids": doc_ids,
+                "document_types": doc_types,
+                "fields": fields,
+                "document_count": len(documents),
+                "extraction_status": "SUCCESS"
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error in batch extraction: {str(e)}")
+            self.log_action("BATCH_EXTRACTION", None, "ERROR", str(e))
+            return {"error": f"Batch extraction failed: {str(e)}"}
+    
+    def _normalize_batch(self, fields: Dict[str, Dict[str, Any]], texts: List[str]):
+        """Typed values of date, amount and months columns, as _normalize_fields attaches per document"""
+        month_patterns = {
+            field_name: source
+            for specs in BATCH_FIELD_SPECS.values()
+            for field_name, method, source in specs
+            if method == 'pattern' and FIELD_TYPES.get(field_name) == 'months'
+        }
+        for field_name, column in fields.items():
+            if field_name in month_patterns:
+                column["normalized"] = [self._batch_months(texts[row], month_patterns[field_name]) if value else None
+                                        for row, value in enumerate(column["values"])]
+            elif FIELD_TYPES.get(field_name) is not None:
+                column["normalized"] = [normalize_value(field_name, value) if value else None
+                                        for value in column["values"]]
+    
+    def _batch_months(self, text: str, pattern_name: str) -> Optional[int]:
+        """Months of a pattern field, read with the unit that follows its number as _normalize_fields does"""
+        value, _, span = self.pattern_registry.first_match(pattern_name, text)
+        if not value:
+            return None
+        start = span[0] + len(value) - len(value.lstrip())
+        return parse_months(text[start:start + len(value.strip()) + 16])
+    
+    def _batch_field_names(self) -> List[str]:
+        """Every field a batch can produce, in a stable order"""
+        names = []
+        for specs in BATCH_FIELD_SPECS.values():
+            for field_name, _, _ in specs:
+                if field_name not in names:
+                    names.append(field_name)
+        return names + GENERIC_BATCH_FIELDS
+    
+    def _extract_batch_per_document(self, texts: List[str], doc_types: List[str]) -> Dict[str, Dict[str, list]]:
+        """Columnar result built document by document (used when pandas is unavailable)"""
+        count = len(texts)
+        fields = {name: {"values": [""] * count, "confidences": [0.0] * count}
+                  for name in self._batch_field_names()}
+        
+        for row, (text, doc_type) in enumerate(zip(texts, doc_types)):
+            doc = DocumentText(text)
+            if doc_type == "INVOICE":
+                extracted = self._extract_invoice_fields(self.build_line_index(doc))
+            elif doc_type == "CONTRACT":
+                extracted = self._extract_contract_fields(self.build_line_index(doc))
+            elif doc_type == "PURCHASE_ORDER":
+                extracted = self._extract_po_fields(self.build_line_index(doc))
+            else:
+                extracted = self._extract_generic_fields(doc)
+        
+            for field_name, (value, confidence) in extracted.items():
+                fields[field_name]["values"][row] = value
+                fields[field_name]["confidences"][row] = confidence
+        
+        return fields
+    
+    def _extract_batch_vectorized(self, texts: List[str], doc_types: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Columnar result built with one pandas pass per pattern alternative"""
+        text_series = pd.Series(texts, dtype=object)
+        type_series = pd.Series(doc_types, dtype=object)
+        
+        columns = {name: (pd.Series("", index=text_series.index, dtype=object),
+                          pd.Series(0.0, index=text_series.index))
+                   for name in self._batch_field_names()}
+        
+        for doc_type, specs in BATCH_FIELD_SPECS.items():
+            subset = text_series[type_series == doc_type]
+            if subset.empty:
+                continue
+        
+            # Lines are split and lowercased once and shared by every keyword field
+            lines = subset.str.split('\n').explode()
+            lower_lines = lines.str.lower()
+        
+            for field_name, method, source in specs:
+                if method == 'pattern':
+                    found = self._batch_first_pattern(subset, source)
+                elif method == 'parties':
+                    found = self._batch_parties(subset)
+                elif method == 'date':
+                    found = self._batch_date_field(subset, lines, lower_lines, self.field_keywords[source])
+                else:
+                    found = self._batch_amount_field(subset, lines, lower_lines, self.field_keywords[source])
+        
+                values, confidences = columns[field_name]
+                for found_values, confidence in found:
+                    values.loc[found_values.index] = found_values
+                    confidences.loc[found_values.index] = confidence
+        
+        generic = text_series[~type_series.isin(list(BATCH_FIELD_SPECS))]
+        if not generic.empty:
+            for field_name, found_values, confidence in self._batch_generic_fields(generic):
+                values, confidences = columns[field_name]
+                values.loc[found_values.index] = found_values
+                confidences.loc[found_values.index] = confidence
+        
+        return {
+            name: {"values": values.to_numpy(), "confidences": confidences.to_numpy()}
+            for name, (values, confidences) in columns.items()
+        }
+    
+    def _batch_first_pattern(self, texts: "pd.Series", pattern_name: str) -> List[tuple]:
+        """Vectorized _extract_with_patterns: first non-empty match in priority order"""
+        group = self.pattern_registry.group(pattern_name)
+        remaining = texts
+        found = []
+        
+        for source in group.sources:
+            if remaining.empty:
+                break
+            values = remaining.str.extract(source, flags=group.flags, expand=False).str.strip()
+            hit = values.notna() & (values != "")
+            found.append(values[hit])
+            remaining = remaining[~hit]
+        
+        return [(pd.concat(found) if found else pd.Series(dtype=object), 0.9)]
+    
+    def _batch_parties(self, texts: "pd.Series") -> List[tuple]:
+        """Vectorized _extract_parties"""
+        group = self.pattern_registry.group('parties')
+        remaining = texts
+        found = []
+        
+        for source in group.sources:
+            if remaining.empty:
+                break
+            groups = remaining.str.extract(source, flags=group.flags, expand=True)
+            hit = groups[0].notna()
+            if hit.any():
+                found.append(groups[hit].fillna("").agg(" and ".join, axis=1).str.strip())
+                remaining = remaining[~hit]
+        
+        return [(pd.concat(found) if found else pd.Series(dtype=object), 0.8)]
+    
+    def _batch_keyword_lines(self, lines: "pd.Series", lower_lines: "pd.Series",
+                             keywords: List[str], pick) -> "pd.Series":
+        """First keyword-anchored value per document, trying keywords in priority order"""
+        resolved = []
+        unresolved = lines.index.unique()
+        
+        for keyword in keywords:
+            candidates = lines[lower_lines.str.contains(keyword.lower(), regex=False)
+                               & lines.index.isin(unresolved)]
+            values = pick(candidates).dropna()
+            # Document order is preserved by explode, so the first hit per document wins
+            first = values.groupby(level=0, sort=False).first()
+            resolved.append(first)
+            unresolved = unresolved.difference(first.index)
+        
+        return pd.concat(resolved) if resolved else pd.Series(dtype=object)
+    
+    def _batch_date_field(self, texts: "pd.Series", lines: "pd.Series",
+                          lower_lines: "pd.Series", keywords: List[str]) -> List[tuple]:
+        """Vectorized _extract_date_field"""
+        anchored = self._batch_keyword_lines(
+            lines, lower_lines, keywords,
+            lambda candidates: candidates.str.extract(DATE_PATTERN, expand=False)
+        )
+        
+        # Fallback: first date anywhere in the document
+        rest = texts[~texts.index.isin(anchored.index)]
+        fallback = rest.str.extract(DATE_PATTERN, expand=False).dropna()
+        
+        return [(anchored, 0.9), (fallback, 0.6)]
+    
+    def _batch_amount_field(self, texts: "pd.Series", lines: "pd.Series",
+                            lower_lines: "pd.Series", keywords: List[str]) -> List[tuple]:
+        """Vectorized _extract_amount_field"""
+        def last_amount(candidates):
+            amounts = candidates.str.findall(AMOUNT_PATTERN)
+            return amounts[amounts.str.len() > 0].str[-1]
+        
+        anchored = self._batch_keyword_lines(lines, lower_lines, keywords, last_amount)
+        
+        # Fallback: largest amount in the document (first one on ties)
+        rest = texts[~texts.index.isin(anchored.index)]
+        amounts = rest.str.findall(AMOUNT_PATTERN).explode().dropna()
+        if amounts.empty:
+            return [(anchored, 0.9)]
+        
+        frame = pd.DataFrame({"row": amounts.index, "value": amounts.to_numpy()})
+        frame["numeric"] = frame["value"].str.replace(',', '', regex=False).astype(float)
+        largest = frame.loc[frame.groupby("row", sort=False)["numeric"].idxmax()]
+        fallback = pd.Series(largest["value"].to_numpy(), index=largest["row"].to_numpy(), dtype=object)
+        
+        return [(anchored, 0.9), (fallback, 0.7)]
+    
+    def _batch_generic_fields(self, texts: "pd.Series") -> List[tuple]:
+        """Vectorized _extract_generic_fields"""
+        numbers = texts.str.extract(DOCUMENT_NUMBER_PATTERN, expand=False).dropna()
+        
+        dates = texts.str.extract(DATE_PATTERN, expand=False)
+        dates = dates.fillna(texts.str.extract(ISO_DATE_PATTERN, expand=False)).dropna()
+        
+        amounts = texts.str.extract(AMOUNT_PATTERN, expand=False).dropna()
+        
+        return [
+            ('document_number', numbers, 0.7),
+            ('document_date', dates, 0.8),
+            ('amount', amounts, 0.8)
+        ]
+    
+    def _extract_fields(self, doc: DocumentText, doc_type: str, fingerprint: Optional[str]
+                        ) -> Tuple[Dict[str, FieldMatch], str, Optional[str]]:
+        """
+        Extract fields through the template fast path or the per-type cascade
+        
+        Returns:
+            Tuple of (fields, "template" or "generic", layout fingerprint)
+        """
+        # Known layouts are extracted positionally from their template
+        extracted_fields = None
+        if self.use_templates and doc_type in TEMPLATE_DOCUMENT_TYPES:
+            fingerprint = fingerprint or layout_fingerprint(doc)
+            if fingerprint:
+                extracted_fields = self._extract_from_template(fingerprint, doc_type, doc)
+        if extracted_fields is not None:
+            return extracted_fields, "template", fingerprint
+        
+        # Extract fields based on document type
+        if doc_type == "INVOICE":
+            extracted_fields = self._extract_invoice_fields(self.build_line_index(doc))
+        elif doc_type == "CONTRACT":
+            extracted_fields = self._extract_contract_fields(self.build_line_index(doc))
+        elif doc_type == "PURCHASE_ORDER":
+            extracted_fields = self._extract_po_fields(self.build_line_index(doc))
+        else:
+            # Generic extraction for unknown types
+            extracted_fields = self._extract_generic_fields(doc)
+        
+        if fingerprint and self.use_templates and doc_type in TEMPLATE_DOCUMENT_TYPES:
+            self.template_store.observe(
+                fingerprint, doc_type, self.pattern_version,
+                build_template(extracted_fields, doc, self.pattern_registry)
+            )
+        
+        return extracted_fields, "generic", fingerprint
+    
+    def _extract_from_template(self, fingerprint: str, doc_type: str,
+                               doc: DocumentText) -> Optional[Dict[str, FieldMatch]]:
+        """Positional extraction for a known layout; None sends the document down the generic path"""
+        template = self.template_store.get(fingerprint, doc_type, self.pattern_version)
+        if template is None:
+            self.template_store.record("no_template")
+            return None
+        
+        fields = apply_template(template, doc, self.pattern_registry)
+        if fields is None:
+            self.template_store.record("template_failures")
+            return None
+        self.template_store.record("template_hits")
+        
+        # Fields the layout doesn't pin are resolved one by one on the generic path
+        index = None
+        for field_name, method, source in BATCH_FIELD_SPECS[doc_type]:
+            if fields.get(field_name) is not None:
+                continue
+            if method == 'pattern':
+                fields[field_name] = self._extract_with_patterns(doc, source)
+            elif method == 'parties':
+                fields[field_name] = self._extract_parties(doc)
+            else:
+                index = index or self.build_line_index(doc)
+                extract = self._extract_date_field if method == 'date' else self._extract_amount_field
+                fields[field_name] = extract(index, self.field_keywords[source])
+        
+        return fields
+    
+    def _extract_invoice_fields(self, index: KeywordLineIndex) -> Dict[str, FieldMatch]:
         """Extract fields specific to invoices"""
+        doc = index.doc
         fields = {}
         
         # Invoice number
-        invoice_num = self._extract_with_patterns(text, self.patterns['invoice_number'])
+        invoice_num = self._extract_with_patterns(doc, 'invoice_number')
         fields['invoice_number'] = invoice_num
         
         # PO number
-        po_num = self._extract_with_patterns(text, self.patterns['po_number'])
+        po_num = self._extract_with_patterns(doc, 'po_number')
         fields['po_number'] = po_num
         
         # Invoice date
-        invoice_date = self._extract_date_field(text, ['invoice date', 'bill date', 'date'])
+        invoice_date = self._extract_date_field(index, self.field_keywords['invoice_date'])
         fields['invoice_date'] = invoice_date
         
         # Due date
-        due_date = self._extract_date_field(text, ['due date', 'payment due', 'due by'])
+        due_date = self._extract_date_field(index, self.field_keywords['due_date'])
         fields['due_date'] = due_date
         
         # Amount
-        amount = self._extract_amount_field(text, ['total', 'amount due', 'invoice total'])
+        amount = self._extract_amount_field(index, self.field_keywords['invoice_total'])
         fields['total_amount'] = amount
         
         # Vendor
-        vendor = self._extract_with_patterns(text, self.patterns['vendor'])
+        vendor = self._extract_with_patterns(doc, 'vendor')
         fields['vendor_name'] = vendor
         
         return fields
     
-    def _extract_contract_fields(self, text: str) -> Dict[str, Tuple[str, float]]:
+    def _extract_contract_fields(self, index: KeywordLineIndex) -> Dict[str, FieldMatch]:
         """Extract fields specific to contracts"""
+        doc = index.doc
         fields = {}
         
         # Contract number
-        contract_num = self._extract_with_patterns(text, [
-            r'contract\s*#?\s*:?\s*([A-Z0-9\-]+)',
-            r'agreement\s*#?\s*:?\s*([A-Z0-9\-]+)'
-        ])
+        contract_num = self._extract_with_patterns(doc, 'contract_number')
         fields['contract_number'] = contract_num
         
         # Effective date
-        effective_date = self._extract_date_field(text, ['effective date', 'start date', 'commencement'])
+        effective_date = self._extract_date_field(index, self.field_keywords['effective_date'])
         fields['effective_date'] = effective_date
         
         # Expiration date
-        expiration_date = self._extract_date_field(text, ['expiration date', 'end date', 'termination'])
+        expiration_date = self._extract_date_field(index, self.field_keywords['expiration_date'])
         fields['expiration_date'] = expiration_date
         
         # Lease amount
-        lease_amount = self._extract_with_patterns(text, self.patterns['lease_amount'])
+        lease_amount = self._extract_with_patterns(doc, 'lease_amount')
         fields['lease_amount'] = lease_amount
         
         # Lease term
-        lease_term = self._extract_with_patterns(text, self.patterns['lease_term'])
+        lease_term = self._extract_with_patterns(doc, 'lease_term')
         fields['lease_term'] = lease_term
         
         # Parties
-        parties = self._extract_parties(text)
+        parties = self._extract_parties(doc)
         fields['parties'] = parties
         
         return fields
     
-    def _extract_po_fields(self, text: str) -> Dict[str, Tuple[str, float]]:
+    def _extract_po_fields(self, index: KeywordLineIndex) -> Dict[str, FieldMatch]:
         """Extract fields specific to purchase orders"""
+        doc = index.doc
         fields = {}
         
         # PO number
-        po_num = self._extract_with_patterns(text, self.patterns['po_number'])
+        po_num = self._extract_with_patterns(doc, 'po_number')
         fields['po_number'] = po_num
         
         # PO date
-        po_date = self._extract_date_field(text, ['order date', 'po date', 'date'])
+        po_date = self._extract_date_field(index, self.field_keywords['po_date'])
         fields['po_date'] = po_date
         
         # Amount
-        amount = self._extract_amount_field(text, ['total amount', 'order total', 'total'])
+        amount = self._extract_amount_field(index, self.field_keywords['po_total'])
         fields['total_amount'] = amount
         
         # Vendor
-        vendor = self._extract_with_patterns(text, self.patterns['vendor'])
+        vendor = self._extract_with_patterns(doc, 'vendor')
         fields['vendor_name'] = vendor
         
         return fields
     
-    def _extract_generic_fields(self, text: str) -> Dict[str, Tuple[str, float]]:
+    def _extract_generic_fields(self, doc: DocumentText) -> Dict[str, FieldMatch]:
         """Extract common fields from any document"""
         fields = {}
         
         # Try to find any numbers that could be document numbers
-        numbers = re.findall(r'[A-Z]*\d{3,}', text)
-        if numbers:
-            fields['document_number'] = (numbers[0], 0.7)
-        
-        # Extract dates
-        dates = self._extract_dates(text)
-        if dates:
-            fields['document_date'] = (dates[0], 0.8)
+        number, index, span = self.pattern_registry.first_match('document_number', doc.text, skip_empty=False)
+        if number:
+            fields['document_number'] = FieldMatch.located(
+                number, 0.7, f"document_number:{index}", doc, *span
+            )
+        
+        # Extract dates (slash/dash dates first, then ISO dates)
+        for pattern_name in ('date_value', 'iso_date_value'):
+            dates = self.pattern_registry.matches(pattern_name, doc.text)
+            if dates:
+                fields['document_date'] = FieldMatch.located(
+                    dates[0].group(1), 0.8, pattern_name, doc, *dates[0].span(1)
+                )
+                break
         
         # Extract amounts
-        amounts = self._extract_amounts(text)
+        amounts = self.pattern_registry.matches('amount_value', doc.text)
         if amounts:
-            fields['amount'] = (amounts[0], 0.8)
+            fields['amount'] = FieldMatch.located(
+                amounts[0].group(1), 0.8, 'amount_value', doc, *amounts[0].span(1)
+            )
         
         return fields
     
-    def _extract_with_patterns(self, text: str, patterns: List[str]) -> Tuple[str, float]:
-        """Extract field using multiple regex patterns"""
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                value = matches[0].strip()
-                if value:
-                    return (value, 0.9)
-        return ("", 0.0)
+    def _normalize_fields(self, fields: Dict[str, FieldMatch], doc: DocumentText):
+        """Attach typed values (Decimal, date, months) once, for every downstream agent"""
+        for field_name, field in fields.items():
+            if not field.value or field_name not in FIELD_TYPES:
+                continue
+            if FIELD_TYPES[field_name] == 'months' and field.end is not None:
+                # The unit follows the captured number ("36 months", "3 years")
+                field.normalized = parse_months(doc.text[field.start:field.end + 16])
+            else:
+                field.normalized = normalize_value(field_name, field.value)
+    
+    def _extract_with_patterns(self, doc: DocumentText, pattern_name: str) -> FieldMatch:
+        """Extract field using a registered set of regex patterns"""
+        value, index, span = self.pattern_registry.first_match(pattern_name, doc.text)
+        if value:
+            stripped = value.strip()
+            start = span[0] + len(value) - len(value.lstrip())
+            return FieldMatch.located(
+                stripped, 0.9, f"{pattern_name}:{index}", doc, start, start + len(stripped)
+            )
+        return FieldMatch.empty()
     
-    def _extract_date_field(self, text: str, keywords: List[str]) -> Tuple[str, float]:
+    def _extract_date_field(self, index: KeywordLineIndex, keywords: List[str]) -> FieldMatch:
         """Extract date field using keywords"""
-        text_lower = text.lower()
-        
+        doc = index.doc
         for keyword in keywords:
-            # Find the line containing the keyword
-            lines = text.split('\n')
-            for line in lines:
-                if keyword.lower() in line.lower():
-                    dates = re.findall(r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})', line)
-                    if dates:
-                        return (dates[0], 0.9)
+            # Lines containing the keyword, from the shared index
+            for line_number in index.lines_with(keyword):
+                dates = index.dates_on_line(line_number)
+                if dates:
+                    line_start = doc.line_offsets[line_number]
+                    start, end = dates[0].span(1)
+                    return FieldMatch.located(dates[0].group(1), 0.9, f"date_value@{keyword}",
+                                              doc, line_start + start, line_start + end)
         
         # Fallback: find any date in the document
-        dates = re.findall(r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})', text)
+        dates = index.all_dates()
         if dates:
-            return (dates[0], 0.6)
+            return FieldMatch.located(dates[0].group(1), 0.6, "date_value", doc, *dates[0].span(1))
         
-        return ("", 0.0)
+        return FieldMatch.empty()
     
-    def _extract_amount_field(self, text: str, keywords: List[str]) -> Tuple[str, float]:
+    def _extract_amount_field(self, index: KeywordLineIndex, keywords: List[str]) -> FieldMatch:
         """Extract amount field using keywords"""
-        text_lower = text.lower()
-        
+        doc = index.doc
         for keyword in keywords:
-            # Find the line containing the keyword
-            lines = text.split('\n')
-            for line in lines:
-                if keyword.lower() in line.lower():
-                    amounts = re.findall(r'\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', line)
-                    if amounts:
-                        return (amounts[-1], 0.9)  # Take the last (usually total) amount
+            # Lines containing the keyword, from the shared index
+            for line_number in index.lines_with(keyword):
+                amounts = index.amounts_on_line(line_number)
+                if amounts:
+                    # Take the last (usually total) amount
+                    line_start = doc.line_offsets[line_number]
+                    start, end = amounts[-1].span(1)
+                    return FieldMatch.located(amounts[-1].group(1), 0.9, f"amount_value@{keyword}",
+                                              doc, line_start + start, line_start + end)
         
         # Fallback: find the largest amount in the document
-        amounts = re.findall(r'\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', text)
+        amounts = index.all_amounts()
         if amounts:
             # Convert to float and find the largest
             numeric_amounts = []
             for amount in amounts:
                 try:
-                    numeric_amounts.append((amount, float(amount.replace(',', ''))))
+                    numeric_amounts.append((amount, float(amount.group(1).replace(',', ''))))
                 except ValueError:
                     continue
             
             if numeric_amounts:
-                largest = max(numeric_amounts, key=lambda x: x[1])
-                return (largest[0], 0.7)
-        
-        return ("", 0.0)
-    
-    def _extract_dates(self, text: str) -> List[str]:
-        """Extract all dates from text"""
-        date_patterns = [
-            r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
-            r'(\d{4}[\/\-]\d{1,2}[\/\-]\d{1,2})'
-        ]
-        
-        dates = []
-        for pattern in date_patterns:
-            dates.extend(re.findall(pattern, text))
+                largest = max(numeric_amounts, key=lambda x: x[1])[0]
+                return FieldMatch.located(largest.group(1), 0.7, "amount_value:largest",
+                                          doc, *largest.span(1))
         
-        return dates
-    
-    def _extract_amounts(self, text: str) -> List[str]:
-        """Extract all amounts from text"""
-        amounts = re.findall(r'\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', text)
-        return amounts
+        return FieldMatch.empty()
     
-    def _extract_parties(self, text: str) -> Tuple[str, float]:
+    def _extract_parties(self, doc: DocumentText) -> FieldMatch:
         """Extract parties involved in contract"""
         # Look for "between" or "party" keywords
-        party_patterns = [
-            r'between\s+([A-Za-z\s&.,]+?)\s+and\s+([A-Za-z\s&.,]+?)(?:\n|$)',
-            r'party\s+([A-Za-z\s&.,]+?)(?:\n|$)'
-        ]
-        
-        for pattern in party_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if matches:
-                if isinstance(matches[0], tuple):
-                    parties = " and ".join(matches[0])
-                else:
-                    parties = matches[0]
-                return (parties.strip(), 0.8)
+        match, index, span = self.pattern_registry.first_match('parties', doc.text, skip_empty=False)
+        if match is not None:
+            if isinstance(match, tuple):
+                parties = " and ".join(match)
+            else:
+                parties = match
+            return FieldMatch.located(parties.strip(), 0.8, f"parties:{index}", doc, *span)
         
-        return ("", 0.0)
-
+        return FieldMatch.empty()
@@ -0,0 +1,246 @@
+"""
+Extraction Cache
+Persists extracted fields keyed by a hash of the document text and the
+pattern-set version, so duplicate text and re-runs skip the regex work
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import logging
+
+from .document_text import DocumentText
+from .field_match import FieldMatch
+
+logger = logging.getLogger(__name__)
+
+def text_hash(text: str) -> str:
+    """
+    Digest of the exact document text
+
+    Not whitespace-normalized: the extraction patterns are whitespace-sensitive
+    ("Due  Date" need not match like "Due Date"), so a cache hit must only
+    serve text a fresh extraction would read identically.
+    """
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()[:32]
+
+
+class ExtractionCache:
+    """
+    Extracted fields in SQLite with an in-memory LRU front cache
+
+    Entries are keyed by (text hash, document type, pattern version) and
+    stored as JSON, never unpickled from the shared database. The store is
+    bounded to max_entries rows, evicting the least recently used,
+    and purge_stale() drops rows from other pattern versions.
+    """
+
+    def __init__(self, db_path: str = "doc_anomaly.db", max_entries: int = 20000,
+                 max_memory_entries: int = 256):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize extraction cache table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        # Entries used to be pickled into extraction_cache; they are only a cache, so drop them
+        cursor.execute('DROP TABLE IF EXISTS extraction_cache')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS extraction_cache_entries (
+                text_hash TEXT NOT NULL,
+                document_type TEXT NOT NULL,
+                pattern_version TEXT NOT NULL,
+                entry TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (text_hash, document_type, pattern_version)
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def purge_stale(self, pattern_version: str) -> int:
+        """Remove entries extracted under any other pattern version"""
+        with self._lock:
+            self._memory = OrderedDict((k, v) for k, v in self._memory.items() if k[2] == pattern_version)
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM extraction_cache_entries WHERE pattern_version != ?', (pattern_version,))
+            removed = cursor.rowcount
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Extraction cache purge failed: {e}")
+            return 0
+
+        if removed:
+            logger.info(f"Purged {removed} extraction cache entries from older pattern versions")
+        return removed
+
+    def get(self, doc: DocumentText, document_type: str,
+            pattern_version: str) -> Optional[Dict[str, FieldMatch]]:
+        """Fresh FieldMatch objects for a cached document, or None"""
+        key = (text_hash(doc.text), document_type, pattern_version)
+        entry = self._lookup(key)
+
+        with self._lock:
+            self.stats["hits" if entry else "misses"] += 1
+        if entry is None:
+            return None
+
+        return {
+            field_name: self._restore(field, doc)
+            for field_name, field in entry["fields"].items()
+        }
+
+    def _lookup(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT entry FROM extraction_cache_entries
+                WHERE text_hash = ? AND document_type = ? AND pattern_version = ?
+            ''', key)
+            row = cursor.fetchone()
+            if row:
+                cursor.execute('''
+                    UPDATE extraction_cache_entries SET last_used = ?
+                    WHERE text_hash = ? AND document_type = ? AND pattern_version = ?
+                ''', (time.time(),) + key)
+                conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Extraction cache lookup failed: {e}")
+            return None
+
+        if not row:
+            return None
+        entry = json.loads(row[0])
+        with self._lock:
+            self._remember(key, entry)
+        return entry
+
+    def _restore(self, field: Dict[str, Any], doc: DocumentText) -> FieldMatch:
+        """Rebuild a FieldMatch, located in this document's text"""
+        value, start, end = field["value"], field["start"], field["end"]
+        if start is None:
+            return FieldMatch(value, field["confidence"], field["pattern_id"])
+        return FieldMatch.located(value, field["confidence"], field["pattern_id"], doc, start, end)
+
+    def put(self, doc: DocumentText, document_type: str, pattern_version: str,
+            fields: Dict[str, FieldMatch]) -> bool:
+        """Store the fields extracted from a document"""
+        key = (text_hash(doc.text), document_type, pattern_version)
+        entry = {
+            "fields": {
+                field_name: {
+                    "value": field.value,
+                    "confidence": field.confidence,
+                    "pattern_id": field.pattern_id,
+                    "start": field.start,
+                    "end": field.end
+                }
+                for field_name, field in fields.items()
+            }
+        }
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO extraction_cache_entries
+                (text_hash, document_type, pattern_version, entry, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            ''', key + (json.dumps(entry), time.time()))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Extraction cache write failed: {e}")
+            return False
+
+        with self._lock:
+            self._remember(key, entry)
+            self.stats["stores"] += 1
+            self._puts_since_trim += 1
+            trim = self._puts_since_trim >= max(1, self.max_entries // 100)
+            if trim:
+                self._puts_since_trim = 0
+        if trim:
+            self._trim()
+        return True
+
+    def _trim(self):
+        """Evict the least recently used rows beyond max_entries"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM extraction_cache_entries WHERE rowid IN (
+                    SELECT rowid FROM extraction_cache_entries ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            evicted = cursor.rowcount
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Extraction cache eviction failed: {e}")
+            return
+
+        with self._lock:
+            self.stats["evictions"] += evicted
+
+    def _remember(self, key: tuple, entry: Dict[str, Any]):
+        """Insert into the memory cache, evicting the least recently used entry if full"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> int:
+        """Remove every entry"""
+        with self._lock:
+            self._memory.clear()
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM extraction_cache_entries')
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, hit rate and stored entry count"""
+        with self._lock:
+            report = dict(self.stats)
+        lookups = report["hits"] + report["misses"]
+        report["hit_rate"] = report["hits"] / lookups if lookups else 0.0
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM extraction_cache_entries')
+            report["entries"] = cursor.fetchone()[0]
+            conn.close()
+        except Exception:
+            report["entries"] = None
+        return report
@@ -0,0 +1,105 @@
+"""
+Field Match
+Compact extraction record carrying where a value came from in the document
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .document_text import DocumentText
+
+
+class FieldMatch:
+    """
+    Extracted field value with its provenance
+
+    Behaves like the (value, confidence) pair agents have always used, so
+    ``value, confidence = field`` and ``field[0]`` keep working, and carries
+    the pattern that matched, the 1-based page and the character span in
+    DocumentText.text. Span and page are None when the value has no single
+    source location. ``normalized`` holds the typed value (Decimal, date or
+    months) for fields that have one.
+    """
+
+    __slots__ = ("value", "confidence", "pattern_id", "page", "start", "end", "normalized")
+
+    def __init__(self, value: str, confidence: float, pattern_id: Optional[str] = None,
+                 page: Optional[int] = None, start: Optional[int] = None, end: Optional[int] = None):
+        self.value = value
+        self.confidence = confidence
+        self.pattern_id = pattern_id
+        self.page = page
+        self.start = start
+        self.end = end
+        self.normalized = None
+
+    @classmethod
+    def located(cls, value: str, confidence: float, pattern_id: str,
+                doc: DocumentText, start: int, end: int) -> "FieldMatch":
+        """Build a match whose page is looked up from its start offset"""
+        return cls(value, confidence, pattern_id, doc.page_of(start), start, end)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FieldMatch":
+        """Rebuild a match from to_dict(); string-encoded normalized values are left to be reparsed"""
+        start, end = data.get("span") or (None, None)
+        match = cls(data.get("value", ""), data.get("confidence", 0.0), data.get("pattern_id"),
+                    data.get("page"), start, end)
+        if isinstance(data.get("normalized"), int):
+            match.normalized = data["normalized"]
+        return match
+
+    @classmethod
+    def empty(cls) -> "FieldMatch":
+        """The not-found record, equal to ("", 0.0)"""
+        return cls("", 0.0)
+
+    @property
+    def span(self) -> Optional[Tuple[int, int]]:
+        """(start, end) offsets in the document text, if known"""
+        if self.start is None:
+            return None
+        return (self.start, self.end)
+
+    def snippet(self, doc: DocumentText, context: int = 80) -> str:
+        """Text surrounding the match, without rescanning the document"""
+        if self.start is None:
+            return ""
+        return doc.text[max(0, self.start - context):self.end + context]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly representation"""
+        return {
+            "value": self.value,
+            "confidence": self.confidence,
+            "pattern_id": self.pattern_id,
+            "page": self.page,
+            "span": list(self.span) if self.span else None,
+            "normalized": self.normalized if isinstance(self.normalized, int) or self.normalized is None
+                          else str(self.normalized)
+        }
+
+    # (value, confidence) pair protocol
+
+    def __iter__(self) -> Iterator[Any]:
+        yield self.value
+        yield self.confidence
+
+    def __getitem__(self, index: int) -> Any:
+        return (self.value, self.confidence)[index]
+
+    def __len__(self) -> int:
+        return 2
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, FieldMatch):
+            return (self.value, self.confidence, self.pattern_id, self.start, self.end) == \
+                   (other.value, other.confidence, other.pattern_id, other.start, other.end)
+        if isinstance(other, tuple):
+            return (self.value, self.confidence) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        location = f", page={self.page}, span={self.span}" if self.start is not None else ""
+        return f"FieldMatch({self.value!r}, {self.confidence}, pattern_id={self.pattern_id!r}{location})"
@@ -0,0 +1,333 @@
+"""
+Hybrid Extraction Router
+Runs regex extraction first and asks the LLM only for the fields the regex
+pass is unsure about, with a prompt trimmed to their candidate lines
+"""
+
+import threading
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Set
+
+from .document_text import DocumentText
+from .extraction_agent import BATCH_FIELD_SPECS, GENERIC_BATCH_FIELDS, ExtractionAgent
+from .field_match import FieldMatch
+from .line_index import KeywordLineIndex
+from .normalization import normalize_value
+
+try:
+    from config.openai_config import estimate_tokens
+except ImportError:
+    def estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1 if text else 0
+
+try:
+    from config.llm_usage import llm_call_context
+except ImportError:
+    def llm_call_context(agent: Optional[str] = None, document_id: Optional[str] = None):
+        return nullcontext()
+
+# Label cues locating the lines a pattern-extracted field would appear on.
+# Keyword-anchored date and amount fields use ExtractionAgent.field_keywords.
+FIELD_CUES = {
+    'invoice_number': ['invoice', 'inv', 'bill'],
+    'po_number': ['purchase order', 'po', 'order'],
+    'vendor_name': ['from', 'vendor', 'bill to'],
+    'contract_number': ['contract', 'agreement'],
+    'lease_amount': ['lease payment', 'monthly payment', 'rent'],
+    'lease_term': ['lease term', 'term', 'duration'],
+    'parties': ['between', 'party'],
+    'document_number': ['number', 'no.', '#'],
+    'document_date': ['date'],
+    'amount': ['total', 'amount']
+}
+
+LLM_PATTERN_ID = "llm"
+
+EXTRACTION_PROMPT = (
+    "The text below contains only the document lines likely to hold the requested "
+    "fields; non-adjacent excerpts are separated by '...'. Extract each field exactly "
+    "as written."
+)
+
+
+class HybridExtractionRouter:
+    """
+    Regex-first, LLM-on-demand extraction
+
+    Fields whose regex confidence is below confidence_threshold are sent to
+    the LLM in one call per document, together with the lines around their
+    label cues rather than the whole document. Fields with no candidate
+    lines are not sent. An LLM answer replaces the regex value only when it
+    is more confident.
+    """
+
+    def __init__(self, extraction_agent: ExtractionAgent, llm: Any = None,
+                 confidence_threshold: float = 0.75, context_lines: int = 1,
+                 max_lines_per_cue: int = 3):
+        """
+        Args:
+            extraction_agent: Regex extractor run on every document
+            llm: OpenAIConfig (or anything with extract_with_gpt4o); None
+                disables routing
+            confidence_threshold: Fields below this are routed to the LLM
+            context_lines: Lines kept on each side of a candidate line
+            max_lines_per_cue: Candidate lines taken per cue, in document order
+        """
+        self.extraction_agent = extraction_agent
+        self.llm = llm
+        self.confidence_threshold = confidence_threshold
+        self.context_lines = context_lines
+        self.max_lines_per_cue = max_lines_per_cue
+
+        # Bulk mode: record the LLM request in the routing summary instead of
+        # sending it, to be answered later through apply_deferred()
+        self.defer = False
+
+        self._lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
+            "documents": 0,
+            "documents_routed": 0,
+            "fields_total": 0,
+            "fields_regex": 0,
+            "fields_routed": 0,
+            "fields_from_llm": 0,
+            "fields_without_context": 0,
+            "llm_calls": 0,
+            "llm_failures": 0,
+            "full_document_tokens": 0,
+            "prompt_tokens": 0
+        }
+
+    def llm_available(self) -> bool:
+        """Whether routed fields can actually be sent; False while the LLM circuit breaker is open"""
+        if self.llm is None:
+            return False
+        is_available = getattr(self.llm, "is_available", None) or getattr(self.llm, "is_configured", None)
+        return is_available() if is_available else True
+
+    def process(self, document_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extract a document, routing low-confidence fields to the LLM
+
+        Returns:
+            The ExtractionAgent result with LLM-filled fields merged into
+            extracted_fields and a "routing" summary for the document
+        """
+        result = self.extraction_agent.process(document_data)
+        if "error" in result:
+            return result
+
+        result["routing"] = self._route(
+            result.get("document_id"), result.get("document_type", "UNKNOWN"),
+            result["extracted_fields"], DocumentText.coerce(result.get("document_text"))
+        )
+        return result
+
+    def _expected_fields(self, doc_type: str) -> List[str]:
+        specs = BATCH_FIELD_SPECS.get(doc_type)
+        return [field_name for field_name, _, _ in specs] if specs else list(GENERIC_BATCH_FIELDS)
+
+    def _route(self, doc_id: Optional[str], doc_type: str,
+               fields: Dict[str, FieldMatch], doc: DocumentText) -> Dict[str, Any]:
+        """Send low-confidence fields to the LLM and merge better answers"""
+        expected = self._expected_fields(doc_type)
+        low = [
+            field_name for field_name in expected
+            if field_name not in fields or fields[field_name].confidence < self.confidence_threshold
+        ]
+        routing = {
+            "regex_fields": len(expected) - len(low),
+            "routed_fields": [],
+            "llm_fields": [],
+            "fields_without_context": [],
+            "llm_called": False,
+            "prompt_tokens": 0,
+            "full_document_tokens": estimate_tokens(doc.text)
+        }
+
+        if low and self.llm_available():
+            index = self.extraction_agent.build_line_index(doc)
+            candidate_lines: Set[int] = set()
+            for field_name in low:
+                lines = self._candidate_lines(index, doc_type, field_name)
+                if lines:
+                    routing["routed_fields"].append(field_name)
+                    candidate_lines.update(lines)
+                else:
+                    routing["fields_without_context"].append(field_name)
+
+            if routing["routed_fields"]:
+                context = self._build_context(doc, candidate_lines)
+                routing["prompt_tokens"] = estimate_tokens(context)
+                if self.defer:
+                    routing["deferred"] = {
+                        "fields": routing["routed_fields"],
+                        "context": context,
+                        "confidences": {
+                            field_name: fields[field_name].confidence if field_name in fields else 0.0
+                            for field_name in routing["routed_fields"]
+                        }
+                    }
+                else:
+                    routing["llm_called"] = True
+                    answer = self._call_llm(doc_id, context, routing["routed_fields"])
+                    routing["llm_fields"] = self._merge(doc_id, fields, answer, doc)
+                    routing["llm_failed"] = not answer
+
+        self._record(expected, routing)
+        return routing
+
+    def _candidate_lines(self, index: KeywordLineIndex, doc_type: str, field_name: str) -> List[int]:
+        """Lines carrying one of the field's label cues"""
+        cues = FIELD_CUES.get(field_name, [])
+        for spec_field, method, source in BATCH_FIELD_SPECS.get(doc_type, []):
+            if spec_field == field_name and method in ('date', 'amount'):
+                cues = self.extraction_agent.field_keywords[source]
+                break
+
+        lines = []
+        for cue in cues:
+            lines.extend(index.lines_with(cue)[:self.max_lines_per_cue])
+        return lines
+
+    def _build_context(self, doc: DocumentText, candidate_lines: Set[int]) -> str:
+        """Candidate lines with their neighbours, in document order"""
+        last_line = len(doc.lines) - 1
+        keep = sorted({
+            neighbour
+            for line in candidate_lines
+            for neighbour in range(max(0, line - self.context_lines),
+                                   min(last_line, line + self.context_lines) + 1)
+        })
+
+        parts = []
+        previous = None
+        for line in keep:
+            if previous is not None and line != previous + 1:
+                parts.append("...")
+            parts.append(doc.lines[line])
+            previous = line
+        return "\n".join(parts)
+
+    def _call_llm(self, doc_id: Optional[str], context: str, field_names: List[str]) -> Dict[str, Any]:
+        """One extraction call for every routed field; {} on failure"""
+        try:
+            with llm_call_context(self.extraction_agent.agent_name, doc_id):
+                answer = self.llm.extract_with_gpt4o(context, EXTRACTION_PROMPT, field_names)
+        except Exception:
+            return {}
+        return answer if isinstance(answer, dict) else {}
+
+    def _merge(self, doc_id: Optional[str], fields: Dict[str, FieldMatch],
+               answer: Dict[str, Any], doc: DocumentText) -> List[str]:
+        """Replace regex values with more confident LLM values; returns the replaced names"""
+        merged = []
+        for field_name, candidate in answer.items():
+            if not isinstance(candidate, dict) or not candidate.get("value"):
+                continue
+            value = str(candidate["value"]).strip()
+            try:
+                confidence = float(candidate.get("confidence") or 0.0)
+            except (TypeError, ValueError):
+                continue
+            current = fields.get(field_name)
+            if current is not None and confidence <= current.confidence:
+                continue
+
+            match = self._locate(value, confidence, candidate.get("source_text"), doc)
+            match.normalized = normalize_value(field_name, value)
+            fields[field_name] = match
+            merged.append(field_name)
+            self.extraction_agent.store_extracted_data(doc_id, field_name, value, confidence)
+
+        return merged
+
+    def apply_deferred(self, doc_id: Optional[str], deferred: Dict[str, Any],
+                       answer: Dict[str, Any]) -> Dict[str, FieldMatch]:
+        """
+        Merge the bulk-mode answer to a deferred request
+
+        Values more confident than the regex ones recorded at routing time
+        are stored for the document; returns them by field name, for the
+        caller to refresh results built from the regex values.
+        """
+        merged = {}
+        for field_name in deferred["fields"]:
+            candidate = answer.get(field_name) if isinstance(answer, dict) else None
+            if not isinstance(candidate, dict) or not candidate.get("value"):
+                continue
+            value = str(candidate["value"]).strip()
+            try:
+                confidence = float(candidate.get("confidence") or 0.0)
+            except (TypeError, ValueError):
+                continue
+            if confidence <= deferred["confidences"].get(field_name, 0.0):
+                continue
+            match = FieldMatch(value, confidence, LLM_PATTERN_ID)
+            match.normalized = normalize_value(field_name, value)
+            merged[field_name] = match
+            self.extraction_agent.store_extracted_data(doc_id, field_name, value, confidence)
+
+        with self._lock:
+            self._stats["documents_routed"] += 1
+            self._stats["llm_calls"] += 1
+            self._stats["llm_failures"] += int(not answer)
+            self._stats["fields_from_llm"] += len(merged)
+        return merged
+
+    def _locate(self, value: str, confidence: float, source_text: Optional[str],
+                doc: DocumentText) -> FieldMatch:
+        """FieldMatch for an LLM value, with its span when the text can be found"""
+        start = -1
+        if source_text:
+            source_start = doc.text.find(source_text)
+            if source_start != -1:
+                offset = source_text.find(value)
+                start = source_start + offset if offset != -1 else -1
+        if start == -1:
+            start = doc.text.find(value)
+        if start == -1:
+            return FieldMatch(value, confidence, LLM_PATTERN_ID)
+        return FieldMatch.located(value, confidence, LLM_PATTERN_ID, doc, start, start + len(value))
+
+    def _record(self, expected: List[str], routing: Dict[str, Any]):
+        with self._lock:
+            stats = self._stats
+            stats["documents"] += 1
+            stats["fields_total"] += len(expected)
+            stats["fields_regex"] += routing["regex_fields"]
+            stats["fields_routed"] += len(routing["routed_fields"])
+            stats["fields_from_llm"] += len(routing["llm_fields"])
+            stats["fields_without_context"] += len(routing["fields_without_context"])
+            stats["full_document_tokens"] += routing["full_document_tokens"]
+            stats["prompt_tokens"] += routing["prompt_tokens"]
+            if routing["llm_called"]:
+                stats["documents_routed"] += 1
+                stats["llm_calls"] += 1
+                stats["llm_failures"] += int(routing.get("llm_failed", False))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Routing statistics and token savings
+
+        Savings compare the prompt tokens actually sent with sending every
+        document whole to the LLM, as full-document GPT-4o extraction does.
+        """
+        with self._lock:
+            report = dict(self._stats)
+
+        full = report["full_document_tokens"]
+        report["llm_call_rate"] = report["llm_calls"] / report["documents"] if report["documents"] else 0.0
+        report["regex_field_rate"] = report["fields_regex"] / report["fields_total"] if report["fields_total"] else 0.0
+        report["tokens_saved"] = full - report["prompt_tokens"]
+        report["token_savings_rate"] = report["tokens_saved"] / full if full else 0.0
+        return report
+
+    def reset_stats(self):
+        """Zero all counters"""
+        with self._lock:
+            self._stats = self._empty_stats()
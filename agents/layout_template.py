@@ -0,0 +1,356 @@
+"""
+Layout Templates
+Fingerprints recurring document layouts by their label lines and remembers
+which line and pattern yielded each field, so documents with a known layout
+can be extracted positionally
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+import logging
+
+from .document_text import DocumentText
+from .field_match import FieldMatch
+from .pattern_registry import PatternRegistry
+
+logger = logging.getLogger(__name__)
+
+# "Invoice #:", "Bill To:", "Total Amount:" ... at the start of a line, or a
+# label running straight into its value ("Order Date 7/7/2023", "Total $50")
+_LABEL_LINE = re.compile(r'^[ \t]*([A-Za-z][A-Za-z #./&()\-]{0,38}?)[ \t]*(?::|(?=[$\d]))', re.MULTILINE)
+
+# Layouts need this many label lines to be fingerprinted; only the first
+# MAX_FINGERPRINT_LABELS count, so long variable tails don't change the print
+MIN_FINGERPRINT_LABELS = 3
+MAX_FINGERPRINT_LABELS = 40
+
+# Document types with a fixed field set; generic extraction is not templated
+TEMPLATE_DOCUMENT_TYPES = ("INVOICE", "CONTRACT", "PURCHASE_ORDER")
+
+FieldTemplate = Optional[Dict[str, Any]]
+
+
+def normalize_label(label: str) -> str:
+    """Lowercase, digit-free, single-spaced form of a label"""
+    return " ".join(re.sub(r'\d', '', label).lower().split())
+
+
+def line_labels(doc: DocumentText) -> Dict[int, str]:
+    """Normalized label of every labelled line, keyed by line number"""
+    labels = {}
+    for match in _LABEL_LINE.finditer(doc.text):
+        label = normalize_label(match.group(1))
+        if label:
+            labels[doc.line_of(match.start())] = label
+    return labels
+
+
+def layout_fingerprint(document: Union[DocumentText, str, None]) -> Optional[str]:
+    """
+    Hash of a document's label lines and their order
+
+    Documents produced from the same template share it regardless of the
+    values on those lines. None when there are too few labels to tell
+    layouts apart.
+    """
+    doc = DocumentText.coerce(document)
+    labels = []
+    for match in _LABEL_LINE.finditer(doc.text):
+        label = normalize_label(match.group(1))
+        if label:
+            labels.append(label)
+            if len(labels) == MAX_FINGERPRINT_LABELS:
+                break
+
+    if len(labels) < MIN_FINGERPRINT_LABELS:
+        return None
+    return hashlib.sha1("\n".join(labels).encode("utf-8")).hexdigest()[:16]
+
+
+def _pattern_of(pattern_id: Optional[str], registry: PatternRegistry) -> Optional[Tuple[str, int]]:
+    """
+    (pattern name, alternative index) of an anchored FieldMatch.pattern_id
+
+    Only keyword-anchored ("date_value@due date") and labelled-pattern
+    ("invoice_number:0") matches qualify; whole-document fallbacks such as
+    the first or largest value are not tied to a position.
+    """
+    if not pattern_id:
+        return None
+    name, keyword = pattern_id.split('@')[0], '@' in pattern_id
+    name, _, index = name.partition(':')
+    if name not in registry or not (keyword or index.isdigit()):
+        return None
+    return name, int(index) if index.isdigit() else 0
+
+
+def _line_values(compiled: re.Pattern, line: str) -> List[Tuple[str, int]]:
+    """(value, start) of every match on a line, stripped the way extraction strips them"""
+    values = []
+    for match in compiled.finditer(line):
+        if compiled.groups > 1:
+            # Multi-group patterns (parties) are joined and keep the match span
+            values.append((" and ".join(g or "" for g in match.groups()).strip(), match.start()))
+            continue
+        group = 1 if compiled.groups else 0
+        raw = match.group(group) or ""
+        stripped = raw.strip()
+        values.append((stripped, match.start(group) + len(raw) - len(raw.lstrip())))
+    return values
+
+
+def build_template(fields: Dict[str, FieldMatch], doc: DocumentText,
+                   registry: PatternRegistry) -> Optional[Dict[str, FieldTemplate]]:
+    """
+    Record where each anchored field was found
+
+    A field is pinned when it came from an anchored pattern, lies on one
+    line and is reproduced by re-running that pattern on the line alone.
+    The line is remembered by label (and which occurrence of it) when it
+    has one, by number otherwise, and the value by its position counted
+    from the end of the line's matches (the generic amount extractor takes
+    the last) together with how many matches the line held. Other fields map to None and are left to
+    the generic extractors, since a layout does not fix whether they are
+    filled in.
+
+    Returns:
+        Template keyed by field name, or None when no field can be pinned
+    """
+    labels = line_labels(doc)
+    template = {}
+    for field_name, field in fields.items():
+        template[field_name] = None
+        pattern = _pattern_of(field.pattern_id, registry) if field.value else None
+        if pattern is None or field.start is None:
+            continue
+        line_number = doc.line_of(field.start)
+        if doc.line_of(max(field.start, field.end - 1)) != line_number:
+            continue
+
+        compiled = registry.compiled(*pattern)
+        column = field.start - doc.line_offsets[line_number]
+        values = _line_values(compiled, doc.lines[line_number])
+        ordinal = next((
+            position - len(values) for position, (value, start) in enumerate(values)
+            if start == column and value == field.value
+        ), None)
+        if ordinal is None:
+            continue
+
+        label = labels.get(line_number)
+        template[field_name] = {
+            "label": label,
+            "occurrence": sum(1 for line, other in labels.items() if other == label and line < line_number)
+                          if label else None,
+            "line": None if label else line_number,
+            "pattern": pattern[0],
+            "index": pattern[1],
+            "ordinal": ordinal,
+            "matches": len(values),
+            "pattern_id": field.pattern_id,
+            "confidence": field.confidence
+        }
+
+    if not any(template.values()):
+        return None
+    return template
+
+
+def apply_template(template: Dict[str, FieldTemplate], doc: DocumentText,
+                   registry: PatternRegistry) -> Optional[Dict[str, Optional[FieldMatch]]]:
+    """
+    Extract the pinned fields of a template
+
+    Returns:
+        Fields keyed by name, with None for those the template leaves to
+        the generic extractors; None as soon as a remembered line is
+        missing or its pattern matches there a different number of times
+        (the generic extractors might then pick another match)
+    """
+    # Scan label lines only until every pinned label occurrence has been seen
+    needed: Dict[str, int] = {}
+    for spec in template.values():
+        if spec and spec["label"]:
+            needed[spec["label"]] = max(needed.get(spec["label"], 0), spec["occurrence"] + 1)
+
+    lines_by_label: Dict[str, List[int]] = {}
+    if needed:
+        remaining = len(needed)
+        for match in _LABEL_LINE.finditer(doc.text):
+            label = normalize_label(match.group(1))
+            if label not in needed:
+                continue
+            lines = lines_by_label.setdefault(label, [])
+            lines.append(doc.line_of(match.start()))
+            if len(lines) == needed[label]:
+                remaining -= 1
+                if not remaining:
+                    break
+
+    fields = {}
+    for field_name, spec in template.items():
+        if spec is None:
+            fields[field_name] = None
+            continue
+
+        if spec["label"]:
+            candidates = lines_by_label.get(spec["label"], [])
+            if spec["occurrence"] >= len(candidates):
+                return None
+            line_number = candidates[spec["occurrence"]]
+        else:
+            line_number = spec["line"]
+            if line_number >= len(doc.lines):
+                return None
+
+        values = _line_values(registry.compiled(spec["pattern"], spec["index"]), doc.lines[line_number])
+        if len(values) != spec.get("matches") or not values[spec["ordinal"]][0]:
+            return None
+
+        value, column = values[spec["ordinal"]]
+        start = doc.line_offsets[line_number] + column
+        fields[field_name] = FieldMatch.located(
+            value, spec["confidence"], spec["pattern_id"], doc, start, start + len(value)
+        )
+
+    return fields
+
+
+class TemplateStore:
+    """
+    Layout templates keyed by fingerprint and document type
+
+    Templates are persisted in SQLite with an in-memory front cache, and
+    tagged with the pattern-set version they were learned under so pattern
+    changes retire them. A template is used once the same field positions
+    have been observed min_observations times in a row.
+    """
+
+    def __init__(self, db_path: str = "doc_anomaly.db", min_observations: int = 2):
+        self.db_path = db_path
+        self.min_observations = min_observations
+        self._memory: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"template_hits": 0, "template_failures": 0, "no_template": 0, "learned": 0}
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize layout template table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS layout_templates (
+                fingerprint TEXT NOT NULL,
+                document_type TEXT NOT NULL,
+                pattern_version TEXT NOT NULL,
+                template TEXT NOT NULL,
+                observations INTEGER DEFAULT 1,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (fingerprint, document_type)
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def _load(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """Entry for a key from memory, then SQLite"""
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT pattern_version, template, observations FROM layout_templates
+                WHERE fingerprint = ? AND document_type = ?
+            ''', key)
+            row = cursor.fetchone()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Template store lookup failed: {e}")
+            return None
+
+        entry = None
+        if row:
+            entry = {"pattern_version": row[0], "template": json.loads(row[1]), "observations": row[2]}
+        with self._lock:
+            self._memory[key] = entry
+        return entry
+
+    def get(self, fingerprint: str, document_type: str,
+            pattern_version: str) -> Optional[Dict[str, FieldTemplate]]:
+        """The active template for a layout, or None"""
+        entry = self._load((fingerprint, document_type))
+        if (entry and entry["pattern_version"] == pattern_version
+                and entry["observations"] >= self.min_observations):
+            return entry["template"]
+        return None
+
+    def observe(self, fingerprint: str, document_type: str, pattern_version: str,
+                template: Optional[Dict[str, FieldTemplate]]):
+        """
+        Record the field positions found by a full extraction of this layout
+
+        Successive observations are intersected: a field stays pinned only
+        while every observation found it at the same place, so fields that
+        vary within a layout drop back to the generic extractors.
+        """
+        if template is None:
+            return
+        key = (fingerprint, document_type)
+        entry = self._load(key)
+
+        observations = 1
+        if entry and entry["pattern_version"] == pattern_version:
+            merged = {
+                field_name: spec if entry["template"].get(field_name) == spec else None
+                for field_name, spec in template.items()
+            }
+            if any(merged.values()):
+                if merged == entry["template"] and entry["observations"] >= self.min_observations:
+                    # Already active and unchanged; nothing to write
+                    return
+                template = merged
+                observations = entry["observations"] + 1
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO layout_templates
+                (fingerprint, document_type, pattern_version, template, observations, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (fingerprint, document_type, pattern_version, json.dumps(template),
+                  observations, datetime.utcnow().isoformat()))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Template store write failed: {e}")
+            return
+
+        with self._lock:
+            self._memory[key] = {"pattern_version": pattern_version, "template": template,
+                                 "observations": observations}
+            if observations == self.min_observations:
+                self.stats["learned"] += 1
+
+    def record(self, outcome: str):
+        """Count a template_hits, template_failures or no_template outcome"""
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Outcome counts and the share of documents served by a template"""
+        with self._lock:
+            report = dict(self.stats)
+        attempts = report["template_hits"] + report["template_failures"] + report["no_template"]
+        report["template_hit_rate"] = report["template_hits"] / attempts if attempts else 0.0
+        return report
@@ -0,0 +1,86 @@
+"""
+Keyword Line Index
+Per-document index mapping field keywords to the lines that contain them,
+with lazily cached date and amount matches per line
+"""
+
+import re
+from typing import Callable, Dict, List, Optional
+
+from .document_text import DocumentText
+
+
+class KeywordLineIndex:
+    """
+    Resolves keyword-anchored lookups for one document
+
+    Keyword positions are found with str.find over the shared lowercase text
+    and recorded once per keyword. Date and amount matches are computed at
+    most once per line and reused by every field that lands on it.
+    """
+
+    __slots__ = ("doc", "_find_dates", "_find_amounts", "_lines_by_keyword",
+                 "_dates_by_line", "_amounts_by_line", "_all_dates", "_all_amounts")
+
+    def __init__(self, doc: DocumentText, find_dates: Callable[[str], List[re.Match]],
+                 find_amounts: Callable[[str], List[re.Match]]):
+        self.doc = doc
+        self._find_dates = find_dates
+        self._find_amounts = find_amounts
+        self._lines_by_keyword: Dict[str, List[int]] = {}
+        self._dates_by_line: Dict[int, List[re.Match]] = {}
+        self._amounts_by_line: Dict[int, List[re.Match]] = {}
+        self._all_dates: Optional[List[re.Match]] = None
+        self._all_amounts: Optional[List[re.Match]] = None
+
+    def lines_with(self, keyword: str) -> List[int]:
+        """Indexes of lines containing a keyword, in document order (cached)"""
+        keyword = keyword.lower()
+        if keyword not in self._lines_by_keyword:
+            self._lines_by_keyword[keyword] = self._scan(keyword)
+        return self._lines_by_keyword[keyword]
+
+    def _scan(self, keyword: str) -> List[int]:
+        """Find every line containing keyword, skipping to the next line after a hit"""
+        lower = self.doc.lower
+        lines = []
+        line = 0
+        line_start = 0
+        position = lower.find(keyword)
+        while position != -1:
+            # Lines are counted on the lowercase text, whose length can differ
+            # from the original for a few Unicode characters
+            line += lower.count('\n', line_start, position)
+            lines.append(line)
+            next_newline = lower.find('\n', position)
+            if next_newline == -1:
+                break
+            line += 1
+            line_start = next_newline + 1
+            position = lower.find(keyword, line_start)
+
+        return lines
+
+    def dates_on_line(self, index: int) -> List[re.Match]:
+        """Date matches on a line, with spans relative to the line (cached)"""
+        if index not in self._dates_by_line:
+            self._dates_by_line[index] = self._find_dates(self.doc.lines[index])
+        return self._dates_by_line[index]
+
+    def amounts_on_line(self, index: int) -> List[re.Match]:
+        """Amount matches on a line, with spans relative to the line (cached)"""
+        if index not in self._amounts_by_line:
+            self._amounts_by_line[index] = self._find_amounts(self.doc.lines[index])
+        return self._amounts_by_line[index]
+
+    def all_dates(self) -> List[re.Match]:
+        """Date matches across the whole document (cached)"""
+        if self._all_dates is None:
+            self._all_dates = self._find_dates(self.doc.text)
+        return self._all_dates
+
+    def all_amounts(self) -> List[re.Match]:
+        """Amount matches across the whole document (cached)"""
+        if self._all_amounts is None:
+            self._all_amounts = self._find_amounts(self.doc.text)
+        return self._all_amounts
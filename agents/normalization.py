@@ -0,0 +1,204 @@
+"""
+Field Normalization
+Shared, memoized parsers turning extracted strings into typed values:
+Decimal amounts, date objects and integer months
+"""
+
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+# Typed kind of each extracted field
+FIELD_TYPES = {
+    'invoice_date': 'date',
+    'due_date': 'date',
+    'effective_date': 'date',
+    'expiration_date': 'date',
+    'po_date': 'date',
+    'document_date': 'date',
+    'total_amount': 'amount',
+    'lease_amount': 'amount',
+    'amount': 'amount',
+    'lease_term': 'months',
+}
+
+# Date shapes, each dispatched straight to its field order
+_NUMERIC_DATE = re.compile(r'(\d{1,4})([/\-])(\d{1,2})\2(\d{1,4})')
+_MONTH_FIRST_DATE = re.compile(r'([A-Za-z]{3,9})\.?\s+(\d{1,2}),?\s+(\d{4})')
+_DAY_FIRST_DATE = re.compile(r'(\d{1,2})\s+([A-Za-z]{3,9})\.?,?\s+(\d{4})')
+# Digit boundaries keep it from rereading part of a longer number ("2024-02-30" is not 24-02-30)
+_EMBEDDED_DATE = re.compile(r'(?<!\d)(\d{1,2})([/\-])(\d{1,2})\2(\d{2,4})(?!\d)')
+
+MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'),
+        ('may',), ('june', 'jun'), ('july', 'jul'), ('august', 'aug'),
+        ('september', 'sep', 'sept'), ('october', 'oct'), ('november', 'nov'), ('december', 'dec')
+    ], start=1)
+    for name in names
+}
+
+# Two-digit years follow strptime's %y pivot: 69-99 -> 1900s, 00-68 -> 2000s
+TWO_DIGIT_YEAR_PIVOT = 69
+_TERM = re.compile(r'(\d+)\s*(years?|yrs?|months?|mos?)?', re.IGNORECASE)
+
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_amount(text: str) -> Optional[Decimal]:
+    """Parse "$1,234.50" style amounts; None when not a finite number"""
+    if not text:
+        return None
+    cleaned = text.replace('$', '').replace(',', '').strip()
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(text: str, day_first: bool = False) -> Optional[date]:
+    """
+    Parse a date string with one regex match per shape
+
+    Supports 1/15/2024, 15-01-2024, 2024-01-15, 2024/1/15, "January 15, 2024",
+    "Jan 15 2024" and "15 Jan 2024", whole or embedded in other text.
+    Numeric dates whose first or second part exceeds 12 have an unambiguous
+    order; otherwise day_first selects day/month over month/day.
+    """
+    if not text:
+        return None
+    text = text.strip()
+
+    numeric = _NUMERIC_DATE.fullmatch(text)
+    if numeric:
+        first, _, second, third = numeric.groups()
+        if len(first) == 4:
+            parsed = _build_date(int(first), int(second), int(third))
+        elif len(third) in (2, 4):
+            parsed = _numeric_date(int(first), int(second), third, day_first)
+        else:
+            parsed = None
+        if parsed:
+            return parsed
+
+    match = _MONTH_FIRST_DATE.fullmatch(text)
+    if match:
+        return _build_date(int(match.group(3)), MONTHS.get(match.group(1).lower()), int(match.group(2)))
+
+    match = _DAY_FIRST_DATE.fullmatch(text)
+    if match:
+        return _build_date(int(match.group(3)), MONTHS.get(match.group(2).lower()), int(match.group(1)))
+
+    # Fall back to a numeric date embedded in surrounding text; a whole
+    # numeric date that was rejected above is invalid, not embedded
+    match = None if numeric else _EMBEDDED_DATE.search(text)
+    if match:
+        first, _, second, year = match.groups()
+        if len(year) != 3:
+            return _numeric_date(int(first), int(second), year, day_first)
+
+    return None
+
+
+def _numeric_date(first: int, second: int, year: str, day_first: bool) -> Optional[date]:
+    """Resolve the month/day order of a numeric date and expand two-digit years"""
+    year_number = int(year)
+    if len(year) == 2:
+        year_number += 1900 if year_number >= TWO_DIGIT_YEAR_PIVOT else 2000
+
+    if first > 12 or (day_first and second <= 12):
+        return _build_date(year_number, second, first)
+    return _build_date(year_number, first, second) or _build_date(year_number, second, first)
+
+
+def _build_date(year: int, month: Optional[int], day: int) -> Optional[date]:
+    """date() for valid parts, None otherwise"""
+    if not month or not 1 <= month <= 12 or not 1 <= day <= 31 or year < 1:
+        return None
+    try:
+        return date(year, month, day)
+    except ValueError:
+        # Day beyond the end of the month, e.g. 2/30
+        return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_months(text: str) -> Optional[int]:
+    """Parse a term such as "12", "18 months" or "3 years" into months"""
+    if not text:
+        return None
+    match = _TERM.search(text)
+    if not match:
+        return None
+    count = int(match.group(1))
+    unit = (match.group(2) or '').lower()
+    return count * 12 if unit.startswith('y') else count
+
+
+_PARSERS = {
+    'date': parse_date,
+    'amount': parse_amount,
+    'months': parse_months,
+}
+
+
+def normalize_value(field_name: str, value: Any) -> Any:
+    """Typed value for a field's raw string, or None for untyped fields"""
+    kind = FIELD_TYPES.get(field_name)
+    if kind is None or value is None:
+        return None
+    return _PARSERS[kind](str(value))
+
+
+def typed_value(field_data: Any, field_name: str) -> Any:
+    """
+    Typed value of an extracted field in any of its stored shapes
+
+    Uses the value normalized at extraction time when present, otherwise
+    parses the raw string through the shared memoized parsers.
+    """
+    normalized = getattr(field_data, 'normalized', None)
+    if normalized is not None:
+        return normalized
+
+    if isinstance(field_data, dict):
+        raw = field_data.get('value')
+    elif isinstance(field_data, str):
+        raw = field_data
+    else:
+        raw = field_data[0] if field_data else None
+
+    return normalize_value(field_name, raw)
+
+
+def as_date(value: Union[str, date, None]) -> Optional[date]:
+    """Accept a typed date or parse a string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date) or value is None:
+        return value
+    return parse_date(value)
+
+
+def as_amount(value: Union[str, Decimal, float, None]) -> Optional[Decimal]:
+    """Accept a typed amount or parse a string"""
+    if isinstance(value, Decimal) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    return parse_amount(value)
+
+
+def cache_info() -> dict:
+    """Hit/miss counters of the memoized parsers"""
+    return {
+        'amount': parse_amount.cache_info()._asdict(),
+        'date': parse_date.cache_info()._asdict(),
+        'months': parse_months.cache_info()._asdict(),
+    }
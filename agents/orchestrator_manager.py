@@ -3,6 +3,9 @@ Orchestrator Manager
 Coordinates multi-agent workflow, manages context, and handles Human-in-the-Loop
 """
 
+import os
+import threading
+import time
 import uuid
 from typing import Dict, Any, List, Optional
 from datetime import datetime
@@ -11,7 +14,12 @@ import logging
 from agents.enhanced_base_agent import EnhancedBaseAgent
 from agents.document_ingestion_agent import DocumentIngestionAgent
 from agents.extraction_agent import ExtractionAgent
+from agents.field_match import FieldMatch
+from agents.hybrid_extraction import HybridExtractionRouter
 from agents.anomaly_detection_agent import AnomalyDetectionAgent
+from agents.normalization import cache_info as normalization_cache_info
+from agents.result_store import ResultStore, compute_pipeline_version
+from config.openai_config import LLMGateway
 
 # We'll create these in Batch 3
 # from agents.contract_invoice_agent import ContractInvoiceComparisonAgent
@@ -24,8 +32,12 @@ class OrchestratorManager(EnhancedBaseAgent):
     - Contract-Invoice context management
     - Human-in-the-Loop queue
     - Agent execution order
+    - Reuse of results for documents already processed
     """
     
+    # Bump when agent logic changes in a way that invalidates stored results
+    PIPELINE_REVISION = "2"
+    
     def __init__(self):
         super().__init__("OrchestratorManager")
         
@@ -34,6 +46,15 @@ class OrchestratorManager(EnhancedBaseAgent):
         self.extraction_agent = ExtractionAgent()
         self.anomaly_agent = AnomalyDetectionAgent()
         
+        # Regex first; low-confidence fields go to GPT-4o when it is configured.
+        # Every GPT-4o call shares the gateway's concurrency and rate limits
+        self.extraction_router = None
+        self.llm_gateway = None
+        if self.openai_config and self.openai_config.is_configured():
+            self.llm_gateway = LLMGateway(self.openai_config)
+            self.openai_config.gateway = self.llm_gateway
+            self.extraction_router = HybridExtractionRouter(self.extraction_agent, self.openai_config)
+        
         # Will be initialized in Batch 3
         self.contract_invoice_agent = None
         self.validation_agent = None
@@ -50,20 +71,41 @@ class OrchestratorManager(EnhancedBaseAgent):
             ("DATA_EXTRACTION", self.extraction_agent),
             ("ANOMALY_DETECTION", self.anomaly_agent),
         ]
+        
+        # Completed results keyed by document hash and pipeline version
+        self.result_store = ResultStore()
+        
+        # GPT-4o semantic analysis finishes after the workflow returns: its
+        # anomalies are merged into the stored result and queued for the UI.
+        # Outstanding analyses are tracked per session (document_id, and the
+        # stored result or an update that beat it), and dropped when the
+        # session fails or a newer run of the document stores its result
+        self.semantic_updates = []
+        self._semantic_sessions: Dict[str, Dict[str, Any]] = {}
+        self._semantic_lock = threading.Lock()
     
-    def process_document(self, document_path: str, document_type: str = None) -> Dict[str, Any]:
+    def process_document(self, document_path: str, document_type: str = None,
+                         force: bool = False) -> Dict[str, Any]:
         """
         Process a document through the complete workflow
         
         Args:
             document_path: Path to the document file
             document_type: Optional document type hint (INVOICE, CONTRACT)
+            force: Re-run the full workflow even if a stored result exists
             
         Returns:
             Dict containing complete processing results
         """
         session_id = str(uuid.uuid4())[:8]
         self.logger.info(f"Starting document processing session: {session_id}")
+        
+        # Reuse a stored result for identical bytes under the current pipeline version
+        if not force and os.path.exists(document_path):
+            cached_result = self._get_stored_result(session_id, document_path)
+            if cached_result:
+                return cached_result
+        
         self.log_action("WORKFLOW_START", None, "STARTED", f"Session: {session_id}")
         
         try:
@@ -110,7 +152,8 @@ class OrchestratorManager(EnhancedBaseAgent):
             
             # Step 2: Data Extraction
             self.logger.info("Executing: DATA_EXTRACTION")
-            current_data = self.extraction_agent.process(current_data)
+            extractor = self.extraction_router or self.extraction_agent
+            current_data = extractor.process(current_data)
             
             if "error" in current_data:
                 processing_context["workflow_status"] = "FAILED"
@@ -130,9 +173,14 @@ class OrchestratorManager(EnhancedBaseAgent):
                 self.logger.info("Executing: CONTRACT_INVOICE_COMPARISON")
                 contract_data = self._find_related_contract(doc_id, extracted_fields)
                 if contract_data:
+                    with self._semantic_lock:
+                        self._semantic_sessions[session_id] = {"document_id": doc_id}
                     comparison_result = self.contract_invoice_agent.compare(
-                        contract_data, current_data
+                        contract_data, current_data,
+                        on_semantic_analysis=lambda update: self._attach_semantic_analysis(session_id, update)
                     )
+                    if (comparison_result.get("semantic_analysis") or {}).get("status") != "PENDING":
+                        self._discard_semantic_session(session_id)
                     processing_context["contract_invoice_comparison"] = comparison_result
                     # Merge comparison anomalies with extraction results
                     if "anomalies" in comparison_result:
@@ -148,6 +196,7 @@ class OrchestratorManager(EnhancedBaseAgent):
                 processing_context["workflow_status"] = "FAILED"
                 processing_context["error"] = current_data["error"]
                 processing_context["failed_step"] = "ANOMALY_DETECTION"
+                self._discard_semantic_session(session_id)
                 return self._format_results(processing_context)
             
             anomalies = current_data.get("anomalies", [])
@@ -191,9 +240,13 @@ class OrchestratorManager(EnhancedBaseAgent):
             self.log_action("WORKFLOW_COMPLETE", doc_id, "SUCCESS", 
                           f"Processed in {processing_context['processing_duration']:.2f}s")
             
-            return self._format_results(processing_context)
+            results = self._format_results(processing_context)
+            self._store_results(session_id, doc_id, results)
+            
+            return results
             
         except Exception as e:
+            self._discard_semantic_session(session_id)
             self.logger.error(f"Fatal error in processing session {session_id}: {e}")
             import traceback
             traceback.print_exc()
@@ -204,6 +257,272 @@ class OrchestratorManager(EnhancedBaseAgent):
                 "processing_time": 0
             }
     
+    def _store_results(self, session_id: str, doc_id: str, results: Dict[str, Any]):
+        """Store a completed result, merging semantic analysis that already finished"""
+        version = self.get_pipeline_version()
+        early_update = None
+        with self._semantic_lock:
+            # Analyses of earlier runs of this document must not overwrite this result
+            for other_id in [other_id for other_id, pending in self._semantic_sessions.items()
+                             if pending["document_id"] == doc_id and other_id != session_id]:
+                del self._semantic_sessions[other_id]
+            
+            pending = self._semantic_sessions.get(session_id)
+            if pending and "update" in pending:
+                del self._semantic_sessions[session_id]
+                early_update = pending["update"]
+                results.update(self._merge_semantic_analysis(results, early_update))
+            elif pending:
+                pending["version"] = version
+                pending["results"] = results
+            self.result_store.put(doc_id, version, results)
+        
+        if early_update:
+            self._record_semantic_analysis(doc_id, early_update)
+    
+    def refresh_stored_result(self, doc_id: str, fields: Dict[str, FieldMatch]) -> bool:
+        """
+        Re-run anomaly detection on a stored result whose fields changed
+        
+        Backfill merges bulk LLM answers after the workflow stored a result
+        built from the regex values. The stored extracted_data gets the new
+        fields and anomalies, validation and the HITL decision are
+        recomputed from them; semantic anomalies already merged are kept.
+        A result that cannot be refreshed is invalidated instead, so the
+        next run reprocesses the document.
+        
+        Returns:
+            True if the stored result was updated
+        """
+        version = self.get_pipeline_version()
+        results = self.result_store.get(doc_id, version)
+        if not results or results.get("workflow_status") != "COMPLETED":
+            self.result_store.invalidate(doc_id)
+            return False
+        
+        try:
+            doc_type = results["document_info"].get("document_type", "UNKNOWN")
+            extracted = {
+                field_name: FieldMatch.from_dict(field) if isinstance(field, dict) else field
+                for field_name, field in results["extracted_data"].items()
+            }
+            extracted.update(fields)
+            
+            if doc_type == "CONTRACT":
+                self._store_contract_context(doc_id, extracted)
+            
+            current_data = self.anomaly_agent.process({
+                "document_id": doc_id,
+                "document_type": doc_type,
+                "extracted_fields": extracted
+            })
+            if "error" in current_data:
+                raise RuntimeError(current_data["error"])
+            anomalies = current_data.get("anomalies", [])
+            
+            if self.dynamodb_handler:
+                for anomaly in anomalies:
+                    if anomaly not in results["anomalies"]["details"]:
+                        self.dynamodb_handler.store_anomaly(doc_id, anomaly)
+            
+            validation_result = None
+            if self.validation_agent and anomalies:
+                validation_result = self.validation_agent.validate(anomalies, current_data)
+                if self.dynamodb_handler:
+                    self.dynamodb_handler.store_validation_result(doc_id, validation_result)
+        except Exception as e:
+            self.logger.error(f"Error refreshing stored result of {doc_id}: {e}")
+            self.result_store.invalidate(doc_id)
+            return False
+        
+        confidence_scores = [a.get("confidence", 0.0) for a in anomalies]
+        avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 1.0
+        requires_hitl = avg_confidence < self.auto_approve_threshold or len(anomalies) > 5
+        if requires_hitl and not results.get("requires_hitl"):
+            self._queue_for_hitl(results["session_id"], doc_id, {
+                "session_id": results["session_id"],
+                "document_id": doc_id,
+                "document_type": doc_type,
+                "anomaly_detection_result": current_data,
+                "validation_result": validation_result
+            })
+        
+        semantic_added = (results.get("semantic_analysis") or {}).get("anomalies_added") or 0
+        semantic_anomalies = results["anomalies"]["details"][-semantic_added:] if semantic_added else []
+        details = anomalies + semantic_anomalies
+        
+        results.update({
+            "extracted_data": extracted,
+            "anomalies": {"count": len(details), "details": details},
+            "validation": validation_result,
+            "requires_hitl": requires_hitl
+        })
+        with self._semantic_lock:
+            # An analysis still running for this document merges into the refreshed result
+            for pending in self._semantic_sessions.values():
+                if pending["document_id"] == doc_id and "results" in pending:
+                    pending["results"] = results
+            self.result_store.put(doc_id, version, results)
+        
+        self.log_action("RESULT_REFRESHED", doc_id, "SUCCESS",
+                      f"{len(fields)} fields merged, {len(anomalies)} anomalies after re-detection")
+        return True
+    
+    def _discard_semantic_session(self, session_id: str):
+        """Stop waiting for a session's semantic analysis (failed or not scheduled)"""
+        with self._semantic_lock:
+            self._semantic_sessions.pop(session_id, None)
+    
+    def _attach_semantic_analysis(self, session_id: str, update: Dict[str, Any]):
+        """
+        Merge a finished semantic analysis into the session's stored result
+        
+        Called from the comparison agent's background thread. The updated
+        result is stored again and queued for pop_semantic_updates().
+        Analyses of failed or superseded sessions are dropped.
+        """
+        with self._semantic_lock:
+            pending = self._semantic_sessions.get(session_id)
+            if pending is not None and "results" not in pending:
+                # The workflow has not stored its result yet; _store_results merges it
+                pending["update"] = update
+                return
+            if pending is not None:
+                del self._semantic_sessions[session_id]
+                doc_id = pending["document_id"]
+                results = self._merge_semantic_analysis(pending["results"], update)
+                self.result_store.put(doc_id, pending["version"], results)
+                self.semantic_updates.append({
+                    "document_id": doc_id,
+                    "status": update["status"],
+                    "anomalies_added": len(update["anomalies"]),
+                    "result": results
+                })
+        
+        if pending is None:
+            self.logger.info(f"Dropping semantic analysis of session {session_id}: "
+                             f"its workflow failed or was superseded")
+            return
+        self._record_semantic_analysis(doc_id, update)
+    
+    def _record_semantic_analysis(self, doc_id: str, update: Dict[str, Any]):
+        """Store semantic anomalies in DynamoDB and log the merge"""
+        if self.dynamodb_handler:
+            for anomaly in update["anomalies"]:
+                self.dynamodb_handler.store_anomaly(doc_id, anomaly)
+        self.log_action("SEMANTIC_ANALYSIS_ATTACHED", doc_id, update["status"],
+                      f"{len(update['anomalies'])} anomalies added to stored result")
+    
+    @staticmethod
+    def _merge_semantic_analysis(results: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a formatted result with the semantic anomalies appended"""
+        details = list(results["anomalies"]["details"]) + update["anomalies"]
+        merged = dict(results)
+        merged["anomalies"] = {"count": len(details), "details": details}
+        merged["semantic_analysis"] = {
+            "status": update["status"],
+            "anomalies_added": len(update["anomalies"]),
+            "completed_at": update["completed_at"]
+        }
+        return merged
+    
+    def pop_semantic_updates(self) -> List[Dict[str, Any]]:
+        """Semantic analyses merged since the last call, oldest first, for UI notifications"""
+        with self._semantic_lock:
+            updates, self.semantic_updates = self.semantic_updates, []
+        return updates
+    
+    def get_pipeline_version(self) -> str:
+        """Digest of thresholds and rules that affect results"""
+        return compute_pipeline_version(
+            self.PIPELINE_REVISION,
+            self.auto_approve_threshold,
+            self.extraction_agent.patterns,
+            self.anomaly_agent.thresholds,
+            self.validation_agent.business_rules if self.validation_agent else None,
+            self.contract_invoice_agent is not None,
+            self.extraction_router.confidence_threshold if self.extraction_router else None
+        )
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit rates of the result store, extraction cache, layout templates, field parsers, LLM responses and in-flight coalescing"""
+        store = dict(self.result_store.stats)
+        lookups = store["hits"] + store["misses"]
+        store["hit_rate"] = store["hits"] / lookups if lookups else 0.0
+        llm_cache = self.openai_config.response_cache if self.openai_config else None
+        in_flight = self.openai_config.in_flight if self.openai_config else None
+        return {
+            "result_store": store,
+            "extraction_cache": self.extraction_agent.get_cache_stats(),
+            "layout_templates": self.extraction_agent.get_template_stats(),
+            "field_parsers": normalization_cache_info(),
+            "llm_responses": llm_cache.get_stats() if llm_cache else None,
+            "llm_in_flight": in_flight.get_stats() if in_flight else None
+        }
+    
+    def get_extraction_routing_stats(self) -> Optional[Dict[str, Any]]:
+        """Regex/LLM routing counts and token savings, when hybrid extraction is on"""
+        return self.extraction_router.get_stats() if self.extraction_router else None
+    
+    def get_llm_gateway_stats(self) -> Optional[Dict[str, Any]]:
+        """Concurrency, rate-limit waits and token usage of GPT-4o calls, when configured"""
+        return self.llm_gateway.get_stats() if self.llm_gateway else None
+    
+    def get_llm_resilience_stats(self) -> Optional[Dict[str, Any]]:
+        """Timeouts, retries, hedged requests and circuit breaker state of GPT-4o calls, when configured"""
+        return self.openai_config.resilience.get_stats() if self.openai_config else None
+    
+    def get_llm_usage(self, days: float = 7, top_documents: int = 20) -> Optional[Dict[str, Any]]:
+        """
+        GPT-4o token usage and latency from the usage ledger, when configured
+        
+        Returns:
+            totals, by_agent, by_day and by_document (the top_documents
+            documents by spent tokens) over the last days
+        """
+        ledger = self.openai_config.usage_ledger if self.openai_config else None
+        if ledger is None:
+            return None
+        return {
+            "days": days,
+            "totals": ledger.totals(days),
+            "by_agent": ledger.rollup("agent", days),
+            "by_day": ledger.rollup("day", days),
+            "by_document": ledger.rollup("document", days, limit=top_documents)
+        }
+    
+    def publish_llm_usage_metrics(self) -> int:
+        """Send per-agent GPT-4o usage since the last publish to CloudWatch; returns values sent"""
+        ledger = self.openai_config.usage_ledger if self.openai_config else None
+        if ledger is None or not self.cloudwatch_handler:
+            return 0
+        try:
+            return ledger.publish_metrics(self.cloudwatch_handler)
+        except Exception as e:
+            self.logger.warning(f"Publishing LLM usage metrics failed: {e}")
+            return 0
+    
+    def _get_stored_result(self, session_id: str, document_path: str) -> Optional[Dict[str, Any]]:
+        """Return a stored result for this document, or None if it must be processed"""
+        start = time.perf_counter()
+        doc_id = self.ingestion_agent._generate_document_id(document_path)
+        result = self.result_store.get(doc_id, self.get_pipeline_version())
+        
+        if not result:
+            return None
+        
+        # Invoices processed after a restart must still find this contract
+        if result["document_info"].get("document_type") == "CONTRACT":
+            self._store_contract_context(doc_id, result["extracted_data"])
+        
+        result["session_id"] = session_id
+        result["from_cache"] = True
+        result["processing_time"] = time.perf_counter() - start
+        
+        self.log_action("WORKFLOW_CACHE_HIT", doc_id, "SUCCESS",
+                      f"Reused stored result from {result.get('timestamp')}")
+        return result
+    
     def _store_contract_context(self, contract_id: str, extracted_fields: Dict[str, Any]):
         """Store contract context for later invoice comparison"""
         contract_context = {
@@ -261,7 +580,7 @@ class OrchestratorManager(EnhancedBaseAgent):
         """Extract field value from extracted_fields dict"""
         if field_name in fields:
             field_data = fields[field_name]
-            if isinstance(field_data, tuple):
+            if isinstance(field_data, (tuple, FieldMatch)):
                 return field_data[0]  # Return value, not confidence
             elif isinstance(field_data, dict):
                 return field_data.get("value")
@@ -330,15 +649,30 @@ class OrchestratorManager(EnhancedBaseAgent):
     def _update_thresholds(self, adjustments: Dict[str, Any]):
         """Update business thresholds based on feedback"""
         # This would update thresholds in DynamoDB BusinessRules table
-        # For now, just log it
+        # For now, apply known keys in memory; stored results keyed by the
+        # previous pipeline version are no longer reused
         self.logger.info(f"Threshold adjustments requested: {adjustments}")
+        for key, value in adjustments.items():
+            if key in self.anomaly_agent.thresholds:
+                self.anomaly_agent.thresholds[key] = value
     
     def process(self, document_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process method required by base class - delegates to process_document"""
         document_path = document_data.get("document_path") or document_data.get("file_path")
         if not document_path:
             return {"error": "document_path or file_path required"}
-        return self.process_document(document_path)
+        return self.process_document(document_path, force=document_data.get("force", False))
+    
+    def _field_sources(self, extraction: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Page, span, pattern and surrounding snippet for each located field"""
+        doc = extraction.get("document_text")
+        sources = {}
+        for field_name, field in extraction.get("extracted_fields", {}).items():
+            if isinstance(field, FieldMatch) and field.span and doc is not None:
+                source = field.to_dict()
+                source["snippet"] = field.snippet(doc)
+                sources[field_name] = source
+        return sources
     
     def _format_results(self, processing_context: Dict[str, Any]) -> Dict[str, Any]:
         """Format processing results for output"""
@@ -347,6 +681,7 @@ class OrchestratorManager(EnhancedBaseAgent):
             extraction = processing_context.get("data_extraction_result", {})
             anomaly = processing_context.get("anomaly_detection_result", {})
             validation = processing_context.get("validation_result", {})
+            comparison = processing_context.get("contract_invoice_comparison") or {}
             
             return {
                 "session_id": processing_context["session_id"],
@@ -357,11 +692,14 @@ class OrchestratorManager(EnhancedBaseAgent):
                     "file_path": processing_context["document_path"]
                 },
                 "extracted_data": extraction.get("extracted_fields", {}),
+                "field_sources": self._field_sources(extraction),
+                "extraction_routing": extraction.get("routing"),
                 "anomalies": {
                     "count": len(anomaly.get("anomalies", [])),
                     "details": anomaly.get("anomalies", [])
                 },
                 "validation": validation if validation else None,
+                "semantic_analysis": comparison.get("semantic_analysis"),
                 "requires_hitl": processing_context.get("requires_hitl", False),
                 "processing_time": processing_context["processing_duration"],
                 "timestamp": processing_context["start_time"].isoformat()
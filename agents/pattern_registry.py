@@ -0,0 +1,259 @@
+"""
+Pattern Registry
+Compiles extraction regexes once, merges each field's alternatives into a
+single named-group alternation and records per-pattern hit counts and timings
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+MatchValue = Union[str, Tuple[str, ...]]
+
+
+class PatternGroup:
+    """Compiled alternatives for one field, tried in priority order"""
+
+    __slots__ = ("name", "sources", "flags", "compiled", "merged", "_group_to_index", "_index_to_group")
+
+    def __init__(self, name: str, sources: List[str], flags: int = 0, merge: bool = True):
+        self.name = name
+        self.sources = list(sources)
+        self.flags = flags
+        self.compiled = [re.compile(source, flags) for source in self.sources]
+        self.merged = None
+        self._group_to_index = {}
+        self._index_to_group = []
+
+        if merge and len(self.compiled) > 1:
+            self._build_merged()
+
+    def _build_merged(self):
+        """Wrap each alternative in a named group and join them with |"""
+        parts = []
+        group_number = 1
+        for index, (source, compiled) in enumerate(zip(self.sources, self.compiled)):
+            # Numbered backreferences would shift inside the merged pattern
+            if re.search(r'\\[1-9]|\(\?P=', source):
+                return
+            parts.append(f"(?P<{self.name}_{index}>{source})")
+            self._group_to_index[group_number] = index
+            self._index_to_group.append(group_number)
+            group_number += 1 + compiled.groups
+
+        self.merged = re.compile("|".join(parts), self.flags)
+
+    def first_matches(self, text: str) -> List[Optional[re.Match]]:
+        """
+        Return the first match of every alternative, in priority order
+
+        Equivalent to calling search() with each alternative separately, but
+        scans the text once when a merged alternation is available.
+        """
+        if self.merged is None:
+            return [compiled.search(text) for compiled in self.compiled]
+
+        firsts: List[Optional[re.Match]] = [None] * len(self.compiled)
+        spans = []
+        for match in self.merged.finditer(text):
+            index = self._group_to_index[match.lastindex]
+            spans.append(match.span())
+            if firsts[index] is None:
+                firsts[index] = match
+
+        # An alternative is only hidden from the merged scan where another
+        # match covers its start position, so only positions inside earlier
+        # spans need to be re-checked individually
+        for index, compiled in enumerate(self.compiled):
+            limit = firsts[index].start() if firsts[index] is not None else len(text) + 1
+            for start, end in spans:
+                if start >= limit:
+                    break
+                hidden = None
+                for position in range(start, min(max(end, start + 1), limit)):
+                    hidden = compiled.match(text, position)
+                    if hidden:
+                        break
+                if hidden:
+                    firsts[index] = hidden
+                    break
+
+        return firsts
+
+    def values(self, index: int, match: re.Match) -> MatchValue:
+        """Return the match value the way re.findall would for this alternative"""
+        compiled = self.compiled[index]
+        if self.merged is not None and match.re is self.merged:
+            group_number = self._index_to_group[index]
+            groups = match.groups()[group_number:group_number + compiled.groups]
+            if compiled.groups == 0:
+                return match.group(group_number)
+        else:
+            groups = match.groups()
+            if compiled.groups == 0:
+                return match.group(0)
+
+        groups = tuple(g if g is not None else "" for g in groups)
+        return groups[0] if compiled.groups == 1 else groups
+
+    def value_span(self, index: int, match: re.Match) -> Tuple[int, int]:
+        """Span of the value: the capture group for one-group patterns, else the whole match"""
+        compiled = self.compiled[index]
+        merged = self.merged is not None and match.re is self.merged
+        if compiled.groups == 1:
+            group_number = self._index_to_group[index] + 1 if merged else 1
+            if match.start(group_number) >= 0:
+                return match.span(group_number)
+        if merged:
+            return match.span(self._index_to_group[index])
+        return match.span()
+
+
+class PatternRegistry:
+    """Registry of compiled extraction patterns with usage statistics"""
+
+    def __init__(self):
+        self._groups: Dict[str, PatternGroup] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, name: str, patterns: Union[str, List[str]], flags: int = 0,
+                 merge: bool = True) -> PatternGroup:
+        """
+        Compile and register a field's patterns
+
+        Args:
+            name: Field or pattern-set name
+            patterns: One pattern or a priority-ordered list of alternatives
+            flags: re flags applied to every alternative
+            merge: Build a single merged alternation for one-pass scanning
+
+        Returns:
+            The compiled PatternGroup
+        """
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        group = PatternGroup(name, patterns, flags, merge)
+        with self._lock:
+            self._groups[name] = group
+            self._stats[name] = {
+                "calls": 0,
+                "total_time": 0.0,
+                "hits": [0] * len(patterns)
+            }
+        return group
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._groups
+
+    def names(self) -> List[str]:
+        """Registered pattern-set names"""
+        return list(self._groups)
+
+    def group(self, name: str) -> PatternGroup:
+        """Return the compiled group for a name"""
+        return self._groups[name]
+
+    def compiled(self, name: str, index: int = 0) -> re.Pattern:
+        """Return a single compiled alternative"""
+        return self._groups[name].compiled[index]
+
+    def first(self, name: str, text: str,
+              skip_empty: bool = True) -> Tuple[Optional[MatchValue], Optional[int]]:
+        """
+        Return the first value in priority order
+
+        Mirrors a loop of re.findall over each pattern: only the first match
+        of an alternative is considered, and with skip_empty an alternative
+        whose value strips to empty falls through to the next one.
+
+        Returns:
+            Tuple of (value, alternative index), or (None, None) if nothing matched
+        """
+        value, index, _ = self.first_match(name, text, skip_empty)
+        return value, index
+
+    def first_match(self, name: str, text: str, skip_empty: bool = True
+                    ) -> Tuple[Optional[MatchValue], Optional[int], Optional[Tuple[int, int]]]:
+        """
+        Like first(), also returning the value's character span in text
+
+        Returns:
+            Tuple of (value, alternative index, span), or (None, None, None)
+        """
+        group = self._groups[name]
+        start = time.perf_counter()
+        result = (None, None, None)
+
+        for index, match in enumerate(group.first_matches(text)):
+            if match is None:
+                continue
+            value = group.values(index, match)
+            if not skip_empty or isinstance(value, tuple) or value.strip():
+                result = (value, index, group.value_span(index, match))
+                break
+
+        self._record(name, start, result[1])
+        return result
+
+    def findall(self, name: str, text: str, index: int = 0) -> List[MatchValue]:
+        """re.findall with one compiled alternative"""
+        start = time.perf_counter()
+        matches = self._groups[name].compiled[index].findall(text)
+        self._record(name, start, index if matches else None)
+        return matches
+
+    def matches(self, name: str, text: str, index: int = 0) -> List[re.Match]:
+        """All match objects of one compiled alternative, timed like findall"""
+        start = time.perf_counter()
+        matches = list(self._groups[name].compiled[index].finditer(text))
+        self._record(name, start, index if matches else None)
+        return matches
+
+    def finditer(self, name: str, text: str, index: int = 0):
+        """re.finditer with one compiled alternative (not timed)"""
+        return self._groups[name].compiled[index].finditer(text)
+
+    def _record(self, name: str, start: float, hit_index: Optional[int]):
+        """Accumulate call count, time and hit count"""
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats["total_time"] += elapsed
+            if hit_index is not None:
+                stats["hits"][hit_index] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-pattern usage statistics
+
+        Returns:
+            Dict keyed by name with calls, total and average time in ms, and
+            hit counts per alternative alongside its source pattern
+        """
+        with self._lock:
+            report = {}
+            for name, stats in self._stats.items():
+                group = self._groups[name]
+                calls = stats["calls"]
+                report[name] = {
+                    "calls": calls,
+                    "merged": group.merged is not None,
+                    "total_time_ms": stats["total_time"] * 1000,
+                    "avg_time_ms": (stats["total_time"] * 1000 / calls) if calls else 0.0,
+                    "patterns": [
+                        {"pattern": source, "hits": hits}
+                        for source, hits in zip(group.sources, stats["hits"])
+                    ]
+                }
+            return report
+
+    def reset_stats(self):
+        """Zero all counters"""
+        with self._lock:
+            for stats in self._stats.values():
+                stats["calls"] = 0
+                stats["total_time"] = 0.0
+                stats["hits"] = [0] * len(stats["hits"])
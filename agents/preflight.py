@@ -0,0 +1,242 @@
+"""
+Document Pre-flight Checks
+Cheap format sniffing on the first and last few KB of a file so renamed or
+corrupt inputs are rejected before PyPDF2, python-docx or Tesseract run
+"""
+
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# Bytes read from each end of the file
+EDGE_BYTES = 8192
+
+MAX_FILE_SIZE = 50 * 1024 * 1024
+MAX_IMAGE_PIXELS = 178_956_970  # Pillow's decompression bomb limit x2
+
+# Reason codes
+OK = "OK"
+FILE_NOT_FOUND = "FILE_NOT_FOUND"
+UNREADABLE = "UNREADABLE"
+EMPTY_FILE = "EMPTY_FILE"
+FILE_TOO_LARGE = "FILE_TOO_LARGE"
+UNSUPPORTED_EXTENSION = "UNSUPPORTED_EXTENSION"
+MAGIC_MISMATCH = "MAGIC_MISMATCH"
+PDF_MISSING_EOF = "PDF_MISSING_EOF"
+PDF_BAD_XREF = "PDF_BAD_XREF"
+ZIP_NO_CENTRAL_DIRECTORY = "ZIP_NO_CENTRAL_DIRECTORY"
+ZIP_BAD_CENTRAL_DIRECTORY = "ZIP_BAD_CENTRAL_DIRECTORY"
+DOCX_MISSING_DOCUMENT_PART = "DOCX_MISSING_DOCUMENT_PART"
+IMAGE_BAD_HEADER = "IMAGE_BAD_HEADER"
+IMAGE_BAD_DIMENSIONS = "IMAGE_BAD_DIMENSIONS"
+
+# Expected container format per extension
+EXTENSION_FORMATS = {
+    '.pdf': ('pdf',),
+    '.docx': ('zip',),
+    '.doc': ('ole', 'zip'),
+    '.jpg': ('jpeg',),
+    '.jpeg': ('jpeg',),
+    '.png': ('png',),
+    '.tiff': ('tiff',),
+}
+
+_PDF_STARTXREF = re.compile(rb'startxref\s+(\d+)')
+_PDF_OBJECT = re.compile(rb'\s*\d+\s+\d+\s+obj')
+_EOCD_SIGNATURE = b'PK\x05\x06'
+_CENTRAL_HEADER_SIGNATURE = b'PK\x01\x02'
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Identify the container format from leading magic bytes"""
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return 'zip'
+    if head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return 'ole'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    return None
+
+
+def preflight_file(document_path: str, max_size: int = MAX_FILE_SIZE) -> Dict[str, Any]:
+    """
+    Run pre-flight checks on a local file
+
+    Args:
+        document_path: Path to the document
+        max_size: Maximum accepted size in bytes
+
+    Returns:
+        Dict with ok, reason_code, detected_format and detail
+    """
+    if not os.path.exists(document_path):
+        return _result(FILE_NOT_FOUND)
+
+    size = os.path.getsize(document_path)
+    with open(document_path, 'rb') as f:
+        head = f.read(EDGE_BYTES)
+        if size > EDGE_BYTES:
+            f.seek(max(size - EDGE_BYTES, EDGE_BYTES))
+            tail = f.read()
+        else:
+            tail = b''
+
+    return preflight_bytes(head, tail, size, Path(document_path).suffix.lower(), max_size)
+
+
+def preflight_bytes(head: bytes, tail: bytes, size: int, extension: str,
+                    max_size: int = MAX_FILE_SIZE) -> Dict[str, Any]:
+    """
+    Run pre-flight checks on the edges of a file
+
+    Args:
+        head: First bytes of the file (up to EDGE_BYTES)
+        tail: Bytes after head up to the end of the file (up to EDGE_BYTES),
+              empty when head already covers the whole file
+        size: Total file size in bytes
+        extension: Lowercase file extension including the dot
+        max_size: Maximum accepted size in bytes
+
+    Returns:
+        Dict with ok, reason_code, detected_format and detail
+    """
+    if extension not in EXTENSION_FORMATS:
+        return _result(UNSUPPORTED_EXTENSION, detail=extension)
+    if size == 0:
+        return _result(EMPTY_FILE)
+    if size > max_size:
+        return _result(FILE_TOO_LARGE, detail=f"{size} bytes")
+
+    detected = sniff_format(head)
+    if detected not in EXTENSION_FORMATS[extension]:
+        return _result(MAGIC_MISMATCH, detected,
+                       f"{extension} file looks like {detected or 'unknown data'}")
+
+    # Offset of tail[0] within the file
+    tail_offset = size - len(tail)
+    end = tail if tail else head
+    end_offset = tail_offset if tail else 0
+
+    if detected == 'pdf':
+        return _check_pdf(head, end, end_offset, size)
+    if detected == 'zip':
+        return _check_zip(end, end_offset, size, require_docx=extension == '.docx')
+    if detected == 'png':
+        return _check_png(head)
+    if detected == 'jpeg':
+        return _check_jpeg(head)
+
+    return _result(OK, detected)
+
+
+def _check_pdf(head: bytes, end: bytes, end_offset: int, size: int) -> Dict[str, Any]:
+    """Require an %%EOF marker and a startxref pointing inside the file"""
+    if b'%%EOF' not in end[-1024:]:
+        return _result(PDF_MISSING_EOF, 'pdf')
+
+    matches = _PDF_STARTXREF.findall(end)
+    if not matches:
+        return _result(PDF_BAD_XREF, 'pdf', "startxref not found")
+
+    xref_offset = int(matches[-1])
+    if xref_offset <= 0 or xref_offset >= size:
+        return _result(PDF_BAD_XREF, 'pdf', f"startxref {xref_offset} outside file")
+
+    # When the xref section falls inside the bytes we have, verify it
+    window = None
+    if xref_offset < len(head):
+        window = head[xref_offset:xref_offset + 32]
+    elif xref_offset >= end_offset:
+        window = end[xref_offset - end_offset:xref_offset - end_offset + 32]
+
+    if window is not None and not (window.lstrip().startswith(b'xref') or _PDF_OBJECT.match(window)):
+        return _result(PDF_BAD_XREF, 'pdf', f"no xref table or stream at {xref_offset}")
+
+    return _result(OK, 'pdf')
+
+
+def _check_zip(end: bytes, end_offset: int, size: int, require_docx: bool) -> Dict[str, Any]:
+    """Locate the end-of-central-directory record and sanity check it"""
+    eocd = end.rfind(_EOCD_SIGNATURE)
+    if eocd < 0 or eocd + 22 > len(end):
+        return _result(ZIP_NO_CENTRAL_DIRECTORY, 'zip')
+
+    entries, cd_size, cd_offset = struct.unpack('<HII', end[eocd + 10:eocd + 20])
+    eocd_position = end_offset + eocd
+    if entries == 0 or cd_offset + cd_size > eocd_position:
+        return _result(ZIP_BAD_CENTRAL_DIRECTORY, 'zip',
+                       f"{entries} entries, directory at {cd_offset}+{cd_size}")
+
+    # When the whole central directory is in the tail, check for the main part
+    if cd_offset >= end_offset:
+        directory = end[cd_offset - end_offset:eocd]
+        if not directory.startswith(_CENTRAL_HEADER_SIGNATURE):
+            return _result(ZIP_BAD_CENTRAL_DIRECTORY, 'zip', "central directory signature missing")
+        if require_docx and b'word/document.xml' not in directory:
+            return _result(DOCX_MISSING_DOCUMENT_PART, 'zip')
+
+    return _result(OK, 'zip')
+
+
+def _check_png(head: bytes) -> Dict[str, Any]:
+    """Read dimensions from the IHDR chunk"""
+    if len(head) < 24 or head[12:16] != b'IHDR':
+        return _result(IMAGE_BAD_HEADER, 'png')
+    width, height = struct.unpack('>II', head[16:24])
+    return _check_dimensions('png', width, height)
+
+
+def _check_jpeg(head: bytes) -> Dict[str, Any]:
+    """Walk JPEG segments in the head looking for a start-of-frame marker"""
+    position = 2
+    while position + 4 <= len(head):
+        if head[position] != 0xFF:
+            return _result(IMAGE_BAD_HEADER, 'jpeg', f"bad marker at {position}")
+        marker = head[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            position += 2
+            continue
+
+        length = struct.unpack('>H', head[position + 2:position + 4])[0]
+        if length < 2:
+            return _result(IMAGE_BAD_HEADER, 'jpeg', f"bad segment length at {position}")
+
+        # SOF0-SOF15 excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if position + 9 > len(head):
+                break
+            height, width = struct.unpack('>HH', head[position + 5:position + 9])
+            return _check_dimensions('jpeg', width, height)
+
+        position += 2 + length
+
+    # Frame header is beyond the bytes read (large EXIF block); let the decoder decide
+    return _result(OK, 'jpeg')
+
+
+def _check_dimensions(image_format: str, width: int, height: int) -> Dict[str, Any]:
+    """Reject empty or decompression-bomb sized images"""
+    if width == 0 or height == 0 or width * height > MAX_IMAGE_PIXELS:
+        return _result(IMAGE_BAD_DIMENSIONS, image_format, f"{width}x{height}")
+    return _result(OK, image_format, f"{width}x{height}")
+
+
+def _result(reason_code: str, detected_format: str = None, detail: str = "") -> Dict[str, Any]:
+    """Build a pre-flight result dict"""
+    return {
+        "ok": reason_code == OK,
+        "reason_code": reason_code,
+        "detected_format": detected_format,
+        "detail": detail
+    }
@@ -0,0 +1,168 @@
+"""
+Result Store
+Persists completed workflow results keyed by document hash and pipeline version
+so re-uploads of the same document can be answered without re-processing
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def compute_pipeline_version(*components: Any) -> str:
+    """
+    Compute a stable digest over pipeline configuration
+
+    Args:
+        components: Thresholds, rules, patterns or any JSON-serializable config
+
+    Returns:
+        Short hex digest that changes whenever any component changes
+    """
+    canonical = json.dumps(components, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def _encode(value: Any) -> Any:
+    """JSON form of result values: FieldMatch as its dict, anything else as str"""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+class ResultStore:
+    """
+    Stores processed results in SQLite with an in-memory front cache
+
+    Results are keyed by (document_id, pipeline_version). Because the
+    pipeline version is derived from thresholds and rules, changing any of
+    them makes older entries unreachable without explicit invalidation.
+
+    Results are stored as JSON (extracted fields as FieldMatch.to_dict(),
+    other non-JSON values as str), and every get() decodes a fresh copy, so
+    callers may modify what they are given without touching the cache.
+    """
+
+    def __init__(self, db_path: str = "doc_anomaly.db", max_memory_entries: int = 256):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self._memory: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize result store table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS processed_results (
+                document_id TEXT NOT NULL,
+                pipeline_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (document_id, pipeline_version)
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def get(self, document_id: str, pipeline_version: str) -> Optional[Dict[str, Any]]:
+        """Return the stored result for a document, or None if absent"""
+        key = (document_id, pipeline_version)
+
+        with self._lock:
+            if key in self._memory:
+                self.stats["hits"] += 1
+                return json.loads(self._memory[key])
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT result FROM processed_results
+                WHERE document_id = ? AND pipeline_version = ?
+            ''', key)
+            row = cursor.fetchone()
+            conn.close()
+            # Rows written before results were stored as JSON are misses
+            result = json.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning(f"Result store lookup failed: {e}")
+            row = result = None
+
+        with self._lock:
+            if result is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._remember(key, row[0])
+            self.stats["hits"] += 1
+        return result
+
+    def put(self, document_id: str, pipeline_version: str, result: Dict[str, Any]) -> bool:
+        """Store a completed result"""
+        key = (document_id, pipeline_version)
+
+        try:
+            encoded = json.dumps(result, default=_encode)
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO processed_results
+                (document_id, pipeline_version, result, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (document_id, pipeline_version, encoded,
+                  datetime.utcnow().isoformat()))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Result store write failed: {e}")
+            return False
+
+        with self._lock:
+            self._remember(key, encoded)
+            self.stats["stores"] += 1
+        return True
+
+    def invalidate(self, document_id: str = None) -> int:
+        """
+        Remove stored results
+
+        Args:
+            document_id: Only remove results for this document (all if None)
+
+        Returns:
+            Number of rows removed
+        """
+        with self._lock:
+            if document_id:
+                self._memory = {k: v for k, v in self._memory.items() if k[0] != document_id}
+            else:
+                self._memory.clear()
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        if document_id:
+            cursor.execute('DELETE FROM processed_results WHERE document_id = ?', (document_id,))
+        else:
+            cursor.execute('DELETE FROM processed_results')
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+
+        return removed
+
+    def _remember(self, key: tuple, result: str):
+        """Insert into the memory cache, evicting the oldest entry if full"""
+        if key not in self._memory and len(self._memory) >= self.max_memory_entries:
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[key] = result
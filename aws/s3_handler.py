@@ -110,6 +110,27 @@ class S3Handler:
             logger.error(f"Error downloading document from S3: {e}")
             return False
     
+    def get_object_edges(self, s3_key: str, edge_bytes: int,
+                         bucket_name: str = None, bucket_type: str = "raw_docs") -> Optional[Dict[str, Any]]:
+        """
+        Fetch the first and last bytes of an object with ranged GETs
+        
+        Args:
+            s3_key: S3 object key
+            edge_bytes: Number of bytes to read from each end
+            bucket_name: Explicit bucket (overrides bucket_type)
+            bucket_type: Type of bucket
+            
+        Returns:
+            Dict with head, tail and size, or None on failure
+        """
+        try:
+            bucket_name = bucket_name or self.buckets.get(bucket_type)
+            return read_object_edges(self.s3_client, bucket_name, s3_key, edge_bytes)
+        except Exception as e:
+            logger.error(f"Error reading object edges from S3: {e}")
+            return None
+    
     def store_embedding(self, document_id: str, embedding: list, metadata: Dict[str, Any] = None) -> bool:
         """
         Store document embedding in S3
@@ -174,6 +195,23 @@ class S3Handler:
             return False
 
 
-
-
-
+def read_object_edges(s3_client, bucket_name: str, s3_key: str, edge_bytes: int) -> Dict[str, Any]:
+    """
+    Read the first and last edge_bytes of an S3 object without downloading it
+    
+    The tail excludes any bytes already returned in the head, so it is empty
+    when the object fits in a single range.
+    """
+    response = s3_client.get_object(Bucket=bucket_name, Key=s3_key, Range=f"bytes=0-{edge_bytes - 1}")
+    head = response['Body'].read()
+    
+    content_range = response.get('ContentRange')
+    size = int(content_range.rsplit('/', 1)[1]) if content_range else len(head)
+    
+    tail = b''
+    if size > len(head):
+        tail_start = max(size - edge_bytes, len(head))
+        response = s3_client.get_object(Bucket=bucket_name, Key=s3_key, Range=f"bytes={tail_start}-")
+        tail = response['Body'].read()
+    
+    return {"head": head, "tail": tail, "size": size}
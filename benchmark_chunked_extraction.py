@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark chunked extraction
+Compares full-document GPT-4o extraction of long multi-page contracts with
+map-reduce extraction over page/section chunks, against the mock LLM client
+with latency growing with prompt size
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.chunked_extraction import ChunkedExtractor
+from agents.document_text import DocumentText
+from config.mock_llm import MockOpenAIClient
+from config.openai_config import OpenAIConfig, estimate_tokens
+
+BOILERPLATE = [
+    "The Lessee shall keep the premises in good repair and condition at all times.",
+    "Neither party may assign this agreement without prior written consent.",
+    "All notices shall be delivered in writing to the addresses set out above.",
+    "The Lessor may enter the premises on reasonable notice to carry out inspections.",
+    "This agreement is governed by the laws of the State of Delaware.",
+]
+
+FIELDS = ["monthly_rent", "lease_term", "effective_date", "expiration_date", "late_fee", "security_deposit"]
+FIELD_CUES = {
+    "monthly_rent": ["monthly rent"],
+    "lease_term": ["lease term"],
+    "effective_date": ["effective date"],
+    "expiration_date": ["expiration date"],
+    "late_fee": ["late fee"],
+    "security_deposit": ["security deposit"],
+}
+
+
+def generate_contract(rng: random.Random, pages: int, lines_per_page: int) -> DocumentText:
+    """Multi-page lease with its terms scattered over a few late pages"""
+    terms = {
+        "Monthly Rent": f"${rng.randint(1000, 9000):,}.00",
+        "Lease Term": f"{rng.choice([12, 24, 36])} months",
+        "Effective Date": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/2024",
+        "Expiration Date": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/2027",
+        "Late Fee": f"${rng.randint(25, 200)}.00",
+    }
+    placement = {label: rng.randrange(pages // 2, pages) for label in terms}
+
+    texts = []
+    for page in range(pages):
+        lines = [f"ARTICLE {page + 1}. GENERAL PROVISIONS"]
+        lines += [rng.choice(BOILERPLATE) for _ in range(lines_per_page)]
+        for label, value in terms.items():
+            if placement[label] == page:
+                lines += ["", f"{label}: {value}"]
+        texts.append("\n".join(lines))
+    return DocumentText.from_pages(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunked extraction")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument("--chunk-tokens", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated LLM latency per call (s)")
+    parser.add_argument("--latency-per-1k", type=float, default=0.05,
+                        help="Simulated extra latency per 1,000 prompt tokens (s)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(11)
+    docs = [generate_contract(rng, args.pages, args.lines_per_page) for _ in range(args.documents)]
+
+    # OpenAIConfig creates its response cache table in the working directory
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+
+        def uncached_config():
+            client = MockOpenAIClient(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k)
+            config = OpenAIConfig(client=client)
+            config.use_cache = False
+            # Whole texts, so the baseline is the full document
+            config.context_builder = None
+            return client, config
+
+        full_client, full_llm = uncached_config()
+        start = time.perf_counter()
+        full = [full_llm.extract_with_gpt4o(doc.text, "Extract the lease terms.", FIELDS) for doc in docs]
+        full_time = time.perf_counter() - start
+
+        chunked_client, chunked_llm = uncached_config()
+        extractor = ChunkedExtractor(chunked_llm, max_chunk_tokens=args.chunk_tokens)
+        start = time.perf_counter()
+        chunked = [extractor.extract(doc, "Extract the lease terms.", FIELDS, FIELD_CUES)["fields"]
+                   for doc in docs]
+        chunked_time = time.perf_counter() - start
+
+        # Buffered usage rows are written before the directory is removed
+        for config in (full_llm, chunked_llm):
+            config.usage_ledger.flush()
+
+    def values(answer):
+        return {name: (answer.get(name) or {}).get("value") for name in FIELDS}
+
+    differing = sum(1 for a, b in zip(full, chunked) if values(a) != values(b))
+    stats = extractor.get_stats()
+    full_tokens = sum(estimate_tokens(doc.text) for doc in docs)
+
+    print(f"\n📑 {args.documents} contracts, {args.pages} pages each "
+          f"(~{full_tokens // args.documents:,} tokens), {args.chunk_tokens}-token chunks")
+    print(f"  full document     {full_client.call_count:4d} calls  {full_tokens:9,d} document tokens  "
+          f"{full_time / args.documents * 1000:7.1f} ms/doc")
+    print(f"  chunked           {chunked_client.call_count:4d} calls  {stats['prompt_tokens']:9,d} document tokens  "
+          f"{chunked_time / args.documents * 1000:7.1f} ms/doc")
+    print(f"  chunks sent       {stats['chunks_sent']}/{stats['chunks']} "
+          f"({stats['chunks_skipped']} skipped by the regex pre-scan)")
+    print(f"  uncovered fields  {stats['fields_uncovered']} (sent with ranked context)")
+    print(f"  tokens saved      {stats['tokens_saved']:,} ({stats['token_savings_rate']:.1%})")
+    print(f"  concurrency saved {stats['latency_saved_seconds']:.2f}s of "
+          f"{stats['sequential_llm_seconds']:.2f}s sequential chunk time")
+    print(f"  answers differing {differing}")
+
+
+if __name__ == "__main__":
+    main()
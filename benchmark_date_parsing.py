@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark date parsing
+Compares the previous strptime cascade with the compiled-regex parser in
+agents/normalization.py, uncached and through its LRU cache
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.normalization import parse_date
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+
+def cascade_parse_date(date_str: str):
+    """The AnomalyDetectionAgent._parse_date implementation being replaced"""
+    try:
+        formats = [
+            '%m/%d/%Y', '%m-%d-%Y', '%Y-%m-%d',
+            '%d/%m/%Y', '%d-%m-%Y',
+            '%B %d, %Y', '%b %d, %Y',
+            '%d %B %Y', '%d %b %Y'
+        ]
+
+        for fmt in formats:
+            try:
+                return datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
+
+        date_match = re.search(r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})', date_str)
+        if date_match:
+            date_part = date_match.group(1)
+            for fmt in ['%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y', '%d-%m-%Y']:
+                try:
+                    return datetime.strptime(date_part, fmt)
+                except ValueError:
+                    continue
+
+    except Exception:
+        pass
+
+    return None
+
+
+def generate_dates(count: int, seed: int = 11):
+    """A mix of the shapes extraction produces, plus some invalid strings"""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        year, month, day = rng.randint(2015, 2030), rng.randint(1, 12), rng.randint(1, 28)
+        shape = rng.randrange(7)
+        if shape == 0:
+            samples.append(f"{month}/{day}/{year}")
+        elif shape == 1:
+            samples.append(f"{max(day, 13)}/{month}/{year}")   # day-first, unambiguous
+        elif shape == 2:
+            samples.append(f"{year}-{month:02d}-{day:02d}")
+        elif shape == 3:
+            samples.append(f"{MONTH_NAMES[month - 1]} {day}, {year}")
+        elif shape == 4:
+            samples.append(f"{day} {MONTH_NAMES[month - 1][:3]} {year}")
+        elif shape == 5:
+            samples.append(f"due on {month}-{day}-{year} net 30")
+        else:
+            # Invalid numeric dates whose digits must not be reread as another date
+            samples.append(rng.choice(["N/A", "TBD", "13/13/2024", "02/30/2024", "soon",
+                                       "2024-02-30", "2005-16-37", "1920-5-40"]))
+    return samples
+
+
+def timed(func, samples, repeat: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for sample in samples:
+            func(sample)
+    return (time.perf_counter() - start) / (repeat * len(samples)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark date parsing")
+    parser.add_argument("--count", type=int, default=20000, help="Date strings to generate")
+    parser.add_argument("--distinct", type=int, default=500,
+                        help="Distinct strings in the cached run (documents repeat dates)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    samples = generate_dates(args.count)
+    uncached = parse_date.__wrapped__
+
+    # Agreement: four-digit years only, where both parsers should agree
+    disagreements = []
+    for sample in samples:
+        old = cascade_parse_date(sample)
+        new = uncached(sample)
+        if (old.date() if old else None) != new:
+            disagreements.append((sample, old, new))
+
+    cascade_us = timed(cascade_parse_date, samples, args.repeat)
+    regex_us = timed(uncached, samples, args.repeat)
+
+    repeated = [samples[i % args.distinct] for i in range(args.count)]
+    parse_date.cache_clear()
+    cached_us = timed(parse_date, repeated, args.repeat)
+
+    print(f"\n📅 {args.count:,} date strings")
+    print(f"  strptime cascade  {cascade_us:8.2f} µs/call")
+    print(f"  regex parser      {regex_us:8.2f} µs/call   {cascade_us / regex_us:5.1f}x")
+    print(f"  regex + LRU       {cached_us:8.2f} µs/call   {cascade_us / cached_us:5.1f}x "
+          f"({args.distinct} distinct strings)")
+    print(f"  cache             {parse_date.cache_info()}")
+    print(f"  disagreements     {len(disagreements)}")
+    for sample, old, new in disagreements[:5]:
+        print(f"    {sample!r}: cascade={old} regex={new}")
+
+
+if __name__ == "__main__":
+    main()
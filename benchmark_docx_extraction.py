@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark DOCX text extraction
+Compares the streaming extractor against the python-docx path on a
+generated invoice with many line-item table rows
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.docx_stream import extract_docx_text
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/header1.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml"/>
+</Types>"""
+
+RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+DOC_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/header" Target="header1.xml"/>
+</Relationships>"""
+
+NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" ' \
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+
+def _paragraph(text: str) -> str:
+    return f"<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>"
+
+
+def _row(cells) -> str:
+    return "<w:tr>" + "".join(f"<w:tc>{_paragraph(c)}</w:tc>" for c in cells) + "</w:tr>"
+
+
+def generate_docx(path: str, rows: int):
+    """Write an invoice DOCX with a header part and a line-item table"""
+    body = [
+        _paragraph("INVOICE #INV-2024-001"),
+        _paragraph("Invoice Date: 01/15/2024"),
+        _paragraph("From: Acme Corporation"),
+        "<w:tbl>",
+        _row(["Item", "Qty", "Unit Price", "Amount"]),
+    ]
+    for i in range(rows):
+        body.append(_row([f"Service line {i}", str(i % 9 + 1), "125.00", f"{(i % 9 + 1) * 125:,}.00"]))
+    body.append("</w:tbl>")
+    body.append(_paragraph("Total Amount Due: $12,500.00"))
+    body.append('<w:sectPr><w:headerReference w:type="default" r:id="rId1"/></w:sectPr>')
+
+    document = f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document {NS}><w:body>' \
+               + "".join(body) + "</w:body></w:document>"
+    header = f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:hdr {NS}>' \
+             + _paragraph("Acme Corporation - Accounts Receivable") + "</w:hdr>"
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", RELS)
+        archive.writestr("word/_rels/document.xml.rels", DOC_RELS)
+        archive.writestr("word/document.xml", document)
+        archive.writestr("word/header1.xml", header)
+
+
+def extract_with_python_docx(path: str) -> str:
+    """Previous ingestion path: paragraphs only"""
+    import docx
+    doc = docx.Document(path)
+    return "\n".join(p.text for p in doc.paragraphs).strip()
+
+
+def measure(label: str, func, path: str, repeat: int):
+    """Time an extractor, then record its peak traced memory in a separate run"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        text = func(path)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    # tracemalloc slows allocation-heavy code, so keep it out of the timing
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  {label:<14} {elapsed * 1000:9.1f} ms   peak {peak / 1024 / 1024:7.2f} MB   "
+          f"{len(text):>9,} chars   {text.count(chr(10)) + 1:>7,} lines")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOCX text extraction")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Table row counts to generate")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        import docx  # noqa: F401
+        have_python_docx = True
+    except ImportError:
+        have_python_docx = False
+        print("⚠️  python-docx not installed - only the streaming path is measured")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"invoice_{rows}.docx")
+            generate_docx(path, rows)
+            print(f"\n📄 {rows:,} table rows ({os.path.getsize(path) / 1024:.0f} KB)")
+            measure("streaming", extract_docx_text, path, args.repeat)
+            if have_python_docx:
+                measure("python-docx", extract_with_python_docx, path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
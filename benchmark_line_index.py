@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark keyword-anchored field extraction
+Compares a per-keyword scan of every line against the shared keyword line
+index on generated multi-page contracts
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.document_text import DocumentText
+from agents.extraction_agent import ExtractionAgent, DATE_PATTERN, AMOUNT_PATTERN
+
+FILLER = [
+    "The Lessee shall maintain the premises in good repair at its own expense.",
+    "Notices shall be delivered in writing to the addresses set out above.",
+    "This clause survives termination of the agreement for any reason.",
+    "Payment of $1,250.00 is due on the first business day of each month.",
+    "Either party may assign this agreement with prior written consent.",
+]
+
+
+def generate_contract(pages: int, lines_per_page: int = 50, seed: int = 7) -> DocumentText:
+    """Build a long contract with the anchored fields near the end"""
+    rng = random.Random(seed)
+    page_texts = []
+    for page in range(pages):
+        lines = [rng.choice(FILLER) for _ in range(lines_per_page)]
+        page_texts.append("\n".join(lines))
+    page_texts[-1] += "\nEffective Date: 01/01/2024\nExpiration Date: 12/31/2026\n" \
+                      "Total Amount: $48,000.00\nDue Date: 02/01/2024"
+    return DocumentText.from_pages(page_texts)
+
+
+def scan_per_keyword(doc: DocumentText, field_keywords, date_regex, amount_regex):
+    """Previous approach: split and scan all lines once per keyword per field"""
+    results = {}
+    for field_name, keywords in field_keywords.items():
+        regex = amount_regex if field_name.endswith('total') else date_regex
+        value = ""
+        for keyword in keywords:
+            for line in doc.text.split('\n'):
+                if keyword in line.lower():
+                    found = regex.findall(line)
+                    if found:
+                        value = found[-1] if field_name.endswith('total') else found[0]
+                        break
+            if value:
+                break
+        results[field_name] = value
+    return results
+
+
+def scan_with_index(agent: ExtractionAgent, doc: DocumentText):
+    """Shared index: one keyword pass, cached matches per line"""
+    index = agent.build_line_index(doc)
+    results = {}
+    for field_name, keywords in agent.field_keywords.items():
+        if field_name.endswith('total'):
+            value, _ = agent._extract_amount_field(index, keywords)
+        else:
+            value, _ = agent._extract_date_field(index, keywords)
+        results[field_name] = value
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyword line index")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    agent = ExtractionAgent()
+    date_regex = re.compile(DATE_PATTERN)
+    amount_regex = re.compile(AMOUNT_PATTERN)
+
+    for pages in args.pages:
+        doc = generate_contract(pages)
+        print(f"\n📄 {pages:,} pages ({len(doc):,} chars)")
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            baseline = scan_per_keyword(DocumentText(doc.text), agent.field_keywords,
+                                        date_regex, amount_regex)
+        per_keyword = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            indexed = scan_with_index(agent, DocumentText(doc.text))
+        index_time = (time.perf_counter() - start) / args.repeat
+
+        # The fallback branches differ, so only compare fields the baseline found
+        mismatched = [k for k, v in baseline.items() if v and indexed[k] != v]
+        print(f"  per-keyword scan {per_keyword * 1000:9.1f} ms")
+        print(f"  line index       {index_time * 1000:9.1f} ms   "
+              f"{per_keyword / index_time if index_time else 0:5.1f}x")
+        if mismatched:
+            print(f"  ⚠️  mismatched fields: {', '.join(mismatched)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark LLM request coalescing
+Parallel batch workers extracting documents where the same invoice arrives
+several times at once (duplicate uploads under different S3 keys): API
+calls with the response cache alone versus cache plus single-flight
+coalescing, against the mock LLM client
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.llm_cache import LLMResponseCache, SingleFlight
+from config.mock_llm import MockOpenAIClient
+from config.openai_config import OpenAIConfig
+
+FIELDS = ["invoice_number", "total_amount", "due_date"]
+
+
+def invoice_text(number: int) -> str:
+    return (f"INVOICE\nInvoice #: INV-{number:05d}\nFrom: Vendor {number % 17}\n"
+            f"Total Amount Due: ${number * 13 % 9000 + 100:,}.00\nDue Date: {number % 12 + 1}/15/2024")
+
+
+def run(args, documents, coalesce: bool):
+    """Extract every document from worker threads; returns (client, config, seconds)"""
+    client = MockOpenAIClient(latency=args.latency)
+    config = OpenAIConfig(client=client, response_cache=LLMResponseCache(f"coalesce_{coalesce}.db"))
+    config.in_flight = SingleFlight() if coalesce else None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(lambda text: config.extract_with_gpt4o(text, "Extract the invoice fields.", FIELDS),
+                          documents))
+    return client, config, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM request coalescing")
+    parser.add_argument("--invoices", type=int, default=60, help="Distinct invoices")
+    parser.add_argument("--copies", type=int, default=3, help="Simultaneous uploads of each invoice")
+    parser.add_argument("--workers", type=int, default=12, help="Parallel batch workers")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated LLM latency per call (s)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # Duplicates sit next to each other, as when one upload lands under several keys
+    documents = [invoice_text(number) for number in range(args.invoices) for _ in range(args.copies)]
+
+    # Each run gets a fresh response cache in the working directory
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        cache_client, cache_config, cache_time = run(args, documents, coalesce=False)
+        flight_client, flight_config, flight_time = run(args, documents, coalesce=True)
+
+        # Buffered usage rows are written before the directory is removed
+        for config in (cache_config, flight_config):
+            config.usage_ledger.flush()
+
+    stats = flight_config.in_flight.get_stats()
+    print(f"\n🔀 {len(documents)} documents ({args.invoices} invoices x {args.copies} copies), "
+          f"{args.workers} workers, {args.latency * 1000:.0f} ms simulated latency")
+    print(f"  {'response cache only':<26}{cache_client.call_count:5d} API calls  {cache_time:6.2f}s  "
+          f"{cache_config.response_cache.get_stats()['hits']} cache hits")
+    print(f"  {'cache + coalescing':<26}{flight_client.call_count:5d} API calls  {flight_time:6.2f}s  "
+          f"{flight_config.response_cache.get_stats()['hits']} cache hits, {stats['coalesced']} coalesced")
+    print(f"  tokens saved by coalescing {stats['tokens_saved']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark LLM gateway
+Load-tests LLMGateway against the mock LLM client: throughput of
+thread-per-call synchronous requests versus the asyncio gateway, the
+thread-safe sync wrapper, and adherence to the tokens-per-minute limit
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.mock_llm import MockOpenAIClient
+from config.openai_config import LLMGateway, OpenAIConfig, estimate_tokens
+
+
+def prompt(index: int, size: int) -> list:
+    """Distinct user message of about size characters"""
+    return [{"role": "user", "content": f"Request {index}: " + "invoice line item " * (size // 18)}]
+
+
+def uncached_config(client: MockOpenAIClient) -> OpenAIConfig:
+    config = OpenAIConfig(client=client)
+    config.use_cache = False
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM gateway")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated LLM latency per call (s)")
+    parser.add_argument("--threads", type=int, default=8, help="Worker threads of the synchronous baseline")
+    parser.add_argument("--concurrency", type=int, default=64, help="Gateway concurrency limit")
+    parser.add_argument("--limited-calls", type=int, default=60)
+    parser.add_argument("--tpm", type=float, default=24000, help="Tokens-per-minute limit of the limited run")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # OpenAIConfig creates its response cache table in the working directory
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        print(f"\n🚦 {args.calls} calls at {args.latency * 1000:.0f} ms simulated latency")
+
+        # Baseline: a worker thread blocked on every synchronous call
+        config = uncached_config(MockOpenAIClient(latency=args.latency))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(executor.map(lambda i: config.call_gpt4o(prompt(i, 400)), range(args.calls)))
+        elapsed = time.perf_counter() - start
+        print(f"  {f'sync, {args.threads} threads':<28}{elapsed:7.2f}s  {args.calls / elapsed:8.1f} calls/s")
+
+        # Gateway awaited from async code
+        gateway = LLMGateway(uncached_config(MockOpenAIClient(latency=args.latency, asynchronous=True)),
+                             max_concurrency=args.concurrency, requests_per_minute=1e6, tokens_per_minute=1e9)
+
+        async def run_async():
+            return await asyncio.gather(*(gateway.acall(prompt(i, 400)) for i in range(args.calls)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_async())
+        elapsed = time.perf_counter() - start
+        stats = gateway.get_stats()
+        print(f"  {'gateway, acall':<28}{elapsed:7.2f}s  {args.calls / elapsed:8.1f} calls/s  "
+              f"peak in flight {stats['peak_in_flight']}/{args.concurrency}, "
+              f"{sum(r is None for r in results)} failed")
+
+        # Same gateway through the blocking wrapper, from many threads
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(lambda i: gateway.call(prompt(i, 400)), range(args.calls)))
+        elapsed = time.perf_counter() - start
+        print(f"  {'gateway, call from threads':<28}{elapsed:7.2f}s  {args.calls / elapsed:8.1f} calls/s")
+        gateway.close()
+
+        # Tokens-per-minute limit: a minute's allowance up front, then the refill rate
+        client = MockOpenAIClient(latency=args.latency, asynchronous=True)
+        gateway = LLMGateway(uncached_config(client), max_concurrency=args.concurrency,
+                             requests_per_minute=1e6, tokens_per_minute=args.tpm)
+
+        async def run_limited():
+            return await asyncio.gather(*(gateway.acall(prompt(i, 2000)) for i in range(args.limited_calls)))
+
+        start = time.perf_counter()
+        asyncio.run(run_limited())
+        elapsed = time.perf_counter() - start
+        gateway.close()
+
+    stats = gateway.get_stats()
+    used = stats["prompt_tokens"] + stats["completion_tokens"]
+    allowed = args.tpm + args.tpm / 60 * elapsed
+    estimated = sum(estimate_tokens(m["content"]) for r in client.requests for m in r["messages"])
+    print(f"\n  {args.limited_calls} calls of ~{estimated // max(1, len(client.requests))} tokens "
+          f"at {args.tpm:,.0f} TPM: {elapsed:.2f}s, {stats['rate_limited']} calls waited "
+          f"{stats['rate_limit_wait_seconds']:.2f}s in total")
+    print(f"  tokens used {used:,} of {allowed:,.0f} allowed over the run "
+          f"({'within' if used <= allowed * 1.02 else 'OVER'} limit)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+LLM load-test harness
+Drives the agents' GPT-4o paths against the local mock LLM server (real
+HTTP through the OpenAI client) at a target concurrency and reports
+throughput, p50/p95/p99 latency per document, retried and hedged
+requests and calls short-circuited by the circuit breaker
+
+Scenarios:
+    hybrid      regex-first extraction with low-confidence fields sent to the LLM
+    chunked     map-reduce extraction of long multi-page contracts
+    comparison  contract-invoice comparison; GPT-4o semantic analysis runs in
+                the background, outside the per-document latency
+    outage      hybrid extraction while every LLM request fails with 500
+"""
+
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.chunked_extraction import ChunkedExtractor
+from agents.contract_invoice_agent import ContractInvoiceComparisonAgent
+from agents.extraction_agent import ExtractionAgent
+from agents.hybrid_extraction import HybridExtractionRouter
+from benchmark_chunked_extraction import FIELD_CUES, FIELDS, generate_contract
+from benchmark_hybrid_extraction import generate_invoice
+from config.llm_resilience import CircuitBreaker, ResilientCaller, RetryPolicy
+from config.llm_usage import LLMUsageLedger
+from config.mock_llm_server import MockLLMServer
+from config.openai_config import OpenAIConfig
+
+SCENARIOS = ("hybrid", "chunked", "comparison", "outage")
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(share * len(ordered)))) - 1]
+
+
+def build_operations(scenario: str, config: OpenAIConfig, count: int,
+                     rng: random.Random) -> Tuple[List[Callable], Callable]:
+    """One callable per document of the scenario, sharing the config's client, and a wait for background calls"""
+    if scenario in ("hybrid", "outage"):
+        router = HybridExtractionRouter(ExtractionAgent(), config)
+        documents = [
+            {"document_id": f"load-{i}", "document_type": "INVOICE",
+             "text_content": generate_invoice(rng, 40, messy=True)}
+            for i in range(count)
+        ]
+        return [lambda document=document: router.process(document) for document in documents], lambda: None
+
+    agent = ContractInvoiceComparisonAgent()
+    agent.openai_config = config
+    agent.chunked_extractor = ChunkedExtractor(config)
+
+    if scenario == "chunked":
+        contracts = [generate_contract(rng, 12, 30) for _ in range(count)]
+        return [
+            lambda contract=contract, i=i: agent.extract_with_gpt4o(
+                contract, "Extract the lease terms.", FIELDS, FIELD_CUES, document_id=f"load-{i}")
+            for i, contract in enumerate(contracts)
+        ], lambda: None
+
+    pairs = []
+    for i in range(count):
+        rent = rng.randint(1000, 9000)
+        contract = {
+            "document_id": f"contract-{i}",
+            "text_content": generate_contract(rng, 4, 20).text,
+            "extracted_fields": {"lease_amount": (f"${rent:,}.00", 0.9)}
+        }
+        invoice = {
+            "document_id": f"invoice-{i}",
+            "text_content": generate_invoice(rng, 20, messy=False),
+            # Off by more than the 5% tolerance, so the rules flag it and GPT-4o is queued
+            "extracted_fields": {"total_amount": (f"${int(rent * 1.2):,}.00", 0.9)}
+        }
+        pairs.append((contract, invoice))
+    return [lambda pair=pair: agent.compare(*pair) for pair in pairs], agent.wait_for_semantic_analysis
+
+
+def run_scenario(scenario: str, server: MockLLMServer, args, rng: random.Random) -> dict:
+    """Run every operation at the target concurrency; per-document latencies and counters"""
+    # A ledger and a circuit breaker per scenario, so their counts cover only this run
+    resilience = ResilientCaller(
+        timeout=args.timeout, retry_policy=RetryPolicy(max_attempts=args.max_retries + 1, base_delay=0.1),
+        circuit_breaker=CircuitBreaker(cooldown=args.breaker_cooldown),
+        hedge_percentile=args.hedge_percentile, seed=47
+    )
+    config = OpenAIConfig(base_url=server.url, usage_ledger=LLMUsageLedger(f"load_{scenario}.db"),
+                          resilience=resilience)
+    config.use_cache = False
+    operations, settle = build_operations(scenario, config, args.documents, rng)
+    server.reset_stats()
+    error_rate = server.error_rate
+    if scenario == "outage":
+        server.error_rate = 1.0 - server.rate_limit_rate
+
+    def timed(operation: Callable) -> float:
+        start = time.perf_counter()
+        operation()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = list(executor.map(timed, operations))
+    elapsed = time.perf_counter() - start
+    settle()
+    server.error_rate = error_rate
+
+    usage = config.usage_ledger.totals()
+    served = server.get_stats()
+    calls = resilience.get_stats()
+    resilience.close()
+    return {
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "llm_calls": usage["calls"] - usage["cache_hits"],
+        "llm_failures": usage["failures"],
+        "requests": served["requests"],
+        "retries": calls["retries"],
+        "hedges": calls["hedges"],
+        "short_circuited": calls["short_circuited"] + calls["circuit_breaker"]["rejected"],
+        "rate_limited": served["rate_limited"],
+        "errors": served["errors"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM load-test harness")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--documents", type=int, default=100, help="Documents per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Documents processed at the same time")
+    parser.add_argument("--latency", default="lognormal:0.2,0.5",
+                        help="Server latency distribution, e.g. 0.3, uniform:0.1,0.5, lognormal:0.2,0.5")
+    parser.add_argument("--latency-per-1k", type=float, default=0.02,
+                        help="Extra server latency per 1,000 prompt tokens (s)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05, help="Share of requests refused with 429")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After of 429 responses (s)")
+    parser.add_argument("--max-retries", type=int, default=2, help="Retries per call, with jittered backoff")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout (s)")
+    parser.add_argument("--hedge-percentile", type=float,
+                        help="Send a duplicate request once a call outlives this latency percentile, e.g. 0.95")
+    parser.add_argument("--breaker-cooldown", type=float, default=5.0,
+                        help="Seconds the circuit breaker stays open before probing")
+    args = parser.parse_args()
+
+    # Injected failures are counted below rather than logged
+    logging.disable(logging.ERROR)
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    rng = random.Random(47)
+
+    server = MockLLMServer(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k,
+                           error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                           retry_after=args.retry_after, seed=47)
+
+    print(f"\n🏋️ {args.documents} documents per scenario at concurrency {args.concurrency}; server latency "
+          f"{server.latency!r} + {args.latency_per_1k}s/1k tokens, {args.error_rate:.0%} errors, "
+          f"{args.rate_limit_rate:.0%} rate limited")
+    print(f"  {'scenario':<12}{'docs/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'LLM calls':>11}"
+          f"{'requests':>10}{'retries':>9}{'hedges':>8}{'429s':>6}{'500s':>6}{'failed':>8}{'skipped':>9}")
+
+    # Agents and the LLM ledger write doc_anomaly.db to the working directory
+    with tempfile.TemporaryDirectory() as tmp, server:
+        os.chdir(tmp)
+        for scenario in scenarios:
+            report = run_scenario(scenario, server, args, rng)
+            latencies = report["latencies"]
+            print(f"  {scenario:<12}{len(latencies) / report['elapsed']:8.1f}"
+                  f"{percentile(latencies, 0.50):7.2f}s{percentile(latencies, 0.95):7.2f}s"
+                  f"{percentile(latencies, 0.99):7.2f}s{report['llm_calls']:11d}{report['requests']:10d}"
+                  f"{report['retries']:9d}{report['hedges']:8d}{report['rate_limited']:6d}"
+                  f"{report['errors']:6d}{report['llm_failures']:8d}{report['short_circuited']:9d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Regex performance audit
+Runs every registered extraction pattern against generated worst-case
+inputs of growing size, flags super-linear scaling and checks per-pattern
+time budgets. Exits non-zero with --check when a budget is exceeded, so it
+can run as a CI step.
+"""
+
+import argparse
+import logging
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.extraction_agent import ExtractionAgent
+
+# Seconds allowed for one findall over the largest input, per pattern set.
+# Name patterns scan up to 200 characters after every keyword, so a text
+# that is nothing but keywords costs them a larger (linear) constant
+DEFAULT_BUDGET = 0.05
+PATTERN_BUDGETS: Dict[str, float] = {"vendor": 0.4, "parties": 0.2}
+
+# Growth exponent above which a pattern is reported as super-linear
+SUPERLINEAR_EXPONENT = 1.5
+
+
+def pattern_words(source: str) -> List[str]:
+    """Literal keywords of a pattern ("invoice", "between", "and" ...)"""
+    words = re.findall(r'(?<![\\])\b[a-z]{2,}\b', re.sub(r'\\[a-zA-Z]', ' ', source))
+    return words or ["x"]
+
+
+def adversarial_inputs(source: str) -> Dict[str, Callable[[int], str]]:
+    """
+    Input families that stress lazy quantifiers, overlapping classes and end anchors
+
+    Each family maps a size in characters to a text of about that size.
+    Texts end in a character outside the usual classes so optional-end
+    alternatives like (?:\\n|$) fail late rather than early.
+    """
+    words = pattern_words(source)
+    head = " ".join(words[:2])
+    keyword = words[0]
+    separator = words[1] if len(words) > 1 else keyword
+
+    def repeat(unit: str, size: int, prefix: str = "", suffix: str = "1") -> str:
+        return prefix + unit * max(1, (size - len(prefix)) // len(unit)) + suffix
+
+    return {
+        "long_run_no_terminator": lambda n: repeat("ab ", n, f"{head}: "),
+        "whitespace_heavy_ocr": lambda n: repeat("a \t  ", n, f"{head} "),
+        "repeated_keyword": lambda n: repeat(f"{keyword} ", n),
+        "repeated_separator": lambda n: repeat(f"a {separator} ", n, f"{head} "),
+        "digit_run": lambda n: repeat("1,", n, f"{head} $"),
+        "date_fragments": lambda n: repeat("1/1-", n, f"{head} "),
+    }
+
+
+def timed_findall(compiled: re.Pattern, text: str, repeat: int) -> float:
+    """Best-of-repeat seconds for one findall"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compiled.findall(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def growth_exponent(sizes: List[int], times: List[float]) -> float:
+    """Slope of log(time) against log(size) between the two largest inputs"""
+    t_small, t_large = max(times[-2], 1e-7), max(times[-1], 1e-7)
+    return math.log(t_large / t_small) / math.log(sizes[-1] / sizes[-2])
+
+
+def audit(agent: ExtractionAgent, sizes: List[int], repeat: int) -> List[Dict]:
+    """Time every pattern alternative and merged alternation on every input family"""
+    rows = []
+    registry = agent.pattern_registry
+    for name in registry.names():
+        group = registry.group(name)
+        targets: List[Tuple[str, re.Pattern]] = [
+            (f"{name}:{index}", compiled) for index, compiled in enumerate(group.compiled)
+        ]
+        if group.merged is not None:
+            targets.append((f"{name}:merged", group.merged))
+
+        for label, compiled in targets:
+            for family, make in adversarial_inputs(compiled.pattern).items():
+                times = [timed_findall(compiled, make(size), repeat) for size in sizes]
+                rows.append({
+                    "pattern_set": name,
+                    "pattern": label,
+                    "family": family,
+                    "seconds": times[-1],
+                    "exponent": growth_exponent(sizes, times),
+                    "budget": PATTERN_BUDGETS.get(name, DEFAULT_BUDGET)
+                })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regex performance audit")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 4000, 8000, 16000],
+                        help="Input sizes in characters, ascending")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if any pattern exceeds its time budget")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # Agents write doc_anomaly.db to the working directory; keep it out of the repo
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        agent = ExtractionAgent()
+        rows = audit(agent, sorted(args.sizes), args.repeat)
+
+    # Worst family per pattern
+    worst: Dict[str, Dict] = {}
+    for row in rows:
+        if row["pattern"] not in worst or row["seconds"] > worst[row["pattern"]]["seconds"]:
+            worst[row["pattern"]] = row
+
+    print(f"\n🔬 {len(worst)} patterns x {len(adversarial_inputs(''))} input families, "
+          f"largest input {max(args.sizes):,} chars")
+    print(f"  {'pattern':<24} {'worst family':<24} {'ms':>9} {'exponent':>9}  status")
+    over_budget = []
+    for label, row in sorted(worst.items(), key=lambda item: -item[1]["seconds"]):
+        superlinear = [r["family"] for r in rows
+                       if r["pattern"] == label and r["exponent"] > SUPERLINEAR_EXPONENT
+                       and r["seconds"] > 0.001]
+        status = []
+        if row["seconds"] > row["budget"]:
+            status.append(f"OVER BUDGET ({row['budget'] * 1000:.0f} ms)")
+            over_budget.append(label)
+        if superlinear:
+            status.append("super-linear: " + ", ".join(superlinear))
+        print(f"  {label:<24} {row['family']:<24} {row['seconds'] * 1000:9.2f} "
+              f"{row['exponent']:9.2f}  {'; '.join(status) or 'ok'}")
+
+    if over_budget:
+        print(f"\n❌ {len(over_budget)} pattern(s) over budget: {', '.join(over_budget)}")
+        if args.check:
+            sys.exit(1)
+    else:
+        print("\n✅ All patterns within budget")
+
+
+if __name__ == "__main__":
+    main()
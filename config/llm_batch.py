@@ -0,0 +1,315 @@
+"""
+LLM Batch Jobs
+Offline bulk mode: pending prompts are written to JSONL request files in the
+OpenAI Batch API format, submitted through a pluggable executor and joined
+back to their documents by custom ID
+"""
+
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+from config.llm_usage import current_call_context
+from config.openai_config import OpenAIConfig
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Batch API limit on requests per input file
+MAX_REQUESTS_PER_FILE = 50000
+
+
+def write_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    """Write one JSON object per line; returns the number of lines"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Objects of a JSONL file, skipping blank lines"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _completion_body(response: Any) -> Dict[str, Any]:
+    """ChatCompletion as the JSON body a batch output line carries"""
+    if hasattr(response, "model_dump"):
+        return response.model_dump()
+    return {
+        "model": getattr(response, "model", None),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": response.choices[0].message.content},
+                     "finish_reason": getattr(response.choices[0], "finish_reason", "stop")}],
+        "usage": {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens
+        }
+    }
+
+
+class LocalBatchExecutor:
+    """
+    Stand-in for the batch endpoint that replays request files locally
+
+    Each request line is sent to client.chat.completions.create (e.g. a
+    config.mock_llm.MockOpenAIClient) and answered in the batch output
+    format, so jobs can be run and tested offline.
+    """
+
+    def __init__(self, client: Any, max_workers: int = 4):
+        self.client = client
+        self.max_workers = max_workers
+
+    def run(self, request_path: str, output_path: str) -> Dict[str, Any]:
+        """Answer every request of a file; returns request counts"""
+        requests = read_jsonl(request_path)
+
+        def answer(request: Dict[str, Any]) -> Dict[str, Any]:
+            line = {"id": f"batch_req_{uuid.uuid4().hex[:24]}", "custom_id": request["custom_id"],
+                    "response": None, "error": None}
+            try:
+                response = self.client.chat.completions.create(**request["body"])
+                line["response"] = {"status_code": 200, "body": _completion_body(response)}
+            except Exception as e:
+                line["error"] = {"code": type(e).__name__, "message": str(e)}
+            return line
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            lines = list(executor.map(answer, requests))
+        write_jsonl(output_path, lines)
+
+        failed = sum(1 for line in lines if line["error"])
+        return {"status": "completed", "total": len(lines), "completed": len(lines) - failed, "failed": failed}
+
+
+class OpenAIBatchExecutor:
+    """
+    Submits request files to the OpenAI Batch API and waits for the output
+
+    Uploads the file, creates a batch for the chat completions endpoint and
+    polls it every poll_interval seconds until it finishes or timeout
+    elapses, then downloads the output (and error) lines.
+    """
+
+    TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, client: Any, completion_window: str = "24h",
+                 poll_interval: float = 60.0, timeout: Optional[float] = None):
+        self.client = client
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def run(self, request_path: str, output_path: str) -> Dict[str, Any]:
+        """Run one request file as a batch; returns its final status and counts"""
+        with open(request_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window=self.completion_window)
+        logger.info(f"Submitted batch {batch.id} for {request_path}")
+
+        started = time.time()
+        while batch.status not in self.TERMINAL_STATUSES:
+            if self.timeout is not None and time.time() - started > self.timeout:
+                logger.warning(f"Batch {batch.id} still {batch.status} after {self.timeout}s")
+                break
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+
+        with open(output_path, "w", encoding="utf-8") as out:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    out.write(self.client.files.content(file_id).text)
+
+        counts = getattr(batch, "request_counts", None)
+        return {
+            "status": batch.status,
+            "batch_id": batch.id,
+            "total": getattr(counts, "total", None),
+            "completed": getattr(counts, "completed", None),
+            "failed": getattr(counts, "failed", None)
+        }
+
+
+class LLMBatchJob:
+    """
+    Collects chat completion requests, runs them in bulk and returns answers by custom ID
+
+    Requests are built exactly as OpenAIConfig builds interactive ones, so
+    answers parse the same way and share its response cache: cached
+    requests are answered without being submitted, and bulk answers are
+    cached for later interactive calls. Answers are recorded in its usage
+    ledger under the llm_call_context each request was added in.
+
+    Usage:
+        job = LLMBatchJob(config, "batch_jobs/backfill-1")
+        job.add_extraction("doc-1:extraction", text, prompt, fields)
+        job.submit(LocalBatchExecutor(MockOpenAIClient()))
+        fields = job.extraction("doc-1:extraction")
+    """
+
+    def __init__(self, config: OpenAIConfig, work_dir: str,
+                 max_requests_per_file: int = MAX_REQUESTS_PER_FILE):
+        self.config = config
+        self.work_dir = work_dir
+        self.max_requests_per_file = max_requests_per_file
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._contexts: Dict[str, Dict[str, Optional[str]]] = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "submitted": 0, "answered": 0,
+                      "failed": 0, "files": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def add(self, custom_id: str, messages: list, system_prompt: str = None,
+            response_format: Dict[str, Any] = None) -> bool:
+        """
+        Queue a request under a unique custom ID
+
+        Returns:
+            True if it will be submitted, False if the cache answered it
+        """
+        if custom_id in self._pending or custom_id in self._results:
+            raise ValueError(f"Duplicate custom_id in batch job: {custom_id}")
+
+        params = self.config.build_params(messages, system_prompt, response_format)
+        self.stats["requests"] += 1
+        self._contexts[custom_id] = current_call_context()
+
+        cache = self.config.response_cache if self.config.use_cache else None
+        cached = cache.get(params) if cache else None
+        if cached is not None:
+            cached["cached"] = True
+            self._results[custom_id] = cached
+            self.stats["cache_hits"] += 1
+            self._record_usage(custom_id, cached)
+            return False
+
+        self._pending[custom_id] = params
+        return True
+
+    def add_extraction(self, custom_id: str, text: str, extraction_prompt: str,
+                       expected_fields: list) -> bool:
+        """Queue the request OpenAIConfig.extract_with_gpt4o would send"""
+        messages, system_prompt = self.config.extraction_request(
+            self.config.prompt_context(text, expected_fields), extraction_prompt, expected_fields
+        )
+        return self.add(custom_id, messages, system_prompt=system_prompt)
+
+    def add_analysis(self, custom_id: str, text: str, analysis_prompt: str) -> bool:
+        """Queue the request OpenAIConfig.analyze_with_gpt4o would send"""
+        return self.add(custom_id, self.config.analysis_request(text, analysis_prompt))
+
+    def write_requests(self) -> List[str]:
+        """Write pending requests to JSONL files of at most max_requests_per_file lines"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        ids = list(self._pending)
+        paths = []
+        for number, first in enumerate(range(0, len(ids), self.max_requests_per_file)):
+            path = os.path.join(self.work_dir, f"requests_{number:04d}.jsonl")
+            write_jsonl(path, (
+                {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": self._pending[custom_id]}
+                for custom_id in ids[first:first + self.max_requests_per_file]
+            ))
+            paths.append(path)
+        return paths
+
+    def submit(self, executor: Any) -> Dict[str, Any]:
+        """
+        Run every pending request through an executor and collect the answers
+
+        Args:
+            executor: Anything with run(request_path, output_path), e.g.
+                OpenAIBatchExecutor or LocalBatchExecutor
+
+        Returns:
+            Per-file executor reports and the job counters
+        """
+        reports = []
+        for request_path in self.write_requests():
+            output_path = request_path.replace("requests_", "responses_")
+            report = executor.run(request_path, output_path)
+            report["request_file"] = request_path
+            report["response_file"] = output_path
+            reports.append(report)
+            self.stats["files"] += 1
+            if os.path.exists(output_path):
+                self._collect(read_jsonl(output_path))
+
+        # Requests the executor never answered
+        for custom_id in list(self._pending):
+            self._results[custom_id] = None
+            self.stats["failed"] += 1
+            self._record_usage(custom_id, None)
+        self._pending.clear()
+
+        return {"files": reports, **self.get_stats()}
+
+    def _collect(self, lines: List[Dict[str, Any]]):
+        """Join output lines to their requests by custom ID"""
+        cache = self.config.response_cache if self.config.use_cache else None
+        for line in lines:
+            custom_id = line.get("custom_id")
+            params = self._pending.pop(custom_id, None)
+            if params is None:
+                continue
+            self.stats["submitted"] += 1
+
+            response = line.get("response") or {}
+            body = response.get("body") if response.get("status_code") == 200 else None
+            if line.get("error") or not body:
+                logger.warning(f"Batch request {custom_id} failed: {line.get('error') or response}")
+                self._results[custom_id] = None
+                self.stats["failed"] += 1
+                self._record_usage(custom_id, None)
+                continue
+
+            usage = body.get("usage") or {}
+            result = {
+                "content": body["choices"][0]["message"]["content"],
+                "usage": {
+                    "prompt_tokens": usage.get("prompt_tokens"),
+                    "completion_tokens": usage.get("completion_tokens"),
+                    "total_tokens": usage.get("total_tokens")
+                }
+            }
+            self._results[custom_id] = result
+            self.stats["answered"] += 1
+            self.stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+            self.stats["completion_tokens"] += usage.get("completion_tokens") or 0
+            if cache:
+                cache.put(params, result)
+            self._record_usage(custom_id, result)
+
+    def _record_usage(self, custom_id: str, result: Optional[Dict[str, Any]]):
+        """Ledger entry for an answered, cached or failed request; bulk calls have no latency"""
+        ledger = self.config.usage_ledger
+        if ledger is not None:
+            context = self._contexts.get(custom_id) or {}
+            ledger.record(self.config.model, result, None,
+                          agent=context.get("agent"), document_id=context.get("document_id"))
+
+    def result(self, custom_id: str) -> Optional[Dict[str, Any]]:
+        """Raw {"content", "usage"} answer, or None if the request failed"""
+        return self._results.get(custom_id)
+
+    def extraction(self, custom_id: str) -> Dict[str, Any]:
+        """Parsed answer of an add_extraction request, as extract_with_gpt4o returns it"""
+        return self.config.parse_extraction(self.result(custom_id))
+
+    def analysis(self, custom_id: str) -> Dict[str, Any]:
+        """Parsed answer of an add_analysis request, as analyze_with_gpt4o returns it"""
+        return self.config.parse_analysis(self.result(custom_id))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request, cache-hit, answer and failure counts with token usage"""
+        report = dict(self.stats)
+        report["pending"] = len(self._pending)
+        return report
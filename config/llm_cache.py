@@ -0,0 +1,293 @@
+"""
+LLM Response Cache
+Persists chat completion responses keyed by a canonical hash of the request,
+so re-processing and duplicate uploads do not pay for identical calls twice,
+and coalesces identical requests that are in flight at the same time
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Request parameters that determine the response
+CACHE_KEY_PARAMS = ("model", "messages", "temperature", "response_format")
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """
+    Canonical digest of a chat completion request
+
+    Only the parameters in CACHE_KEY_PARAMS take part, serialized with
+    sorted keys so dict ordering does not matter.
+    """
+    canonical = json.dumps({name: params.get(name) for name in CACHE_KEY_PARAMS},
+                           sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Chat completion responses in SQLite with an in-memory LRU front cache
+
+    Entries expire ttl_seconds after they were stored, and the store is
+    bounded to max_entries rows, evicting the least recently used. Every
+    hit counts the tokens the original call spent as saved.
+    """
+
+    def __init__(self, db_path: str = "doc_anomaly.db", ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 5000, max_memory_entries: int = 256):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0,
+                      "prompt_tokens_saved": 0, "completion_tokens_saved": 0}
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize LLM response cache table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                request_hash TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["created_at"] > self.ttl_seconds
+
+    def get(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The cached response to an identical request, or None"""
+        key = request_key(params)
+        entry = self._lookup(key)
+
+        if entry is not None and self._expired(entry):
+            self._delete(key)
+            with self._lock:
+                self.stats["expired"] += 1
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            usage = entry["response"].get("usage") or {}
+            self.stats["hits"] += 1
+            self.stats["prompt_tokens_saved"] += usage.get("prompt_tokens") or 0
+            self.stats["completion_tokens_saved"] += usage.get("completion_tokens") or 0
+        return dict(entry["response"])
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('SELECT response, created_at FROM llm_response_cache WHERE request_hash = ?', (key,))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute('UPDATE llm_response_cache SET last_used = ? WHERE request_hash = ?',
+                               (time.time(), key))
+                conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"LLM response cache lookup failed: {e}")
+            return None
+
+        if not row:
+            return None
+        entry = {"response": json.loads(row[0]), "created_at": row[1]}
+        with self._lock:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, params: Dict[str, Any], response: Dict[str, Any]) -> bool:
+        """Store the response to a request"""
+        key = request_key(params)
+        now = time.time()
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO llm_response_cache
+                (request_hash, model, response, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, params.get("model"), json.dumps(response), now, now))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"LLM response cache write failed: {e}")
+            return False
+
+        with self._lock:
+            self._remember(key, {"response": dict(response), "created_at": now})
+            self.stats["stores"] += 1
+            self._puts_since_trim += 1
+            trim = self._puts_since_trim >= max(1, self.max_entries // 100)
+            if trim:
+                self._puts_since_trim = 0
+        if trim:
+            self._trim()
+        return True
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM llm_response_cache WHERE request_hash = ?', (key,))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"LLM response cache delete failed: {e}")
+
+    def _trim(self):
+        """Drop expired rows, then the least recently used beyond max_entries"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM llm_response_cache WHERE created_at < ?',
+                           (time.time() - self.ttl_seconds,))
+            expired = cursor.rowcount
+            cursor.execute('''
+                DELETE FROM llm_response_cache WHERE rowid IN (
+                    SELECT rowid FROM llm_response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            evicted = cursor.rowcount
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"LLM response cache eviction failed: {e}")
+            return
+
+        with self._lock:
+            self.stats["expired"] += expired
+            self.stats["evictions"] += evicted
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        """Insert into the memory cache, evicting the least recently used entry if full"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> int:
+        """Remove every entry"""
+        with self._lock:
+            self._memory.clear()
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM llm_response_cache')
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, hit rate, tokens saved and stored entry count"""
+        with self._lock:
+            report = dict(self.stats)
+        lookups = report["hits"] + report["misses"]
+        report["hit_rate"] = report["hits"] / lookups if lookups else 0.0
+        report["tokens_saved"] = report["prompt_tokens_saved"] + report["completion_tokens_saved"]
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM llm_response_cache')
+            report["entries"] = cursor.fetchone()[0]
+            conn.close()
+        except Exception:
+            report["entries"] = None
+        return report
+
+
+class SingleFlight:
+    """
+    Identical requests in flight at the same time share one call
+
+    The first caller for a request key leads: it makes the call and hands
+    the result to finish(). Callers arriving before that follow: they wait
+    on the leader's Future (blocking with follow(), or awaited through
+    asyncio.wrap_future) and get a copy of its result marked
+    "coalesced": True. Leaders should consult the response cache and store
+    into it before finish(), so a request is either in flight or cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "prompt_tokens_saved": 0, "completion_tokens_saved": 0}
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """The Future for a request key and whether this caller leads it"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.stats["leaders"] += 1
+            return future, True
+
+    def finish(self, key: str, result: Optional[Dict[str, Any]]):
+        """Publish the leader's result (None on failure) to its followers"""
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future is not None:
+            future.set_result(result)
+
+    def follow(self, future: Future) -> Optional[Dict[str, Any]]:
+        """Block until the leader finishes; its result, marked as coalesced"""
+        return self.share(future.result())
+
+    def share(self, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """A follower's copy of the leader's result"""
+        if result is None:
+            return None
+        usage = result.get("usage") or {}
+        with self._lock:
+            self.stats["prompt_tokens_saved"] += usage.get("prompt_tokens") or 0
+            self.stats["completion_tokens_saved"] += usage.get("completion_tokens") or 0
+        shared = dict(result)
+        shared["coalesced"] = True
+        return shared
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Leader and coalesced call counts, tokens saved and requests in flight"""
+        with self._lock:
+            report = dict(self.stats)
+            report["in_flight"] = len(self._in_flight)
+        calls = report["leaders"] + report["coalesced"]
+        report["coalesce_rate"] = report["coalesced"] / calls if calls else 0.0
+        report["tokens_saved"] = report["prompt_tokens_saved"] + report["completion_tokens_saved"]
+        return report
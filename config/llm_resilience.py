@@ -0,0 +1,401 @@
+"""
+LLM Call Resilience
+Per-call timeouts, retries with exponential backoff and jitter, hedged
+duplicate requests and a circuit breaker around chat completion calls
+"""
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth another attempt: timeout, conflict, rate limit, server errors
+RETRYABLE_STATUSES = (408, 409, 429)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures, 408/409/429 and 5xx responses; not bad requests"""
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES or status >= 500
+    # openai.APIConnectionError / APITimeoutError carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds asked for by a Retry-After header on the error's response, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter
+
+    Attempt n (from 0) waits a uniform draw from [0, min(max_delay,
+    base_delay * 2**n)], so callers failing together do not retry together.
+    A Retry-After hint from the server is honoured, up to max_delay.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, rng: random.Random, error: Optional[BaseException] = None) -> float:
+        """Seconds to wait before retrying after failed attempt number attempt"""
+        delay = rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hint = retry_after(error) if error is not None else None
+        if hint:
+            delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Stops calling the API while most recent calls fail
+
+    Tracks the outcome of the last window calls. Once at least min_calls
+    are known and failure_threshold of them failed, the circuit opens:
+    allow() refuses calls for cooldown seconds, so callers fall back to
+    their regex paths at once instead of each waiting for its own
+    failure. Then one probe call is let through (half open); its success
+    closes the circuit, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: float = 0.5, window: int = 20,
+                 min_calls: int = 10, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "trips": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def is_open(self) -> bool:
+        """Whether calls are being refused (a half-open circuit still accepts its probe)"""
+        with self._lock:
+            state = self._current_state()
+            return state == self.OPEN or (state == self.HALF_OPEN and self._probing)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; refused calls are counted"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats["successes"] += 1
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._outcomes.append(False)
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            failures = self._outcomes.count(False)
+            if (self._state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_threshold):
+                self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.stats["trips"] += 1
+        logger.warning(f"LLM circuit breaker open for {self.cooldown:g}s after repeated failures")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """State, recent failure rate, outcome counts, refused calls and times opened"""
+        with self._lock:
+            report = dict(self.stats)
+            report["state"] = self._current_state()
+            outcomes = len(self._outcomes)
+            report["failure_rate"] = self._outcomes.count(False) / outcomes if outcomes else 0.0
+        return report
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for hedging at a percentile"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, share: float) -> Optional[float]:
+        """Nearest-rank percentile, or None until min_samples latencies are known"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered), max(1, math.ceil(share * len(ordered)))) - 1]
+
+
+class ResilientCaller:
+    """
+    Runs chat completion calls with a timeout, retries, hedging and a breaker
+
+    Every attempt passes timeout to the client. Retryable failures (see
+    is_retryable) are retried under retry_policy; others fail at once.
+    With hedge_percentile set (e.g. 0.95), an attempt still running after
+    that percentile of recent latencies gets a duplicate request, and the
+    first answer wins; hedge_after fixes the delay instead. Attempts are
+    refused with CircuitOpenError while the circuit breaker is open.
+
+    Defaults come from OPENAI_TIMEOUT (60s), OPENAI_MAX_RETRIES (2),
+    OPENAI_HEDGE_PERCENTILE (off) and OPENAI_BREAKER_THRESHOLD (0.5;
+    0 disables the breaker).
+    """
+
+    def __init__(self, timeout: Optional[float] = None, retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 hedge_percentile: Optional[float] = None, hedge_after: Optional[float] = None,
+                 max_hedge_workers: int = 16, seed: Optional[int] = None):
+        self.timeout = timeout or float(os.getenv("OPENAI_TIMEOUT", "60"))
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=int(os.getenv("OPENAI_MAX_RETRIES", "2")) + 1)
+        if circuit_breaker is None:
+            threshold = float(os.getenv("OPENAI_BREAKER_THRESHOLD", "0.5"))
+            circuit_breaker = CircuitBreaker(failure_threshold=threshold) if threshold > 0 else None
+        self.circuit_breaker = circuit_breaker
+        if hedge_percentile is None and os.getenv("OPENAI_HEDGE_PERCENTILE"):
+            hedge_percentile = float(os.getenv("OPENAI_HEDGE_PERCENTILE"))
+        self.hedge_percentile = hedge_percentile
+        self.hedge_after = hedge_after
+        self.latencies = LatencyTracker()
+
+        self._rng = random.Random(seed)
+        self._max_hedge_workers = max_hedge_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "timeouts": 0, "failures": 0,
+                      "hedges": 0, "hedge_wins": 0, "short_circuited": 0, "backoff_seconds": 0.0}
+
+    def available(self) -> bool:
+        """False while the circuit breaker refuses calls"""
+        return self.circuit_breaker is None or not self.circuit_breaker.is_open()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which an attempt is duplicated, or None when not hedging"""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if self.hedge_percentile is None:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    def _count(self, name: str, amount: float = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _admit(self, last_error: Optional[BaseException]):
+        """Raise unless the breaker lets the next attempt through; a call cut short by it fails with its last error"""
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+            self._count("short_circuited")
+            if last_error is not None:
+                raise last_error
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Backoff before retrying a failed attempt, or None if the error is final"""
+        if not is_retryable(error) or attempt + 1 >= self.retry_policy.max_attempts:
+            self._count("failures")
+            return None
+        delay = self.retry_policy.backoff(attempt, self._rng, error)
+        logger.warning(f"GPT-4o attempt {attempt + 1} failed ({error}); retrying in {delay:.2f}s")
+        self._count("retries")
+        self._count("backoff_seconds", delay)
+        return delay
+
+    def _settle(self, error: Optional[BaseException], elapsed: float):
+        """Feed an attempt's outcome to the breaker and latency tracker"""
+        if error is None:
+            self.latencies.add(elapsed)
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            return
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or type(error).__name__ == "APITimeoutError":
+            self._count("timeouts")
+        if self.circuit_breaker is not None:
+            # A bad request says nothing about the health of the service
+            if is_retryable(error):
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+
+    def call(self, create: Callable[..., Any], params: Dict[str, Any]) -> Any:
+        """Blocking create(**params, timeout=...) with retries and hedging; raises the last error"""
+        self._count("calls")
+        attempt, last_error = 0, None
+        while True:
+            self._admit(last_error)
+            start = time.perf_counter()
+            try:
+                response = self._attempt(create, params)
+            except Exception as e:
+                self._settle(e, time.perf_counter() - start)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt, last_error = attempt + 1, e
+                continue
+            self._settle(None, time.perf_counter() - start)
+            return response
+
+    def _attempt(self, create: Callable[..., Any], params: Dict[str, Any]) -> Any:
+        """One attempt, duplicated once if it outlives the hedge delay"""
+        self._count("attempts")
+        delay = self.hedge_delay()
+        if delay is None:
+            return create(**params, timeout=self.timeout)
+
+        executor = self._hedge_executor()
+        primary = executor.submit(create, **params, timeout=self.timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        hedge = executor.submit(create, **params, timeout=self.timeout)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=self.timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"GPT-4o call exceeded {self.timeout:g}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    # The slower request finishes in the background; its answer is dropped
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_hedge_workers,
+                                                    thread_name_prefix="llm-hedge")
+            return self._executor
+
+    async def acall(self, create: Callable[..., Awaitable[Any]], params: Dict[str, Any]) -> Any:
+        """Awaitable call(); create(**params, timeout=...) returns an awaitable"""
+        self._count("calls")
+        attempt, last_error = 0, None
+        while True:
+            self._admit(last_error)
+            start = time.perf_counter()
+            try:
+                response = await self._aattempt(create, params)
+            except Exception as e:
+                self._settle(e, time.perf_counter() - start)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt, last_error = attempt + 1, e
+                continue
+            self._settle(None, time.perf_counter() - start)
+            return response
+
+    async def _aattempt(self, create: Callable[..., Awaitable[Any]], params: Dict[str, Any]) -> Any:
+        """One attempt, duplicated once if it outlives the hedge delay; the loser is cancelled"""
+        self._count("attempts")
+        primary = asyncio.ensure_future(asyncio.wait_for(create(**params, timeout=self.timeout), self.timeout))
+        delay = self.hedge_delay()
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        hedge = asyncio.ensure_future(asyncio.wait_for(create(**params, timeout=self.timeout), self.timeout))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Attempt, retry, timeout, hedge and short-circuit counts, with the breaker's state"""
+        with self._lock:
+            report = dict(self.stats)
+        report["timeout"] = self.timeout
+        report["hedge_delay"] = self.hedge_delay()
+        report["circuit_breaker"] = self.circuit_breaker.get_stats() if self.circuit_breaker else None
+        return report
+
+    def close(self):
+        """Stop the hedge worker threads"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,346 @@
+"""
+LLM Usage Ledger
+Records every chat completion call with its agent, document, token usage,
+latency and cache outcome, and rolls them up per agent, day and document
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rollup dimensions and the column each groups by
+ROLLUP_COLUMNS = {"agent": "agent", "day": "day", "document": "document_id", "model": "model"}
+
+UNATTRIBUTED = "unattributed"
+
+_call_context: ContextVar[Dict[str, Optional[str]]] = ContextVar("llm_call_context", default={})
+
+
+@contextmanager
+def llm_call_context(agent: Optional[str] = None, document_id: Optional[str] = None):
+    """
+    Attribute LLM calls made inside the block to an agent and document
+
+    Nested blocks inherit whatever they do not set. The attribution follows
+    contextvars, so worker threads need the caller's context copied in
+    (contextvars.copy_context().run).
+    """
+    outer = _call_context.get()
+    token = _call_context.set({
+        "agent": agent or outer.get("agent"),
+        "document_id": document_id or outer.get("document_id")
+    })
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+
+def current_call_context() -> Dict[str, Optional[str]]:
+    """Agent and document the current LLM call is attributed to"""
+    context = _call_context.get()
+    return {"agent": context.get("agent"), "document_id": context.get("document_id")}
+
+
+class LLMUsageLedger:
+    """
+    One SQLite row per LLM call, aggregated on read
+
+    Tokens of calls answered without an API request (from the response
+    cache, or coalesced onto an identical call in flight) are counted as
+    saved rather than spent and as cache hits. Rows are buffered and
+    written flush_every at a time (or flush_interval seconds after the
+    oldest), since concurrent single-row commits contend for the database
+    lock; every read flushes first. Rows of a failed write go back to the
+    buffer for the next flush, keeping at most max_buffered (the oldest
+    beyond that are dropped). Rows older than retention_days are dropped
+    every trim_every records.
+    """
+
+    def __init__(self, db_path: str = "doc_anomaly.db", retention_days: float = 90,
+                 trim_every: int = 1000, flush_every: int = 50, flush_interval: float = 5.0,
+                 max_buffered: int = 10000):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.trim_every = trim_every
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer: List[tuple] = []
+        self._buffered_since = 0.0
+        # After a failed write, record() waits flush_interval before retrying
+        self._retry_at = 0.0
+        self._records_since_trim = 0
+        self.stats = {"recorded": 0, "write_failures": 0, "dropped": 0, "metrics_published": 0}
+        self._init_database()
+        # id of the last row sent by publish_metrics; rows from before this instance are not sent
+        self._published_id = self._last_id()
+        atexit.register(self.flush)
+
+    def _init_database(self):
+        """Initialize LLM call ledger table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                called_at REAL NOT NULL,
+                day TEXT NOT NULL,
+                agent TEXT,
+                document_id TEXT,
+                model TEXT,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                total_tokens INTEGER,
+                latency_ms REAL,
+                cached INTEGER NOT NULL DEFAULT 0,
+                success INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_called_at ON llm_calls(called_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_document ON llm_calls(document_id)')
+
+        conn.commit()
+        conn.close()
+
+    def _last_id(self) -> int:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('SELECT MAX(id) FROM llm_calls')
+            last_id = cursor.fetchone()[0]
+            conn.close()
+        except Exception as e:
+            logger.warning(f"LLM usage ledger lookup failed: {e}")
+            return 0
+        return last_id or 0
+
+    def record(self, model: Optional[str], result: Optional[Dict[str, Any]],
+               latency_seconds: Optional[float], agent: Optional[str] = None,
+               document_id: Optional[str] = None):
+        """
+        Buffer one call for writing
+
+        Args:
+            model: Model the request named
+            result: call_gpt4o result ({"content", "usage"[, "cached"/"coalesced"]}),
+                None if the call failed
+            latency_seconds: Wall time of the call, None if unknown (bulk jobs)
+            agent: Calling agent; defaults to the llm_call_context attribution
+            document_id: Document the call was about; same default
+        """
+        context = current_call_context()
+        usage = (result or {}).get("usage") or {}
+        now = time.time()
+        row = (
+            now, datetime.utcfromtimestamp(now).strftime('%Y-%m-%d'),
+            agent or context["agent"], document_id or context["document_id"], model,
+            usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0,
+            usage.get("total_tokens") or 0,
+            latency_seconds * 1000 if latency_seconds is not None else None,
+            int(bool((result or {}).get("cached") or (result or {}).get("coalesced"))),
+            int(result is not None)
+        )
+
+        with self._lock:
+            if not self._buffer:
+                self._buffered_since = now
+            self._buffer.append(row)
+            flush = now >= self._retry_at and (len(self._buffer) >= self.flush_every
+                                               or now - self._buffered_since >= self.flush_interval)
+        if flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered rows in one transaction; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+
+            try:
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT INTO llm_calls
+                    (called_at, day, agent, document_id, model, prompt_tokens, completion_tokens,
+                     total_tokens, latency_ms, cached, success)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                logger.warning(f"LLM usage ledger write failed: {e}")
+                with self._lock:
+                    # Retry with the next flush, ahead of rows buffered meanwhile
+                    self._buffer = rows + self._buffer
+                    dropped = len(self._buffer) - self.max_buffered
+                    if dropped > 0:
+                        del self._buffer[:dropped]
+                        self.stats["dropped"] += dropped
+                    self._retry_at = time.time() + self.flush_interval
+                    self.stats["write_failures"] += 1
+                return 0
+
+        with self._lock:
+            self._retry_at = 0.0
+            self.stats["recorded"] += len(rows)
+            self._records_since_trim += len(rows)
+            trim = self._records_since_trim >= self.trim_every
+            if trim:
+                self._records_since_trim = 0
+        if trim:
+            self._trim()
+        return len(rows)
+
+    def _trim(self):
+        """Drop rows past the retention period"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM llm_calls WHERE called_at < ?',
+                           (time.time() - self.retention_days * 86400,))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"LLM usage ledger trim failed: {e}")
+
+    def _since(self, days: Optional[float]) -> float:
+        if days is None:
+            return 0.0
+        return time.time() - days * 86400
+
+    def _aggregate(self, group_column: Optional[str], since: float, after_id: int = 0,
+                   limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Spent/saved tokens, call counts, latency and last row id per group of rows"""
+        self.flush()
+        key = f"COALESCE({group_column}, ?)" if group_column else "?"
+        order = "key" if group_column == "day" else "total_tokens DESC"
+        query = f'''
+            SELECT {key} AS key,
+                   COUNT(*) AS calls,
+                   SUM(cached) AS cache_hits,
+                   SUM(1 - success) AS failures,
+                   SUM(CASE WHEN cached = 0 THEN prompt_tokens ELSE 0 END) AS prompt_tokens,
+                   SUM(CASE WHEN cached = 0 THEN completion_tokens ELSE 0 END) AS completion_tokens,
+                   SUM(CASE WHEN cached = 0 THEN total_tokens ELSE 0 END) AS total_tokens,
+                   SUM(CASE WHEN cached = 1 THEN total_tokens ELSE 0 END) AS tokens_saved,
+                   AVG(CASE WHEN cached = 0 AND success = 1 THEN latency_ms END) AS avg_latency_ms,
+                   MAX(CASE WHEN cached = 0 AND success = 1 THEN latency_ms END) AS max_latency_ms,
+                   MAX(id) AS last_id
+            FROM llm_calls
+            WHERE called_at >= ? AND id > ?
+            GROUP BY key
+            ORDER BY {order}
+        '''
+        params: List[Any] = [UNATTRIBUTED, since, after_id]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return [row for row in rows if row["calls"]]
+
+    def rollup(self, by: str = "agent", days: Optional[float] = None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Usage grouped by agent, day, document or model
+
+        Args:
+            by: "agent", "day", "document" or "model"
+            days: Only calls from the last days (all calls if None)
+            limit: Largest groups by spent tokens only (days come in date order)
+
+        Returns:
+            One dict per group: key, calls, cache_hits, failures,
+            prompt/completion/total tokens spent, tokens_saved and
+            avg/max latency of API calls in milliseconds
+        """
+        if by not in ROLLUP_COLUMNS:
+            raise ValueError(f"Unknown rollup {by!r}; expected one of {', '.join(ROLLUP_COLUMNS)}")
+        try:
+            rows = self._aggregate(ROLLUP_COLUMNS[by], self._since(days), limit=limit)
+        except Exception as e:
+            logger.warning(f"LLM usage rollup failed: {e}")
+            return []
+        for row in rows:
+            del row["last_id"]
+        return rows
+
+    def totals(self, days: Optional[float] = None) -> Dict[str, Any]:
+        """Usage across every call, in the rollup() row format"""
+        try:
+            rows = self._aggregate(None, self._since(days))
+        except Exception as e:
+            logger.warning(f"LLM usage totals failed: {e}")
+            rows = []
+        if rows:
+            del rows[0]["last_id"]
+            return dict(rows[0], key="total")
+        return {"key": "total", "calls": 0, "cache_hits": 0, "failures": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "total_tokens": 0, "tokens_saved": 0,
+                "avg_latency_ms": None, "max_latency_ms": None}
+
+    def publish_metrics(self, cloudwatch_handler: Any) -> int:
+        """
+        Send per-agent usage since the previous publish to CloudWatch
+
+        Puts LLMCalls, LLMCacheHits, LLMFailures, LLMPromptTokens,
+        LLMCompletionTokens and LLMLatencyAvg with an Agent dimension, so
+        Sum statistics over any period add up without double counting. The
+        rows sent are tracked by id, read in the same query as the usage, so
+        a row committed while publishing is sent next time rather than lost.
+
+        Returns:
+            Number of metric values sent
+        """
+        try:
+            rows = self._aggregate("agent", 0.0, after_id=self._published_id)
+        except Exception as e:
+            logger.warning(f"LLM usage rollup for CloudWatch failed: {e}")
+            return 0
+
+        published = 0
+        for row in rows:
+            dimensions = {"Agent": row["key"]}
+            values = [
+                ("LLMCalls", row["calls"], "Count"),
+                ("LLMCacheHits", row["cache_hits"], "Count"),
+                ("LLMFailures", row["failures"], "Count"),
+                ("LLMPromptTokens", row["prompt_tokens"], "Count"),
+                ("LLMCompletionTokens", row["completion_tokens"], "Count")
+            ]
+            if row["avg_latency_ms"] is not None:
+                values.append(("LLMLatencyAvg", row["avg_latency_ms"], "Milliseconds"))
+            for metric_name, value, unit in values:
+                cloudwatch_handler.put_metric(metric_name, float(value or 0), unit, dimensions)
+                published += 1
+
+        self._published_id = max([self._published_id] + [row["last_id"] for row in rows])
+        with self._lock:
+            self.stats["metrics_published"] += published
+        return published
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Rows written, buffered and dropped, and failed writes, of this instance"""
+        with self._lock:
+            report = dict(self.stats)
+            report["buffered"] = len(self._buffer)
+        return report
@@ -0,0 +1,139 @@
+"""
+Mock LLM Client
+In-process stand-in for the OpenAI client, for tests and offline benchmarks
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from config.openai_config import estimate_tokens
+
+# The field list follows this line in OpenAIConfig.extract_with_gpt4o's system prompt
+_FIELD_LIST = re.compile(r'Extract the following fields from the document text:\n(.+)')
+_DOCUMENT = "Document Text:\n"
+
+Responder = Callable[[List[Dict[str, str]]], str]
+
+
+def extraction_responder(messages: List[Dict[str, str]]) -> str:
+    """
+    Answer extraction prompts by reading "label: value" lines
+
+    Each requested field name is turned into a label ("invoice_date" ->
+    "invoice date") and looked up case-insensitively in the document text.
+    Prompts that are not extraction requests get an empty JSON object.
+    """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in messages if m["role"] == "user"), "")
+    field_list = _FIELD_LIST.search(system)
+    if not field_list:
+        return "{}"
+
+    text = user.split(_DOCUMENT, 1)[-1]
+    lines = text.splitlines()
+    result = {}
+    for field_name in (name.strip() for name in field_list.group(1).split(',')):
+        label = field_name.replace('_', ' ').lower()
+        result[field_name] = {"value": None, "confidence": 0.0, "source_text": None}
+        for line in lines:
+            position = line.lower().find(label)
+            if position == -1:
+                continue
+            value = line[position + len(label):].lstrip(' :#\t').strip()
+            if value:
+                result[field_name] = {"value": value, "confidence": 0.85, "source_text": line.strip()}
+                break
+
+    return json.dumps(result)
+
+
+class _Completions:
+    """client.chat.completions"""
+
+    def __init__(self, client: "MockOpenAIClient"):
+        self._client = client
+
+    def create(self, **params) -> SimpleNamespace:
+        delay = self._client._record(params)
+        if delay:
+            time.sleep(delay)
+        return self._client._complete(params)
+
+
+class _AsyncCompletions(_Completions):
+    """client.chat.completions of an asynchronous mock, like AsyncOpenAI()"""
+
+    async def create(self, **params) -> SimpleNamespace:
+        delay = self._client._record(params)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._client._complete(params)
+
+
+class MockOpenAIClient:
+    """
+    Drop-in for OpenAI() exposing chat.completions.create
+
+    Pass as OpenAIConfig(client=MockOpenAIClient()) to run the LLM paths
+    without an API key. Responses come from a responder callable, or from
+    a list of scripted strings returned in turn. With asynchronous=True
+    create() is a coroutine, like AsyncOpenAI(). Each call takes latency
+    seconds plus latency_per_1k_tokens for every thousand prompt tokens.
+    """
+
+    def __init__(self, responder: Union[Responder, List[str], None] = None,
+                 latency: float = 0.0, model: str = "mock-gpt-4o", asynchronous: bool = False,
+                 latency_per_1k_tokens: float = 0.0):
+        if isinstance(responder, list):
+            scripted = iter(responder)
+            responder = lambda messages: next(scripted, "{}")
+        self.responder = responder or extraction_responder
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.model = model
+        completions = _AsyncCompletions(self) if asynchronous else _Completions(self)
+        self.chat = SimpleNamespace(completions=completions)
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _record(self, params: Dict[str, Any]) -> float:
+        """Log a request; returns its simulated latency"""
+        with self._lock:
+            self.requests.append(params)
+        if not self.latency_per_1k_tokens:
+            return self.latency
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in params.get("messages", []))
+        return self.latency + self.latency_per_1k_tokens * prompt_tokens / 1000
+
+    def _complete(self, params: Dict[str, Any]) -> SimpleNamespace:
+        """Build a ChatCompletion-shaped response"""
+        messages = params.get("messages", [])
+        content = self.responder(messages)
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = estimate_tokens(content)
+
+        return SimpleNamespace(
+            model=params.get("model", self.model),
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content),
+                                     finish_reason="stop", index=0)],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens,
+                                  completion_tokens=completion_tokens,
+                                  total_tokens=prompt_tokens + completion_tokens)
+        )
+
+    @property
+    def call_count(self) -> int:
+        """Number of completions requested so far"""
+        return len(self.requests)
+
+    def last_prompt(self) -> Optional[str]:
+        """User message of the most recent request"""
+        if not self.requests:
+            return None
+        messages = self.requests[-1].get("messages", [])
+        return next((m["content"] for m in messages if m["role"] == "user"), None)
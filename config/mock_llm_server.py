@@ -0,0 +1,283 @@
+"""
+Mock LLM Server
+Local OpenAI-compatible HTTP endpoint for offline load tests: serves
+/v1/chat/completions with configurable latency distributions, injected
+errors and rate limits, and scripted or field-reading responses
+
+Run standalone and point the agents at it:
+
+    python -m config.mock_llm_server --port 8089 --latency lognormal:0.8,0.5 --rate-limit-rate 0.05
+    export OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Union
+
+from config.mock_llm import MockOpenAIClient, Responder
+from config.openai_config import estimate_tokens
+
+
+class LatencyModel:
+    """
+    Response time distribution, in seconds
+
+    Specs: "fixed:0.5", "uniform:0.2,1.0" (low, high), "normal:0.5,0.1"
+    (mean, standard deviation, clipped at 0), "lognormal:0.8,0.5" (median,
+    sigma; a long right tail like real completions) and "exponential:0.5"
+    (mean). A bare number is a fixed latency.
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+    def __init__(self, kind: str = "fixed", *params: float):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: Union[str, float, "LatencyModel", None]) -> "LatencyModel":
+        if isinstance(spec, LatencyModel):
+            return spec
+        if spec is None:
+            return cls("fixed", 0.0)
+        if isinstance(spec, (int, float)):
+            return cls("fixed", float(spec))
+        kind, _, values = spec.partition(":")
+        if not values:
+            return cls("fixed", float(kind))
+        return cls(kind, *(float(value) for value in values.split(",")))
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            return p[0]
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        return rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{','.join(f'{value:g}' for value in self.params)}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """One request; the server instance carries the MockLLMServer"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args):
+        pass
+
+    def do_POST(self):
+        server: "MockLLMServer" = self.server.mock
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown endpoint {self.path}", "type": "invalid_request_error"}})
+            return
+
+        status, body, headers = server.handle(params)
+        self._send(status, body, headers)
+
+    def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MockLLMServer:
+    """
+    OpenAI-compatible chat completions server on a background thread
+
+    Each request waits a latency drawn from the latency model (plus
+    latency_per_1k_tokens per thousand prompt tokens), then answers. With
+    probability rate_limit_rate it is refused at once with a 429 and a
+    Retry-After header; with probability error_rate it fails with a 500
+    after its latency. Answers come from a responder callable or a list
+    of scripted responses (strings, or objects serialized as JSON) returned
+    in turn, defaulting to config.mock_llm.extraction_responder.
+
+    Usage:
+        with MockLLMServer(latency="lognormal:0.5,0.4", error_rate=0.02) as server:
+            config = OpenAIConfig(base_url=server.url)
+    """
+
+    def __init__(self, responder: Union[Responder, List[Any], None] = None,
+                 latency: Union[str, float, LatencyModel] = 0.0, latency_per_1k_tokens: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                 host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None):
+        if isinstance(responder, list):
+            responder = [item if isinstance(item, str) else json.dumps(item) for item in responder]
+        # Builds content and usage exactly as the in-process mock does
+        self.completions = MockOpenAIClient(responder)
+        self.latency = LatencyModel.parse(latency)
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.host = host
+        self.port = port
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {"requests": 0, "completed": 0, "rate_limited": 0, "errors": 0,
+                "prompt_tokens": 0, "completion_tokens": 0}
+
+    @property
+    def url(self) -> str:
+        """Base URL for OpenAI(base_url=...) / OPENAI_BASE_URL"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Bind and serve on a daemon thread; port 0 picks a free port"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+            self._thread = None
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, params: Dict[str, Any]) -> tuple:
+        """(status, JSON body, extra headers) for a chat completion request"""
+        messages = params.get("messages", [])
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        with self._lock:
+            self.stats["requests"] += 1
+            draw = self._rng.random()
+            delay = self.latency.sample(self._rng) + self.latency_per_1k_tokens * prompt_tokens / 1000
+
+        if draw < self.rate_limit_rate:
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            return 429, {"error": {"message": "Rate limit reached (injected by mock server)",
+                                   "type": "requests", "code": "rate_limit_exceeded"}}, \
+                {"Retry-After": f"{self.retry_after:g}"}
+
+        if delay:
+            time.sleep(delay)
+
+        if draw < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            return 500, {"error": {"message": "Internal error (injected by mock server)",
+                                   "type": "server_error"}}, {}
+
+        completion = self.completions._complete(params)
+        with self._lock:
+            self.stats["completed"] += 1
+            self.stats["prompt_tokens"] += completion.usage.prompt_tokens
+            self.stats["completion_tokens"] += completion.usage.completion_tokens
+            number = self.stats["completed"]
+
+        return 200, {
+            "id": f"chatcmpl-mock-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": completion.model,
+            "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                         "message": {"role": "assistant", "content": completion.choices[0].message.content}}],
+            "usage": {"prompt_tokens": completion.usage.prompt_tokens,
+                      "completion_tokens": completion.usage.completion_tokens,
+                      "total_tokens": completion.usage.total_tokens}
+        }, {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests received, answered, refused with 429 and failed with 500"""
+        with self._lock:
+            return dict(self.stats)
+
+    def reset_stats(self):
+        """Zero all counters"""
+        with self._lock:
+            self.stats = self._empty_stats()
+
+
+def _load_script(path: str) -> List[Any]:
+    """Scripted responses from a JSON list or a JSONL file"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        script = json.loads(text)
+        return script if isinstance(script, list) else [script]
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="0", help="e.g. 0.5, uniform:0.2,1.0, lognormal:0.8,0.5")
+    parser.add_argument("--latency-per-1k", type=float, default=0.0,
+                        help="Extra latency per 1,000 prompt tokens (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests refused with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of 429 responses (s)")
+    parser.add_argument("--script", help="JSON list or JSONL file of responses returned in turn")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        responder=_load_script(args.script) if args.script else None,
+        latency=args.latency, latency_per_1k_tokens=args.latency_per_1k,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after, host=args.host, port=args.port, seed=args.seed
+    )
+    server.start()
+    print(f"🧪 Mock LLM server on {server.url} (latency {server.latency!r}, "
+          f"{args.error_rate:.0%} errors, {args.rate_limit_rate:.0%} rate limited)")
+    print(f"   export OPENAI_BASE_URL={server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\n{server.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,88 +3,254 @@ OpenAI Configuration
 Setup for GPT-4o integration
 """
 
+import asyncio
+import functools
+import inspect
 import os
-from openai import OpenAI
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from openai import AsyncOpenAI, OpenAI
+from typing import Dict, Any, Optional, Tuple
 import logging
 
+from config.llm_cache import LLMResponseCache, SingleFlight, request_key
+from config.llm_resilience import CircuitOpenError, ResilientCaller
+from config.llm_usage import LLMUsageLedger
+from config.prompt_context import PromptContextBuilder
+
 logger = logging.getLogger(__name__)
 
+# Rough characters-per-token ratio for English document text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt token estimate, without a tokenizer"""
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
 class OpenAIConfig:
     """Manages OpenAI client and configuration"""
     
-    def __init__(self):
+    def __init__(self, client: Any = None, base_url: Optional[str] = None,
+                 response_cache: Optional[LLMResponseCache] = None,
+                 usage_ledger: Optional[LLMUsageLedger] = None,
+                 resilience: Optional[ResilientCaller] = None,
+                 context_builder: Optional[PromptContextBuilder] = None):
+        """
+        Args:
+            client: Pre-built client exposing chat.completions.create, e.g.
+                config.mock_llm.MockOpenAIClient for offline runs
+            base_url: OpenAI-compatible endpoint (defaults to OPENAI_BASE_URL),
+                for local stand-in servers
+            response_cache: Cache for identical requests (defaults to a
+                disk-backed LLMResponseCache once a client is configured)
+            usage_ledger: Per-call token and latency record (defaults to an
+                LLMUsageLedger once a client is configured)
+            resilience: Timeouts, retries, hedging and circuit breaker of
+                API calls (defaults to a ResilientCaller from the environment)
+            context_builder: Ranks the lines of long extraction texts and
+                keeps the best within a token budget (defaults to a
+                PromptContextBuilder; set the attribute to None to send
+                texts whole)
+        """
         self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        
+        # Async counterpart for LLMGateway; injected clients are used as-is.
+        # Retries are left to self.resilience, so the clients make one request per attempt
+        self.async_client = None
+        if client is not None:
+            self.client = client
+        elif self.api_key:
+            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+            self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        elif self.base_url:
+            # Local stand-ins accept any key
+            self.client = OpenAI(api_key="local", base_url=self.base_url, max_retries=0)
+            self.async_client = AsyncOpenAI(api_key="local", base_url=self.base_url, max_retries=0)
+        else:
             logger.warning("OPENAI_API_KEY not found in environment variables")
+            self.client = None
         
-        self.client = OpenAI(api_key=self.api_key) if self.api_key else None
         self.model = "gpt-4o"  # GPT-4o model
         self.temperature = 0.1  # Low temperature for consistency
+        
+        # Responses to identical requests are reused; set use_cache = False to always call the API
+        self.use_cache = os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+        if response_cache is None and self.client is not None:
+            try:
+                response_cache = LLMResponseCache()
+            except Exception as e:
+                logger.warning(f"LLM response cache not available: {e}")
+        self.response_cache = response_cache
+        
+        # Identical requests made while one is in flight wait for its answer;
+        # set to None to send each of them
+        self.in_flight: Optional[SingleFlight] = SingleFlight()
+        
+        # Every call is recorded with the agent and document of its llm_call_context
+        if usage_ledger is None and self.client is not None:
+            try:
+                usage_ledger = LLMUsageLedger()
+            except Exception as e:
+                logger.warning(f"LLM usage ledger not available: {e}")
+        self.usage_ledger = usage_ledger
+        
+        # Per-call timeout, retries with backoff, optional hedging and the
+        # circuit breaker that makes callers fall back to regex during outages
+        self.resilience = resilience or ResilientCaller()
+        
+        # Extraction prompts carry the lines most relevant to the fields, not
+        # the leading text; PROMPT_CONTEXT_DISABLED sends documents whole
+        if context_builder is None and os.getenv("PROMPT_CONTEXT_DISABLED", "").lower() not in ("1", "true", "yes"):
+            context_builder = PromptContextBuilder()
+        self.context_builder = context_builder
+        
+        # Shared LLMGateway that call_gpt4o routes through, when attached
+        self.gateway: Optional["LLMGateway"] = None
     
     def is_configured(self) -> bool:
         """Check if OpenAI is configured"""
         return self.client is not None
     
+    def is_available(self) -> bool:
+        """Configured, and the circuit breaker is not refusing calls"""
+        return self.is_configured() and self.resilience.available()
+    
+    def build_params(self, messages: list, system_prompt: str = None,
+                     response_format: Dict[str, Any] = None) -> Dict[str, Any]:
+        """chat.completions.create parameters for a request"""
+        # Prepend system prompt if provided
+        if system_prompt:
+            messages = [{"role": "system", "content": system_prompt}] + messages
+        
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature
+        }
+        
+        if response_format:
+            params["response_format"] = response_format
+        return params
+    
+    @staticmethod
+    def to_result(response: Any) -> Dict[str, Any]:
+        """Content and token usage of a ChatCompletion"""
+        return {
+            "content": response.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        }
+    
     def call_gpt4o(self, messages: list, system_prompt: str = None, 
-                   response_format: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+                   response_format: Dict[str, Any] = None,
+                   bypass_cache: bool = False) -> Optional[Dict[str, Any]]:
         """
         Call GPT-4o API
         
+        Goes through self.gateway, when one is attached, so concurrency and
+        rate limits are shared with every other caller of that gateway.
+        A request identical to one already in flight is not sent again; it
+        waits for that call's answer (self.in_flight). API calls time out,
+        are retried and optionally hedged under self.resilience. Every call
+        is recorded in self.usage_ledger, except those refused by an open
+        circuit breaker, which return None at once.
+        
         Args:
             messages: List of message dicts
             system_prompt: Optional system prompt
             response_format: Optional response format (for structured output)
+            bypass_cache: Call the API even if an identical request was cached
+                (the fresh response still replaces the cached one)
             
         Returns:
-            API response or None
+            API response or None; responses served from the cache carry
+            "cached": True, answers shared with an in-flight call
+            "coalesced": True
         """
         if not self.client:
             logger.error("OpenAI client not configured")
             return None
         
+        if self.gateway is not None:
+            return self.gateway.call(messages, system_prompt, response_format, bypass_cache)
+        
+        start = time.perf_counter()
         try:
-            # Prepend system prompt if provided
-            if system_prompt:
-                messages = [{"role": "system", "content": system_prompt}] + messages
-            
-            params = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": self.temperature
-            }
-            
-            if response_format:
-                params["response_format"] = response_format
+            result = self._call(messages, system_prompt, response_format, bypass_cache)
+        except CircuitOpenError:
+            logger.debug("GPT-4o call skipped: circuit breaker open")
+            return None
+        self.record_usage(result, time.perf_counter() - start)
+        return result
+    
+    def flight_key(self, params: Dict[str, Any], bypass_cache: bool) -> str:
+        """Single-flight key of a request; cache-bypassing calls only coalesce with each other"""
+        return request_key(params) + (":bypass" if bypass_cache else "")
+    
+    def _call(self, messages: list, system_prompt: Optional[str],
+              response_format: Optional[Dict[str, Any]],
+              bypass_cache: bool) -> Optional[Dict[str, Any]]:
+        params = self.build_params(messages, system_prompt, response_format)
+        if self.in_flight is None:
+            return self._call_once(params, bypass_cache)
+        
+        key = self.flight_key(params, bypass_cache)
+        future, leader = self.in_flight.join(key)
+        if not leader:
+            return self.in_flight.follow(future)
+        
+        result = None
+        try:
+            result = self._call_once(params, bypass_cache)
+        finally:
+            self.in_flight.finish(key, result)
+        return result
+    
+    def _call_once(self, params: Dict[str, Any], bypass_cache: bool) -> Optional[Dict[str, Any]]:
+        """Cache lookup, then the API call; the answer is cached before it is shared"""
+        try:
+            cache = self.response_cache if self.use_cache else None
+            if cache and not bypass_cache:
+                cached = cache.get(params)
+                if cached is not None:
+                    cached["cached"] = True
+                    return cached
             
-            response = self.client.chat.completions.create(**params)
+            response = self.resilience.call(self.client.chat.completions.create, params)
             
-            return {
-                "content": response.choices[0].message.content,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
-            }
+            result = self.to_result(response)
+            if cache:
+                cache.put(params, result)
+            return result
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error calling GPT-4o: {e}")
             return None
     
-    def extract_with_gpt4o(self, text: str, extraction_prompt: str, 
-                          expected_fields: list) -> Dict[str, Any]:
-        """
-        Extract structured data using GPT-4o
-        
-        Args:
-            text: Document text
-            extraction_prompt: Prompt for extraction
-            expected_fields: List of expected field names
-            
-        Returns:
-            Extracted fields dictionary
-        """
+    def record_usage(self, result: Optional[Dict[str, Any]], latency_seconds: Optional[float]):
+        """Add a call to the usage ledger, attributed by the current llm_call_context"""
+        if self.usage_ledger is not None:
+            self.usage_ledger.record(self.model, result, latency_seconds)
+    
+    def prompt_context(self, text: str, expected_fields: list) -> str:
+        """Document text for an extraction prompt: the best-ranked lines for the fields, within budget"""
+        if self.context_builder is None:
+            return text
+        return self.context_builder.build(text, expected_fields)
+    
+    @staticmethod
+    def extraction_request(text: str, extraction_prompt: str,
+                           expected_fields: list) -> Tuple[list, str]:
+        """(messages, system prompt) of an extraction request"""
         messages = [
             {
                 "role": "user",
@@ -101,9 +267,11 @@ Return your response as a JSON object with these fields. For each field, provide
 - source_text: The exact text from the document that contains this value
 
 If a field is not found, set its value to null and confidence to 0.0."""
-        
-        response = self.call_gpt4o(messages, system_prompt=system_prompt)
-        
+        return messages, system_prompt
+    
+    @staticmethod
+    def parse_extraction(response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Extracted fields from an extraction response; {} if it is missing or not JSON"""
         if response and response.get("content"):
             try:
                 import json
@@ -123,6 +291,49 @@ If a field is not found, set its value to null and confidence to 0.0."""
         
         return {}
     
+    @staticmethod
+    def analysis_request(text: str, analysis_prompt: str) -> list:
+        """Messages of an analysis request"""
+        return [
+            {
+                "role": "user",
+                "content": f"{analysis_prompt}\n\nDocument Text:\n{text}"
+            }
+        ]
+    
+    @staticmethod
+    def parse_analysis(response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Analysis text and usage of an analysis response; {} if it is missing"""
+        if response:
+            return {
+                "analysis": response.get("content", ""),
+                "usage": response.get("usage", {})
+            }
+        
+        return {}
+    
+    def extract_with_gpt4o(self, text: str, extraction_prompt: str, 
+                          expected_fields: list) -> Dict[str, Any]:
+        """
+        Extract structured data using GPT-4o
+        
+        Text longer than the context builder's budget is cut down to the
+        lines ranked most relevant to the expected fields.
+        
+        Args:
+            text: Document text
+            extraction_prompt: Prompt for extraction
+            expected_fields: List of expected field names
+            
+        Returns:
+            Extracted fields dictionary
+        """
+        messages, system_prompt = self.extraction_request(
+            self.prompt_context(text, expected_fields), extraction_prompt, expected_fields
+        )
+        response = self.call_gpt4o(messages, system_prompt=system_prompt)
+        return self.parse_extraction(response)
+    
     def analyze_with_gpt4o(self, text: str, analysis_prompt: str) -> Dict[str, Any]:
         """
         Analyze document using GPT-4o
@@ -134,22 +345,259 @@ If a field is not found, set its value to null and confidence to 0.0."""
         Returns:
             Analysis results
         """
-        messages = [
-            {
-                "role": "user",
-                "content": f"{analysis_prompt}\n\nDocument Text:\n{text}"
-            }
-        ]
+        response = self.call_gpt4o(self.analysis_request(text, analysis_prompt))
+        return self.parse_analysis(response)
+
+
+class TokenBucket:
+    """
+    Per-minute allowance refilled continuously
+
+    Starts full, so up to a minute's worth may be spent at once. Used only
+    from the LLMGateway event loop.
+    """
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self, amount: float) -> float:
+        """Take amount from the bucket, waiting for it to refill if needed; returns seconds waited"""
+        # A request larger than the whole allowance waits for a full bucket
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+    
+    def debit(self, amount: float):
+        """Adjust for usage beyond (or below) what was acquired; may overdraw"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class LLMGateway:
+    """
+    Asyncio front for chat completions with shared concurrency and rate limits
+    
+    Every call holds one of max_concurrency slots and draws from two token
+    buckets: one request per call against requests_per_minute, and the
+    estimated prompt tokens against tokens_per_minute, reconciled with the
+    reported usage afterwards. Cached responses (OpenAIConfig.response_cache)
+    and requests coalesced onto an identical in-flight one
+    (OpenAIConfig.in_flight) skip both. Calls run on the gateway's own event loop thread, so async
+    code can await acall() from any loop and threads can use the blocking
+    call(). Limits default to OPENAI_MAX_CONCURRENCY, OPENAI_RPM_LIMIT and
+    OPENAI_TPM_LIMIT. Timeouts, retries, hedging and the circuit breaker
+    are the config's (OpenAIConfig.resilience); calls it refuses return
+    None without holding a slot.
+    
+    Attach to an OpenAIConfig (config.gateway = gateway) to route its
+    call_gpt4o through the gateway. Calls are recorded in the config's
+    usage ledger, attributed by the caller's llm_call_context.
+    """
+    
+    def __init__(self, config: OpenAIConfig, max_concurrency: Optional[int] = None,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        self.config = config
+        self.max_concurrency = max_concurrency or int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        self.requests_per_minute = requests_per_minute or float(os.getenv("OPENAI_RPM_LIMIT", "500"))
+        self.tokens_per_minute = tokens_per_minute or float(os.getenv("OPENAI_TPM_LIMIT", "30000"))
         
-        response = self.call_gpt4o(messages)
+        self.request_bucket = TokenBucket(self.requests_per_minute)
+        self.token_bucket = TokenBucket(self.tokens_per_minute)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
         
-        if response:
-            return {
-                "analysis": response.get("content", ""),
-                "usage": response.get("usage", {})
-            }
+        # Synchronous clients run on these threads, one per concurrency slot
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix="llm-gateway")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
         
-        return {}
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {"calls": 0, "cache_hits": 0, "coalesced": 0, "errors": 0, "short_circuited": 0,
+                      "peak_in_flight": 0,
+                      "rate_limited": 0, "rate_limit_wait_seconds": 0.0,
+                      "estimated_prompt_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the gateway event loop thread on first use"""
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever,
+                                                name="llm-gateway-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+    
+    async def acall(self, messages: list, system_prompt: str = None,
+                    response_format: Dict[str, Any] = None,
+                    bypass_cache: bool = False) -> Optional[Dict[str, Any]]:
+        """Awaitable call_gpt4o, from any event loop"""
+        start = time.perf_counter()
+        coroutine = self._call(messages, system_prompt, response_format, bypass_cache)
+        loop = self._ensure_loop()
+        try:
+            if asyncio.get_running_loop() is loop:
+                result = await coroutine
+            else:
+                result = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+        except CircuitOpenError:
+            return None
+        self.config.record_usage(result, time.perf_counter() - start)
+        return result
+    
+    def call(self, messages: list, system_prompt: str = None,
+             response_format: Dict[str, Any] = None,
+             bypass_cache: bool = False) -> Optional[Dict[str, Any]]:
+        """Blocking call_gpt4o, safe to use from any thread except the gateway loop's"""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("LLMGateway.call() would block its own event loop; await acall() instead")
+        start = time.perf_counter()
+        coroutine = self._call(messages, system_prompt, response_format, bypass_cache)
+        try:
+            result = asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+        except CircuitOpenError:
+            return None
+        self.config.record_usage(result, time.perf_counter() - start)
+        return result
+    
+    async def _call(self, messages: list, system_prompt: Optional[str],
+                    response_format: Optional[Dict[str, Any]],
+                    bypass_cache: bool) -> Optional[Dict[str, Any]]:
+        if not self.config.client and not self.config.async_client:
+            logger.error("OpenAI client not configured")
+            return None
+        
+        params = self.config.build_params(messages, system_prompt, response_format)
+        in_flight = self.config.in_flight
+        if in_flight is None:
+            return await self._call_once(params, bypass_cache)
+        
+        # Shared with synchronous callers of the config, so identical requests
+        # coalesce whichever path they take
+        key = self.config.flight_key(params, bypass_cache)
+        future, leader = in_flight.join(key)
+        if not leader:
+            with self._stats_lock:
+                self.stats["coalesced"] += 1
+            return in_flight.share(await asyncio.wrap_future(future))
+        
+        result = None
+        try:
+            result = await self._call_once(params, bypass_cache)
+        finally:
+            in_flight.finish(key, result)
+        return result
+    
+    async def _call_once(self, params: Dict[str, Any], bypass_cache: bool) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        cache = self.config.response_cache if self.config.use_cache else None
+        if cache and not bypass_cache:
+            cached = await loop.run_in_executor(None, cache.get, params)
+            if cached is not None:
+                cached["cached"] = True
+                with self._stats_lock:
+                    self.stats["cache_hits"] += 1
+                return cached
+        
+        resilience = self.config.resilience
+        if not resilience.available():
+            with self._stats_lock:
+                self.stats["short_circuited"] += 1
+            raise CircuitOpenError("LLM circuit breaker is open")
+        
+        estimate = sum(estimate_tokens(message.get("content") or "") for message in params["messages"])
+        async with self._semaphore:
+            waited = await self.request_bucket.acquire(1)
+            waited += await self.token_bucket.acquire(estimate)
+            with self._stats_lock:
+                self.stats["calls"] += 1
+                self.stats["estimated_prompt_tokens"] += estimate
+                if waited:
+                    self.stats["rate_limited"] += 1
+                    self.stats["rate_limit_wait_seconds"] += waited
+                self._in_flight += 1
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self._in_flight)
+            
+            try:
+                result = self.config.to_result(await resilience.acall(self._create, params))
+            except CircuitOpenError:
+                with self._stats_lock:
+                    self.stats["short_circuited"] += 1
+                raise
+            except Exception as e:
+                logger.error(f"Error calling GPT-4o: {e}")
+                with self._stats_lock:
+                    self.stats["errors"] += 1
+                return None
+            finally:
+                with self._stats_lock:
+                    self._in_flight -= 1
+        
+        # Charge the bucket for what the call actually used
+        usage = result["usage"]
+        self.token_bucket.debit((usage["total_tokens"] or 0) - estimate)
+        with self._stats_lock:
+            self.stats["prompt_tokens"] += usage["prompt_tokens"] or 0
+            self.stats["completion_tokens"] += usage["completion_tokens"] or 0
+        
+        if cache:
+            await loop.run_in_executor(None, cache.put, params, result)
+        return result
+    
+    async def _create(self, **params) -> Any:
+        """One chat completion, natively async where the client allows"""
+        if self.config.async_client is not None:
+            return await self.config.async_client.chat.completions.create(**params)
+        
+        create = self.config.client.chat.completions.create
+        if inspect.iscoroutinefunction(create):
+            return await create(**params)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(create, **params)
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Call, cache-hit, coalesced, error and short-circuit counts, rate-limit waits, peak concurrency and token usage"""
+        with self._stats_lock:
+            report = dict(self.stats)
+            report["in_flight"] = self._in_flight
+        report.update({
+            "max_concurrency": self.max_concurrency,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute
+        })
+        return report
+    
+    def close(self):
+        """Stop the event loop thread and worker threads"""
+        with self._start_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = None
+                self._thread = None
+        self._executor.shutdown(wait=True)
 
 
 
@@ -0,0 +1,231 @@
+"""
+Prompt Context Builder
+Ranks a document's lines by field keywords (BM25 over lines), numeric
+density and page relevance, and assembles the top-ranked spans within a
+token budget, so prompts carry the terms that matter rather than the
+leading boilerplate
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Rough characters-per-token ratio for English document text (as in openai_config)
+CHARS_PER_TOKEN = 4
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Query terms at least this long also match longer words they start ("expir" -> "expiration")
+PREFIX_MIN_LENGTH = 4
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+def query_terms(keywords: Iterable[str]) -> List[str]:
+    """Distinct lowercase words of keywords and field names ("due_date" -> "due", "date")"""
+    terms = []
+    for keyword in keywords:
+        for word in _WORD.findall(keyword.lower().replace("_", " ")):
+            if len(word) > 1 and word not in terms:
+                terms.append(word)
+    return terms
+
+
+class LineIndex:
+    """
+    BM25 statistics over one document's lines
+
+    Built once per document text and cached by PromptContextBuilder: a
+    posting list of (line, term frequency) per word, word counts, numeric
+    density and prompt tokens per line, and the page of each line.
+    """
+
+    __slots__ = ("lines", "line_tokens", "postings", "lengths", "average_length",
+                 "numeric_density", "pages", "_expansions")
+
+    def __init__(self, text: str, page_starts: Optional[List[int]] = None):
+        self.lines = text.split("\n")
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        self.numeric_density: List[float] = []
+        self.line_tokens: List[int] = []
+        self.pages: List[int] = []
+
+        page_starts = page_starts or [0]
+        offset = 0
+        for number, line in enumerate(self.lines):
+            words = _WORD.findall(line.lower())
+            for word, frequency in Counter(words).items():
+                self.postings.setdefault(word, []).append((number, frequency))
+            self.lengths.append(len(words))
+            self.numeric_density.append(
+                sum(1 for word in words if any(c.isdigit() for c in word)) / len(words) if words else 0.0
+            )
+            self.line_tokens.append(_estimate_tokens(line + "\n"))
+            self.pages.append(max(1, bisect_right(page_starts, offset)))
+            offset += len(line) + 1
+
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        self._expansions: Dict[str, List[str]] = {}
+
+    def expand(self, term: str) -> List[str]:
+        """Words of this document matching a query term, exactly or (for long terms) by prefix (cached)"""
+        if term not in self._expansions:
+            if len(term) >= PREFIX_MIN_LENGTH:
+                self._expansions[term] = [word for word in self.postings if word.startswith(term)]
+            else:
+                self._expansions[term] = [term] if term in self.postings else []
+        return self._expansions[term]
+
+    def bm25(self, terms: List[str], k1: float = 1.2, b: float = 0.75) -> List[float]:
+        """BM25 score of every line for the query terms"""
+        scores = [0.0] * len(self.lines)
+        count = len(self.lines)
+        for term in terms:
+            for word in self.expand(term):
+                postings = self.postings[word]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for line, tf in postings:
+                    norm = k1 * (1 - b + b * self.lengths[line] / (self.average_length or 1))
+                    scores[line] += idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+
+class PromptContextBuilder:
+    """
+    Relevance-ranked prompt context within a token budget
+
+    Text that fits in max_tokens is returned unchanged. Longer text is
+    ranked line by line: the BM25 score for the keywords, raised by the
+    line's share of numeric words (amounts, dates) and by its page's share
+    of the document's keyword score. The best lines are taken with
+    neighbour_lines of context on each side until the budget is spent, and
+    joined in document order with '...' between gaps. Text mentioning no
+    keyword falls back to its leading characters.
+
+    Line indexes are cached per document text (LRU of cache_size), so
+    repeated prompts over the same document only rescore. max_tokens
+    defaults to PROMPT_CONTEXT_TOKENS (1500).
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, neighbour_lines: int = 1,
+                 numeric_weight: float = 0.5, page_weight: float = 0.5, cache_size: int = 256):
+        self.max_tokens = max_tokens or int(os.getenv("PROMPT_CONTEXT_TOKENS", "1500"))
+        self.neighbour_lines = neighbour_lines
+        self.numeric_weight = numeric_weight
+        self.page_weight = page_weight
+        self.cache_size = cache_size
+
+        self._indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"builds": 0, "trimmed": 0, "fallbacks": 0, "index_hits": 0, "index_misses": 0,
+                      "input_tokens": 0, "context_tokens": 0}
+
+    def index(self, text: str, page_starts: Optional[List[int]] = None) -> LineIndex:
+        """The cached line index of a document text, built on first use"""
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.stats["index_hits"] += 1
+                return index
+            self.stats["index_misses"] += 1
+
+        index = LineIndex(text, page_starts)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def build(self, document: Any, keywords: Iterable[str], max_tokens: Optional[int] = None) -> str:
+        """
+        Context for a prompt about keywords
+
+        Args:
+            document: Text, or a DocumentText (its page boundaries are used)
+            keywords: Field names, label cues or other query words
+            max_tokens: Budget for this call (defaults to self.max_tokens)
+        """
+        text = getattr(document, "text", document) or ""
+        budget = max_tokens or self.max_tokens
+        tokens = _estimate_tokens(text)
+        self._count(builds=1, input_tokens=tokens)
+        if tokens <= budget:
+            self._count(context_tokens=tokens)
+            return text
+
+        index = self.index(text, getattr(document, "page_starts", None))
+        spans = self._select(index, query_terms(keywords), budget)
+        if not spans:
+            context = text[:budget * CHARS_PER_TOKEN]
+            self._count(fallbacks=1)
+        else:
+            context = "\n...\n".join("\n".join(index.lines[first:last + 1]) for first, last in spans)
+            self._count(trimmed=1)
+        self._count(context_tokens=_estimate_tokens(context))
+        return context
+
+    def _select(self, index: LineIndex, terms: List[str], budget: int) -> List[Tuple[int, int]]:
+        """Merged (first, last) line spans of the best-ranked lines, in document order"""
+        relevance = index.bm25(terms)
+        page_totals: Dict[int, float] = {}
+        for line, score in enumerate(relevance):
+            page_totals[index.pages[line]] = page_totals.get(index.pages[line], 0.0) + score
+        best_page = max(page_totals.values(), default=0.0)
+        if not best_page:
+            return []
+
+        ranked = sorted(
+            (line for line, score in enumerate(relevance) if score > 0),
+            key=lambda line: (
+                -relevance[line]
+                * (1 + self.numeric_weight * index.numeric_density[line])
+                * (1 + self.page_weight * page_totals[index.pages[line]] / best_page),
+                line
+            )
+        )
+
+        chosen = set()
+        spent = 0
+        last_line = len(index.lines) - 1
+        for line in ranked:
+            span = [neighbour for neighbour in range(max(0, line - self.neighbour_lines),
+                                                     min(last_line, line + self.neighbour_lines) + 1)
+                    if neighbour not in chosen and index.lines[neighbour].strip()]
+            cost = sum(index.line_tokens[neighbour] for neighbour in span)
+            if spent + cost > budget:
+                continue
+            chosen.update(span)
+            spent += cost
+
+        spans: List[Tuple[int, int]] = []
+        for line in sorted(chosen):
+            if spans and line <= spans[-1][1] + 1:
+                spans[-1] = (spans[-1][0], line)
+            else:
+                spans.append((line, line))
+        return spans
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Builds, trimmed and fallback counts, index cache hits and prompt tokens saved"""
+        with self._lock:
+            report = dict(self.stats)
+            report["cached_indexes"] = len(self._indexes)
+        lookups = report["index_hits"] + report["index_misses"]
+        report["index_hit_rate"] = report["index_hits"] / lookups if lookups else 0.0
+        report["tokens_saved"] = report["input_tokens"] - report["context_tokens"]
+        return report
@@ -107,6 +107,9 @@ def format_extracted_data(result: Dict[str, Any]) -> pd.DataFrame:
             value = field_info.get('value', 'N/A')
             confidence = field_info.get('confidence', 0)
             extracted_by = field_info.get('extracted_by', 'Unknown')
+        elif isinstance(field_info, tuple) or hasattr(field_info, 'pattern_id'):
+            value, confidence = field_info
+            extracted_by = 'ExtractionAgent'
         else:
             value = str(field_info) if field_info else 'N/A'
             confidence = 0.9  # Default confidence
@@ -21,6 +21,8 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 import logging
 
 from agents.enhanced_base_agent import EnhancedBaseAgent
+from agents.field_match import FieldMatch
+from agents.normalization import typed_value
 
 class TrainingAgent(EnhancedBaseAgent):
     """
@@ -173,7 +175,7 @@ class TrainingAgent(EnhancedBaseAgent):
             "has_amount": 1 if self._get_field_value(extracted_fields, "total_amount") else 0,
             "has_date": 1 if self._get_field_value(extracted_fields, "invoice_date") else 0,
             "has_po": 1 if self._get_field_value(extracted_fields, "po_number") else 0,
-            "amount_value": float(self._parse_amount(self._get_field_value(extracted_fields, "total_amount"))) if self._get_field_value(extracted_fields, "total_amount") else 0.0,
+            "amount_value": self._get_amount(extracted_fields, "total_amount"),
             "anomaly_count": len(sample.get("anomalies", [])),
             "high_severity_count": sum(1 for a in sample.get("anomalies", []) if a.get("severity") == "HIGH"),
             "medium_severity_count": sum(1 for a in sample.get("anomalies", []) if a.get("severity") == "MEDIUM"),
@@ -182,6 +184,86 @@ class TrainingAgent(EnhancedBaseAgent):
         
         return features
     
+    def features_from_batch(self, batch: Dict[str, Any],
+                            anomalies: Optional[List[List[Dict[str, Any]]]] = None) -> pd.DataFrame:
+        """
+        Build the feature matrix for a columnar extraction batch
+        
+        Same columns as _extract_features, computed column-wise from
+        ExtractionAgent.process_batch output.
+        
+        Args:
+            batch: Columnar result from ExtractionAgent.process_batch
+            anomalies: Optional per-document anomaly lists aligned with the batch
+            
+        Returns:
+            DataFrame with one row per document
+        """
+        count = len(batch.get("document_ids", []))
+        columns = batch.get("fields", {})
+        
+        def values(field_name: str) -> pd.Series:
+            column = columns.get(field_name)
+            if column is None:
+                return pd.Series([""] * count, dtype=object)
+            return pd.Series(column["values"], dtype=object).fillna("").astype(str)
+        
+        amount = values("total_amount")
+        # The typed amounts process_batch normalized, as _get_amount uses per document
+        normalized = (columns.get("total_amount") or {}).get("normalized") or [
+            typed_value(value, "total_amount") if value else None for value in amount
+        ]
+        
+        features = pd.DataFrame({
+            "has_amount": (amount != "").astype(int),
+            "has_date": (values("invoice_date") != "").astype(int),
+            "has_po": (values("po_number") != "").astype(int),
+            "amount_value": [float(value) if value is not None else 0.0 for value in normalized]
+        })
+        
+        anomalies = anomalies if anomalies is not None else [[] for _ in range(count)]
+        for severity in ("HIGH", "MEDIUM", "LOW"):
+            features[f"{severity.lower()}_severity_count"] = [
+                sum(1 for a in document_anomalies if a.get("severity") == severity)
+                for document_anomalies in anomalies
+            ]
+        features.insert(4, "anomaly_count", [len(document_anomalies) for document_anomalies in anomalies])
+        
+        return features
+    
+    def predict_batch(self, batch: Dict[str, Any],
+                      anomalies: Optional[List[List[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """Predict anomalies for every document in a columnar extraction batch"""
+        if not self.model:
+            self._load_model()
+        
+        if not self.model:
+            return {
+                "prediction": "UNAVAILABLE",
+                "error": "No trained model available"
+            }
+        
+        try:
+            X = self.features_from_batch(batch, anomalies)
+            if X.empty:
+                return {"document_ids": [], "predictions": [], "anomaly_probabilities": []}
+            
+            predictions = self.model.predict(X)
+            probabilities = self.model.predict_proba(X)
+            anomaly_probabilities = probabilities[:, 1] if probabilities.shape[1] > 1 else np.zeros(len(X))
+            
+            return {
+                "document_ids": batch.get("document_ids", []),
+                "predictions": np.where(predictions == 1, "ANOMALY", "NORMAL"),
+                "anomaly_probabilities": anomaly_probabilities.astype(float),
+                "confidences": probabilities.max(axis=1).astype(float)
+            }
+        except Exception as e:
+            return {
+                "prediction": "ERROR",
+                "error": str(e)
+            }
+    
     def update_from_feedback(self, feedback_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Update model using reinforcement learning from feedback
@@ -336,7 +418,7 @@ class TrainingAgent(EnhancedBaseAgent):
         """Extract field value"""
         if field_name in fields:
             field_data = fields[field_name]
-            if isinstance(field_data, tuple):
+            if isinstance(field_data, (tuple, FieldMatch)):
                 return field_data[0]
             elif isinstance(field_data, dict):
                 return field_data.get("value")
@@ -344,16 +426,12 @@ class TrainingAgent(EnhancedBaseAgent):
                 return field_data
         return None
     
-    def _parse_amount(self, amount_str: str) -> float:
-        """Parse amount string to float"""
-        if not amount_str:
-            return 0.0
-        
-        cleaned = str(amount_str).replace("$", "").replace(",", "").strip()
-        try:
-            return float(cleaned)
-        except ValueError:
+    def _get_amount(self, fields: Dict[str, Any], field_name: str) -> float:
+        """Normalized amount as a float feature (0.0 when missing or unparseable)"""
+        if not self._get_field_value(fields, field_name):
             return 0.0
+        amount = typed_value(fields[field_name], field_name)
+        return float(amount) if amount is not None else 0.0
     
     def process(self, document_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process method required by base class"""
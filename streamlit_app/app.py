@@ -38,6 +38,18 @@ if "processing_history" not in st.session_state:
 if "current_results" not in st.session_state:
     st.session_state.current_results = None
 
+# GPT-4o semantic analysis finishes after a document's result is shown;
+# refresh that result and tell the user on the next rerun
+for update in st.session_state.orchestrator.pop_semantic_updates():
+    current = st.session_state.current_results
+    if current and current.get("document_info", {}).get("document_id") == update["document_id"]:
+        st.session_state.current_results = update["result"]
+    if update["status"] == "COMPLETED":
+        st.toast(f"🧠 Semantic analysis of {update['document_id'][:12]} added "
+                 f"{update['anomalies_added']} anomalies")
+    else:
+        st.toast(f"⚠️ Semantic analysis of {update['document_id'][:12]} failed")
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -6,7 +6,7 @@ Displays agent execution traces, token usage, and performance metrics
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, timedelta
+from datetime import datetime
 
 def render_observability_page():
     """Render observability dashboard page"""
@@ -36,41 +36,83 @@ def render_observability_page():
     
     st.markdown("---")
     
-    # Token Usage (Mock - would come from OpenAI API)
+    # Token Usage (from the LLM usage ledger)
     st.markdown("### 💰 Token Usage (OpenAI GPT-4o)")
     
-    # Mock token usage data
-    token_data = {
-        "Date": pd.date_range(start=datetime.now() - timedelta(days=7), periods=7, freq='D').strftime('%Y-%m-%d'),
-        "Prompt Tokens": [1250, 1380, 1120, 1560, 1450, 1620, 1340],
-        "Completion Tokens": [320, 380, 290, 410, 360, 430, 340],
-        "Total Tokens": [1570, 1760, 1410, 1970, 1810, 2050, 1680]
-    }
-    
-    df_tokens = pd.DataFrame(token_data)
+    llm_usage = None
+    if hasattr(st.session_state, 'orchestrator'):
+        llm_usage = st.session_state.orchestrator.get_llm_usage(days=7)
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric("Total Tokens (7 days)", f"{sum(df_tokens['Total Tokens']):,}")
-        st.metric("Avg Tokens/Day", f"{sum(df_tokens['Total Tokens'])/7:.0f}")
-    
-    with col2:
-        # Estimate cost (GPT-4o pricing: $2.50 per 1M input tokens, $10 per 1M output tokens)
-        total_input_cost = (sum(df_tokens['Prompt Tokens']) / 1_000_000) * 2.50
-        total_output_cost = (sum(df_tokens['Completion Tokens']) / 1_000_000) * 10
-        total_cost = total_input_cost + total_output_cost
+    if not llm_usage or not llm_usage["totals"]["calls"]:
+        st.info("No GPT-4o calls recorded in the last 7 days.")
+    else:
+        totals = llm_usage["totals"]
         
-        st.metric("Estimated Cost (7 days)", f"${total_cost:.2f}")
-        st.metric("Avg Cost/Day", f"${total_cost/7:.2f}")
-    
-    fig_tokens = px.line(
-        df_tokens,
-        x="Date",
-        y=["Prompt Tokens", "Completion Tokens", "Total Tokens"],
-        title="Token Usage Over Time",
-        labels={"value": "Tokens", "variable": "Token Type"}
-    )
-    st.plotly_chart(fig_tokens, use_container_width=True)
+        # One row per day of the window, zero on days without calls
+        by_day = {row["key"]: row for row in llm_usage["by_day"]}
+        days = pd.date_range(end=datetime.utcnow(), periods=7, freq='D').strftime('%Y-%m-%d')
+        df_tokens = pd.DataFrame({
+            "Date": days,
+            "Prompt Tokens": [by_day.get(day, {}).get("prompt_tokens", 0) for day in days],
+            "Completion Tokens": [by_day.get(day, {}).get("completion_tokens", 0) for day in days],
+            "Total Tokens": [by_day.get(day, {}).get("total_tokens", 0) for day in days]
+        })
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Tokens (7 days)", f"{totals['total_tokens']:,}")
+            st.metric("Avg Tokens/Day", f"{totals['total_tokens']/7:.0f}")
+        
+        with col2:
+            # Estimate cost (GPT-4o pricing: $2.50 per 1M input tokens, $10 per 1M output tokens)
+            total_input_cost = (totals['prompt_tokens'] / 1_000_000) * 2.50
+            total_output_cost = (totals['completion_tokens'] / 1_000_000) * 10
+            total_cost = total_input_cost + total_output_cost
+            
+            st.metric("Estimated Cost (7 days)", f"${total_cost:.2f}")
+            st.metric("Avg Cost/Day", f"${total_cost/7:.2f}")
+        
+        with col3:
+            st.metric("LLM Calls (7 days)", f"{totals['calls']:,}",
+                      help=f"{totals['cache_hits']:,} answered from cache, {totals['failures']:,} failed")
+            st.metric("Avg LLM Latency", f"{(totals['avg_latency_ms'] or 0) / 1000:.2f}s",
+                      help=f"Slowest call {(totals['max_latency_ms'] or 0) / 1000:.2f}s")
+        
+        fig_tokens = px.line(
+            df_tokens,
+            x="Date",
+            y=["Prompt Tokens", "Completion Tokens", "Total Tokens"],
+            title="Token Usage Over Time",
+            labels={"value": "Tokens", "variable": "Token Type"}
+        )
+        st.plotly_chart(fig_tokens, use_container_width=True)
+        
+        def usage_table(rows, label):
+            return pd.DataFrame([
+                {label: row["key"], "Calls": row["calls"], "Cache Hits": row["cache_hits"],
+                 "Prompt Tokens": row["prompt_tokens"], "Completion Tokens": row["completion_tokens"],
+                 "Tokens Saved": row["tokens_saved"],
+                 "Avg Latency (s)": round((row["avg_latency_ms"] or 0) / 1000, 2)}
+                for row in rows
+            ])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**By Agent**")
+            st.dataframe(usage_table(llm_usage["by_agent"], "Agent"), use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("**Top Documents**")
+            st.dataframe(usage_table(llm_usage["by_document"], "Document"), use_container_width=True, hide_index=True)
+    
+    resilience = st.session_state.orchestrator.get_llm_resilience_stats() if hasattr(st.session_state, 'orchestrator') else None
+    if resilience and resilience["calls"]:
+        breaker = resilience["circuit_breaker"]
+        if breaker and breaker["state"] != "closed":
+            st.warning(f"GPT-4o circuit breaker {breaker['state'].replace('_', ' ')}: "
+                       f"{breaker['rejected']:,} calls fell back to regex")
+        st.caption(f"GPT-4o calls since start: {resilience['retries']:,} retries, {resilience['timeouts']:,} timeouts, "
+                   f"{resilience['hedges']:,} hedged ({resilience['hedge_wins']:,} won by the hedge), "
+                   f"{resilience['short_circuited']:,} short-circuited")
     
     st.markdown("---")
     
@@ -127,6 +169,51 @@ def render_observability_page():
         st.metric("HITL Queue Size", len(st.session_state.orchestrator.get_hitl_queue()) if hasattr(st.session_state, 'orchestrator') else 0)
         st.metric("Feedback Received", "12")
     
+    st.markdown("---")
+    
+    # Cache Hit Rates
+    st.markdown("### 🗄️ Cache Hit Rates")
+    
+    if hasattr(st.session_state, 'orchestrator'):
+        cache_stats = st.session_state.orchestrator.get_cache_stats()
+        extraction_cache = cache_stats["extraction_cache"]
+        templates = cache_stats["layout_templates"]
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Result Store", f"{cache_stats['result_store']['hit_rate']:.1%}",
+                      help="Re-uploads answered without re-processing")
+        with col2:
+            st.metric("Extraction Cache", f"{extraction_cache['hit_rate']:.1%}",
+                      help=f"{extraction_cache['entries'] or 0} cached documents, "
+                           f"{extraction_cache['evictions']} evicted")
+        with col3:
+            st.metric("Layout Templates", f"{templates['template_hit_rate']:.1%}",
+                      help=f"{templates['learned']} layouts learned")
+        
+        df_caches = pd.DataFrame([
+            {"Cache": name, "Hits": stats.get("hits", stats.get("template_hits", 0)),
+             "Misses": stats.get("misses", stats.get("template_failures", 0) + stats.get("no_template", 0))}
+            for name, stats in [
+                ("Result Store", cache_stats["result_store"]),
+                ("Extraction Cache", extraction_cache),
+                ("Layout Templates", templates),
+                *[(f"{kind.title()} Parser", info) for kind, info in cache_stats["field_parsers"].items()],
+                *([("LLM Responses", cache_stats["llm_responses"])] if cache_stats["llm_responses"] else [])
+            ]
+        ])
+        st.dataframe(df_caches, use_container_width=True, hide_index=True)
+        
+        if cache_stats["llm_responses"]:
+            llm_cache = cache_stats["llm_responses"]
+            st.caption(f"LLM response cache: {llm_cache['hit_rate']:.1%} hit rate, "
+                       f"{llm_cache['tokens_saved']:,} tokens saved, {llm_cache['entries'] or 0} cached responses")
+        
+        if cache_stats["llm_in_flight"] and cache_stats["llm_in_flight"]["coalesced"]:
+            in_flight = cache_stats["llm_in_flight"]
+            st.caption(f"Identical in-flight LLM requests: {in_flight['coalesced']:,} coalesced "
+                       f"({in_flight['coalesce_rate']:.1%}), {in_flight['tokens_saved']:,} tokens saved")
+    
     st.info("📝 Note: Some metrics are mock data. Real metrics will appear after AWS CloudWatch integration is configured.")
 
 
@@ -47,12 +47,13 @@ def render_results_page():
     # Extracted Data
     st.markdown("### 🔍 Extracted Data")
     extracted_data = results.get("extracted_data", {})
+    field_sources = results.get("field_sources", {})
     
     if extracted_data:
         # Format extracted data as DataFrame
         df_data = []
         for field_name, field_value in extracted_data.items():
-            if isinstance(field_value, tuple):
+            if isinstance(field_value, tuple) or hasattr(field_value, "pattern_id"):
                 value, confidence = field_value
             elif isinstance(field_value, dict):
                 value = field_value.get("value", "")
@@ -61,14 +62,24 @@ def render_results_page():
                 value = field_value
                 confidence = 0.0
             
+            source = field_sources.get(field_name, {})
             df_data.append({
                 "Field": field_name.replace("_", " ").title(),
                 "Value": str(value),
-                "Confidence": f"{confidence:.1%}" if isinstance(confidence, (int, float)) else "N/A"
+                "Confidence": f"{confidence:.1%}" if isinstance(confidence, (int, float)) else "N/A",
+                "Page": source.get("page") or ""
             })
         
         df = pd.DataFrame(df_data)
         st.dataframe(df, use_container_width=True, hide_index=True)
+        
+        # Source snippets for located fields
+        if field_sources:
+            with st.expander("📍 Field Sources"):
+                for field_name, source in field_sources.items():
+                    st.markdown(f"**{field_name.replace('_', ' ').title()}** "
+                                f"(page {source.get('page')}, pattern `{source.get('pattern_id')}`)")
+                    st.code(source.get("snippet", ""), language=None)
     else:
         st.info("No extracted data available")
     
@@ -81,6 +92,12 @@ def render_results_page():
     
     st.markdown(f"### 🚨 Anomalies Detected: {anomalies_count}")
     
+    semantic = results.get("semantic_analysis") or {}
+    if semantic.get("status") == "PENDING":
+        st.caption("🧠 GPT-4o semantic analysis still running; rule-based anomalies shown")
+    elif semantic.get("status") == "COMPLETED":
+        st.caption(f"🧠 GPT-4o semantic analysis added {semantic['anomalies_added']} anomalies")
+    
     if anomalies_count > 0:
         # Anomaly Statistics
         col1, col2, col3 = st.columns(3)
@@ -65,8 +65,9 @@ def render_upload_page():
         
         # Process button
         st.markdown("---")
+        force = st.checkbox("🔁 Force re-process (ignore stored results)", value=False)
         if st.button("🚀 Process Document", type="primary", use_container_width=True):
-            process_document(file_path)
+            process_document(file_path, force=force)
     
     # Processing history
     if st.session_state.processing_history:
@@ -76,7 +77,7 @@ def render_upload_page():
             with st.expander(f"Session: {history_item.get('session_id', 'N/A')} - {history_item.get('timestamp', 'N/A')}"):
                 st.json(history_item)
 
-def process_document(file_path: str):
+def process_document(file_path: str, force: bool = False):
     """Process uploaded document"""
     
     orchestrator = st.session_state.orchestrator
@@ -122,7 +123,7 @@ def process_document(file_path: str):
         
         # Actual processing
         status_text.text("🤖 Processing with Orchestrator...")
-        result = orchestrator.process_document(file_path)
+        result = orchestrator.process_document(file_path, force=force)
         
         # Step 5: Summary
         status_text.text(steps[4])
@@ -163,6 +164,12 @@ def process_document(file_path: str):
                 if result.get("requires_hitl"):
                     st.warning("⚠️ This document requires Human-in-the-Loop review. Please check the Human Feedback page.")
                 
+                if (result.get("semantic_analysis") or {}).get("status") == "PENDING":
+                    st.info("🧠 GPT-4o semantic analysis is running in the background; its anomalies will be added to this result.")
+                
+                if result.get("from_cache"):
+                    st.info("♻️ Identical document was already processed - returned stored result.")
+                
                 st.success("✅ Document processed successfully! Check Results Dashboard for details.")
                 
                 # Quick anomaly summary